@@ -1,17 +1,34 @@
 from django.contrib import admin
-from .models import Court, Equipment, Coach, PricingRule, BookingSlot, Booking, WaitlistEntry
+from .services import catalog
+from .services.booking_service import cancel_bookings
+from .models import (
+    Court, Equipment, Coach, PricingRule, PeakWindow, Holiday, BookingSlot, Booking, WaitlistEntry,
+    EquipmentReservation, BookingHold
+)
 
 @admin.action(description='Mark selected courts as active')
 def make_active(modeladmin, request, queryset):
     queryset.update(is_active=True)
+    catalog.invalidate()  # update() bypasses post_save
 
 @admin.action(description='Mark selected courts as inactive')
 def make_inactive(modeladmin, request, queryset):
     queryset.update(is_active=False)
+    catalog.invalidate()  # update() bypasses post_save
+
+@admin.action(description='Cancel selected bookings and notify owners and waitlists')
+def cancel_selected_bookings(modeladmin, request, queryset):
+    # Set-based, so "select all" across a court's closure dates is fine
+    result = cancel_bookings(queryset)
+    modeladmin.message_user(
+        request,
+        f"Cancelled {result['cancelled']} bookings; notified {result['owners_notified']} owners "
+        f"and {result['waitlist_notified']} waitlisted users."
+    )
 
 @admin.register(Court)
 class CourtAdmin(admin.ModelAdmin):
-    list_display = ('name', 'court_type', 'is_active')
+    list_display = ('name', 'court_type', 'opening_hour', 'closing_hour', 'is_active')
     list_filter = ('court_type', 'is_active')
     actions = [make_active, make_inactive]
 
@@ -21,14 +38,28 @@ class EquipmentAdmin(admin.ModelAdmin):
     list_editable = ('quantity_available', 'rent_price_per_hour')
     list_filter = ('equipment_type',)
 
+@admin.register(EquipmentReservation)
+class EquipmentReservationAdmin(admin.ModelAdmin):
+    list_display = ('equipment', 'date', 'hour', 'quantity_reserved', 'capacity')
+    list_filter = ('equipment', 'date')
+
 @admin.register(Coach)
 class CoachAdmin(admin.ModelAdmin):
     list_display = ('name', 'hourly_rate')
 
+class PeakWindowInline(admin.TabularInline):
+    model = PeakWindow
+    extra = 0
+
 @admin.register(PricingRule)
 class PricingRuleAdmin(admin.ModelAdmin):
-    list_display = ('name', 'base_price', 'peak_multiplier', 'weekend_multiplier', 'is_active')
+    list_display = ('name', 'base_price', 'peak_multiplier', 'weekend_multiplier', 'effective_from', 'effective_to', 'is_active')
     list_editable = ('is_active', 'base_price')
+    inlines = [PeakWindowInline]
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ('date', 'name', 'multiplier')
 
 @admin.register(BookingSlot)
 class BookingSlotAdmin(admin.ModelAdmin):
@@ -42,12 +73,19 @@ class BookingInline(admin.TabularInline):
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'court', 'slot', 'total_price', 'booking_status', 'created_at')
-    list_filter = ('booking_status', 'court', 'created_at')
+    list_filter = ('booking_status', 'court', 'slot__date', 'created_at')
     search_fields = ('user__username', 'id')
+    actions = [cancel_selected_bookings]
     readonly_fields = ('total_price', 'created_at')
     exclude = ('equipment',) # Exclude M2M field to use inline if needed, but M2M is hard to inline directly without through model.
     # Actually, standard M2M widget is fine.
 
+@admin.register(BookingHold)
+class BookingHoldAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'court', 'slot', 'end_time', 'total_price', 'expires_at')
+    list_filter = ('court',)
+    search_fields = ('user__username',)
+
 @admin.register(WaitlistEntry)
 class WaitlistEntryAdmin(admin.ModelAdmin):
     list_display = ('user', 'court', 'requested_slot', 'position', 'notified')
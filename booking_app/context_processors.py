@@ -0,0 +1,9 @@
+from django.conf import settings
+from django.urls import reverse
+
+
+def notification_stream(request):
+    """
+    Where base.html opens the notification EventSource.
+    """
+    return {'notification_stream_url': settings.NOTIFICATION_STREAM_URL or reverse('notification_stream')}
@@ -0,0 +1,101 @@
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from booking_app.services.contention_bench import ContentionBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer create_booking / cancel_booking / join_waitlist from many threads and report "
+        "throughput, latency, lock waits, retries and booking invariants. Writes real rows: "
+        "run it against a local or staging database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help="Operations per thread")
+        parser.add_argument('--mix', default='70,20,10', help="book,cancel,waitlist weights")
+        parser.add_argument('--courts', help="Comma-separated court ids (default: every active court)")
+        parser.add_argument('--start-date', help="YYYY-MM-DD, default 400 days from today")
+        parser.add_argument('--days', type=int, default=1)
+        parser.add_argument('--hotspot', type=float, default=0.8, help="Share of picks aimed at the hot slots")
+        parser.add_argument('--hot-slots', type=int, default=2)
+        parser.add_argument('--equipment', default='', help="Comma-separated equipment ids to rent")
+        parser.add_argument('--equipment-share', type=float, default=0.3)
+        parser.add_argument('--concurrency', choices=['optimistic', 'pessimistic'],
+                            default=settings.BOOKING_CONCURRENCY)
+        parser.add_argument('--lock-wait', choices=['timeout', 'nowait', 'block'],
+                            default=settings.BOOKING_LOCK_WAIT)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--keep', action='store_true', help="Leave the benchmark's bookings in place")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+        parser.add_argument('--force', action='store_true', help="Run even when DEBUG is off")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError("Refusing to write benchmark bookings with DEBUG off; pass --force.")
+        try:
+            mix = tuple(int(w) for w in options['mix'].split(','))
+            court_ids = [int(c) for c in options['courts'].split(',')] if options['courts'] else None
+            equipment_ids = [int(e) for e in options['equipment'].split(',') if e]
+            start_date = (
+                datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+                if options['start_date'] else timezone.localdate() + timedelta(days=400)
+            )
+        except ValueError:
+            raise CommandError("Invalid --mix, --courts, --equipment or --start-date.")
+        if len(mix) != 3 or options['threads'] < 1 or options['operations'] < 1:
+            raise CommandError("--mix needs three weights; --threads and --operations must be positive.")
+
+        bench = ContentionBenchmark(
+            threads=options['threads'],
+            operations=options['operations'],
+            mix=mix,
+            court_ids=court_ids,
+            start_date=start_date,
+            days=options['days'],
+            hotspot=options['hotspot'],
+            hot_slots=options['hot_slots'],
+            equipment_ids=equipment_ids,
+            equipment_share=options['equipment_share'],
+            seed=options['seed'],
+        )
+        with override_settings(BOOKING_CONCURRENCY=options['concurrency'], BOOKING_LOCK_WAIT=options['lock_wait']):
+            try:
+                report = bench.run()
+            finally:
+                if not options['keep']:
+                    bench.cleanup()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, default=str, indent=2))
+        else:
+            self._print(report, options)
+        if not report['invariants']['ok']:
+            raise CommandError("Invariant check failed.")
+
+    def _print(self, report, options):
+        self.stdout.write(
+            f"{options['threads']} threads x {options['operations']} ops, {options['concurrency']}, "
+            f"lock wait {options['lock_wait']}: {report['throughput']:.1f} ops/s over {report['elapsed']:.2f}s"
+        )
+        for op, summary in report['operations'].items():
+            outcomes = ', '.join(f"{k}={v}" for k, v in sorted(summary['outcomes'].items()))
+            self.stdout.write(
+                f"  {op:<9} n={summary['count']:<6} p50={summary['p50_ms']}ms p99={summary['p99_ms']}ms "
+                f"max={summary['max_ms']}ms  {outcomes}"
+            )
+        for operation, counts in report['retries'].items():
+            self.stdout.write(f"  retries {operation}: {counts}")
+        lock_wait = report['lock_wait']
+        self.stdout.write(f"  lock wait: {lock_wait if lock_wait else 'n/a (PostgreSQL only)'}")
+        invariants = report['invariants']
+        if invariants['ok']:
+            self.stdout.write(self.style.SUCCESS("  invariants: ok"))
+        else:
+            self.stdout.write(self.style.ERROR(f"  invariants: {invariants}"))
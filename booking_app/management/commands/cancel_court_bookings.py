@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from booking_app.models import Booking, Court
+from booking_app.services.booking_service import cancel_court_bookings
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a court over a date range: cancel every confirmed booking and hold and keep the "
+        "slots unavailable until `reopen_court`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('court_id', type=int)
+        parser.add_argument('start_date', help="YYYY-MM-DD")
+        parser.add_argument('end_date', nargs='?', help="YYYY-MM-DD, inclusive; defaults to start_date")
+        parser.add_argument('--reason', default='', help="Included in the notice sent to each owner")
+        parser.add_argument('--no-waitlist', action='store_true',
+                            help="Don't send waitlisted users a closure notice (they still leave the queue)")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many bookings would be cancelled")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(options['end_date'] or options['start_date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError("Dates must be YYYY-MM-DD.")
+        if end_date < start_date:
+            raise CommandError("end_date is before start_date.")
+        if not Court.objects.filter(id=options['court_id']).exists():
+            raise CommandError(f"Court {options['court_id']} does not exist.")
+
+        if options['dry_run']:
+            count = Booking.objects.filter(
+                court_id=options['court_id'],
+                slot__date__range=(start_date, end_date),
+                booking_status='CONFIRMED'
+            ).count()
+            self.stdout.write(f"Would cancel {count} bookings.")
+            return
+
+        result = cancel_court_bookings(
+            options['court_id'], start_date, end_date,
+            reason=options['reason'],
+            notify_waitlist=not options['no_waitlist']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Cancelled {result['cancelled']} bookings and released {result['holds_released']} holds; "
+            f"notified {result['owners_notified']} owners and {result['waitlist_notified']} waitlisted users. "
+            f"The court stays closed until reopen_court."
+        ))
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from booking_app.services.slot_generation import generate_slots
+
+
+class Command(BaseCommand):
+    help = "Pre-generate booking slots for every active court over the next N days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SLOT_PREGENERATE_DAYS)
+        parser.add_argument('--start-date', help="YYYY-MM-DD, defaults to today")
+        parser.add_argument('--batch-size', type=int, default=settings.SLOT_PREGENERATE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start_date = None
+        if options['start_date']:
+            try:
+                start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--start-date must be YYYY-MM-DD.")
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--days and --batch-size must be positive.")
+
+        created = generate_slots(
+            days=options['days'],
+            start_date=start_date,
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} slots for the next {options['days']} days."
+        ))
@@ -0,0 +1,49 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from booking_app.services.slot_index import get_slot_index
+
+logger = logging.getLogger(__name__)
+
+OVERTAKEN = "Slot index rebuild was overtaken by booking updates on every read; lookups keep using the previous index or the database."
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the shared slot availability index from BookingSlot. "
+        "With --interval, keeps rebuilding on that schedule until stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, nargs='?', const=settings.SLOT_INDEX_REBUILD_INTERVAL,
+                            help="Seconds between rebuilds (default SLOT_INDEX_REBUILD_INTERVAL)")
+
+    def handle(self, *args, **options):
+        index = get_slot_index()
+        if index is None:
+            raise CommandError("Slot index is disabled (SLOT_INDEX_PATH unset or fcntl unavailable).")
+        if index.rebuild():
+            self.stdout.write(self.style.SUCCESS(
+                f"Slot index rebuilt at {index.path} ({index.horizon_days} days, {index.max_courts} courts max)."
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(OVERTAKEN))
+        if not options['interval']:
+            return
+
+        # Catches writes that bypass the services and signals (bulk queryset updates)
+        try:
+            while True:
+                time.sleep(options['interval'])
+                close_old_connections()
+                try:
+                    if not index.rebuild():
+                        logger.warning(OVERTAKEN)
+                except Exception:
+                    logger.exception("Slot index rebuild failed")
+        except KeyboardInterrupt:
+            self.stdout.write("Slot index rebuilds stopped.")
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from booking_app.models import Court
+from booking_app.services.booking_service import reopen_court
+
+
+class Command(BaseCommand):
+    help = "End a court closure (cancel_court_bookings): make the range's slots bookable again."
+
+    def add_arguments(self, parser):
+        parser.add_argument('court_id', type=int)
+        parser.add_argument('start_date', help="YYYY-MM-DD")
+        parser.add_argument('end_date', nargs='?', help="YYYY-MM-DD, inclusive; defaults to start_date")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(options['end_date'] or options['start_date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError("Dates must be YYYY-MM-DD.")
+        if end_date < start_date:
+            raise CommandError("end_date is before start_date.")
+        if not Court.objects.filter(id=options['court_id']).exists():
+            raise CommandError(f"Court {options['court_id']} does not exist.")
+
+        freed = reopen_court(options['court_id'], start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(f"Reopened {freed} slots."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from booking_app.services.booking_service import sweep_expired_holds
+
+
+class Command(BaseCommand):
+    help = (
+        "Release expired booking holds (slots, equipment and coaches) in bulk. "
+        "The waitlist worker does this on every pass; this runs it once."
+    )
+
+    def handle(self, *args, **options):
+        released = sweep_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired holds."))
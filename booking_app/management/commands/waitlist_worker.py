@@ -0,0 +1,66 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from booking_app.services.booking_service import sweep_expired_holds
+from booking_app.services.waitlist_service import expire_offers, purge_stale
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Release expired booking holds, pass lapsed waitlist offers to the next user in line "
+        "and purge old notifications. "
+        "Runs until stopped, or a single pass with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run one pass and exit (e.g. from cron)")
+        parser.add_argument('--interval', type=float, default=settings.WAITLIST_WORKER_INTERVAL,
+                            help="Seconds between passes")
+        parser.add_argument('--batch-size', type=int, default=settings.WAITLIST_WORKER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self._report(self.run_pass(options['batch_size']))
+            return
+
+        self.stdout.write(f"Waitlist worker started, every {options['interval']}s.")
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    counts = self.run_pass(options['batch_size'])
+                    released, expired, promoted, purged, stale_entries = counts
+                    if released or expired or purged or stale_entries:
+                        self._report(counts)
+                except Exception:
+                    # Keep going; the next pass picks up whatever this one left
+                    logger.exception("Waitlist worker pass failed")
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Waitlist worker stopped.")
+
+    def run_pass(self, batch_size):
+        # Abandoned holds keep their slots booked until swept; freed slots go to their waitlists
+        released = sweep_expired_holds()
+        expired = promoted = 0
+        while True:
+            batch_expired, batch_promoted = expire_offers(batch_size=batch_size)
+            expired += batch_expired
+            promoted += batch_promoted
+            if batch_expired < batch_size:
+                break
+        purged, stale_entries = purge_stale(batch_size=batch_size)
+        return released, expired, promoted, purged, stale_entries
+
+    def _report(self, counts):
+        released, expired, promoted, purged, stale_entries = counts
+        self.stdout.write(self.style.SUCCESS(
+            f"Released {released} expired holds, expired {expired} offers, promoted {promoted} waiting users, "
+            f"purged {purged} notifications and {stale_entries} past waitlist entries."
+        ))
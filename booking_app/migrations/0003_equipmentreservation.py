@@ -0,0 +1,65 @@
+# Generated by Django 5.1.2 on 2026-10-16 22:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Equipment.quantity_available used to be decremented per booking and only
+    restored on cancel. Give those units back to stock and record the still
+    confirmed bookings as hourly reservations instead.
+    """
+    Equipment = apps.get_model('booking_app', 'Equipment')
+    Booking = apps.get_model('booking_app', 'Booking')
+    EquipmentReservation = apps.get_model('booking_app', 'EquipmentReservation')
+
+    held = {}
+    reserved = {}
+    rows = Booking.equipment.through.objects.filter(
+        booking__booking_status__in=['CONFIRMED', 'COMPLETED']
+    ).values_list('equipment_id', 'booking__booking_status', 'booking__slot__date', 'booking__slot__start_time')
+    for eq_id, status, date, start_time in rows:
+        held[eq_id] = held.get(eq_id, 0) + 1
+        if status == 'CONFIRMED':
+            key = (eq_id, date, start_time.hour)
+            reserved[key] = reserved.get(key, 0) + 1
+
+    for eq in Equipment.objects.filter(id__in=held):
+        eq.quantity_available += held[eq.id]
+        eq.save(update_fields=['quantity_available'])
+
+    stock = dict(Equipment.objects.values_list('id', 'quantity_available'))
+    EquipmentReservation.objects.bulk_create([
+        EquipmentReservation(
+            equipment_id=eq_id, date=date, hour=hour,
+            capacity=stock.get(eq_id, 0), quantity_reserved=qty
+        )
+        for (eq_id, date, hour), qty in reserved.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0002_usernotificationpreference_waitlistnotification_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('quantity_reserved', models.PositiveIntegerField(default=0)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='booking_app.equipment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'hour'], name='booking_app_date_99f66f_idx')],
+                'unique_together': {('equipment', 'date', 'hour')},
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
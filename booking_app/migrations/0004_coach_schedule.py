@@ -0,0 +1,77 @@
+# Generated by Django 5.1.2 on 2026-10-16 22:41
+
+import django.db.models.deletion
+from datetime import datetime
+
+from django.db import migrations, models
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def backfill_schedule(apps, schema_editor):
+    """
+    Normalizes existing availability_slots JSON and records coaches already
+    taken by confirmed bookings.
+    """
+    Coach = apps.get_model('booking_app', 'Coach')
+    Booking = apps.get_model('booking_app', 'Booking')
+    CoachWeeklySlot = apps.get_model('booking_app', 'CoachWeeklySlot')
+    CoachReservation = apps.get_model('booking_app', 'CoachReservation')
+
+    slots = []
+    for coach in Coach.objects.all():
+        for day_name, times in (coach.availability_slots or {}).items():
+            if day_name not in WEEKDAY_NAMES:
+                continue
+            for time_str in times or []:
+                try:
+                    hour = datetime.strptime(time_str, "%H:%M").hour
+                except (TypeError, ValueError):
+                    continue
+                slots.append(CoachWeeklySlot(coach=coach, weekday=WEEKDAY_NAMES.index(day_name), hour=hour))
+    CoachWeeklySlot.objects.bulk_create(slots, ignore_conflicts=True)
+
+    CoachReservation.objects.bulk_create([
+        CoachReservation(coach_id=coach_id, date=date, hour=start_time.hour, booking_id=booking_id)
+        for booking_id, coach_id, date, start_time in Booking.objects.filter(
+            booking_status='CONFIRMED', coach__isnull=False
+        ).values_list('id', 'coach_id', 'slot__date', 'slot__start_time')
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0003_equipmentreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoachReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='coach_reservations', to='booking_app.booking')),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='booking_app.coach')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'hour'], name='booking_app_date_52a438_idx')],
+                'unique_together': {('coach', 'date', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CoachWeeklySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_slots', to='booking_app.coach')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['weekday', 'hour'], name='booking_app_weekday_2e1d5b_idx')],
+                'unique_together': {('coach', 'weekday', 'hour')},
+            },
+        ),
+        migrations.RunPython(backfill_schedule, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-16 22:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0004_coach_schedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookingslot',
+            index=models.Index(fields=['court', 'date', 'end_time'], name='booking_app_court_i_ac335f_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.2 on 2026-10-16 22:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0005_bookingslot_interval_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('multiplier', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pricingrule',
+            name='effective_from',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pricingrule',
+            name='effective_to',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PeakWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('multiplier', models.FloatField(default=1.5)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='peak_windows', to='booking_app.pricingrule')),
+            ],
+        ),
+    ]
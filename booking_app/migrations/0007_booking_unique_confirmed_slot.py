@@ -0,0 +1,79 @@
+# Generated by Django 5.1.2 on 2026-10-16 22:51
+
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def cancel_duplicate_bookings(apps, schema_editor):
+    """
+    The old check-then-insert path could confirm two bookings for one slot.
+    Keep the earliest and cancel the rest so the constraint can be created,
+    giving back their equipment units and coach hours and telling each owner.
+    """
+    Booking = apps.get_model('booking_app', 'Booking')
+    EquipmentReservation = apps.get_model('booking_app', 'EquipmentReservation')
+    CoachReservation = apps.get_model('booking_app', 'CoachReservation')
+    WaitlistNotification = apps.get_model('booking_app', 'WaitlistNotification')
+
+    seen = set()
+    duplicates = {}
+    for booking_id, user_id, slot_id, court_name, date_obj, start_time, end_time in Booking.objects.filter(
+        booking_status='CONFIRMED'
+    ).order_by('slot_id', 'created_at', 'id').values_list(
+        'id', 'user_id', 'slot_id', 'court__name', 'slot__date', 'slot__start_time', 'slot__end_time'
+    ):
+        if slot_id in seen:
+            duplicates[booking_id] = (user_id, slot_id, court_name, date_obj, start_time, end_time)
+        seen.add(slot_id)
+    if not duplicates:
+        return
+
+    Booking.objects.filter(id__in=list(duplicates)).update(booking_status='CANCELLED')
+
+    demand = {}
+    for booking_id, eq_id in Booking.equipment.through.objects.filter(
+        booking_id__in=list(duplicates)
+    ).values_list('booking_id', 'equipment_id'):
+        _, _, _, date_obj, start_time, end_time = duplicates[booking_id]
+        for hour in range(start_time.hour, end_time.hour + (1 if end_time.minute else 0)):
+            demand[(eq_id, date_obj, hour)] = demand.get((eq_id, date_obj, hour), 0) + 1
+    for (eq_id, date_obj, hour), n in demand.items():
+        EquipmentReservation.objects.filter(
+            equipment_id=eq_id, date=date_obj, hour=hour, quantity_reserved__gte=n
+        ).update(quantity_reserved=F('quantity_reserved') - n)
+
+    CoachReservation.objects.filter(booking_id__in=list(duplicates)).delete()
+
+    WaitlistNotification.objects.bulk_create([
+        WaitlistNotification(
+            user_id=user_id,
+            slot_id=slot_id,
+            notification_type='BOOKING_CANCELLED',
+            message=(
+                f"Your booking #{booking_id} for {court_name} on {date_obj} at {start_time} was cancelled: "
+                f"the slot had been booked twice and the earlier booking was kept. Please contact us about a refund."
+            ),
+            expires_at=timezone.make_aware(datetime.combine(date_obj, start_time))
+        )
+        for booking_id, (user_id, slot_id, court_name, date_obj, start_time, _) in duplicates.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0006_price_schedule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_duplicate_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('booking_status', 'CONFIRMED')), fields=('slot',), name='unique_confirmed_booking_per_slot'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-16 22:54
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0007_booking_unique_confirmed_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='court',
+            name='closing_hour',
+            field=models.PositiveSmallIntegerField(default=22, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(23)]),
+        ),
+        migrations.AddField(
+            model_name='court',
+            name='opening_hour',
+            field=models.PositiveSmallIntegerField(default=9, validators=[django.core.validators.MaxValueValidator(22)]),
+        ),
+    ]
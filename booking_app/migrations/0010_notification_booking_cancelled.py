@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0009_booking_hold'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waitlistnotification',
+            name='notification_type',
+            field=models.CharField(choices=[('SLOT_AVAILABLE', 'Slot Available'), ('POSITION_CHANGED', 'Position Changed'), ('BOOKING_CANCELLED', 'Booking Cancelled')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def compact_positions(apps, schema_editor):
+    """
+    Concurrent joins could share a position and leaving never renumbered.
+    Rank each slot's waiting entries 1..n by (position, created_at) and
+    mark entries that were already offered the slot with 0.
+    """
+    WaitlistEntry = apps.get_model('booking_app', 'WaitlistEntry')
+
+    WaitlistEntry.objects.filter(notified=True).update(position=0)
+    changed = []
+    ranks = {}
+    for entry in WaitlistEntry.objects.filter(notified=False).order_by('requested_slot_id', 'position', 'created_at', 'id'):
+        rank = ranks[entry.requested_slot_id] = ranks.get(entry.requested_slot_id, 0) + 1
+        if entry.position != rank:
+            entry.position = rank
+            changed.append(entry)
+    WaitlistEntry.objects.bulk_update(changed, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0010_notification_booking_cancelled'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['requested_slot', 'notified', 'position'], name='waitlist_queue_idx'),
+        ),
+    ]
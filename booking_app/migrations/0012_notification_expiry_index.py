@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0011_waitlist_queue_ranks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='waitlistnotification',
+            index=models.Index(fields=['expires_at'], name='notification_expiry_idx'),
+        ),
+    ]
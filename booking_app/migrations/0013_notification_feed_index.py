@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking_app', '0012_notification_expiry_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='waitlistnotification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notification_feed_idx'),
+        ),
+    ]
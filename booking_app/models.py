@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.core.validators import MinValueValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 
 class Court(models.Model):
     COURT_TYPES = [
@@ -10,6 +11,13 @@ class Court(models.Model):
     name = models.CharField(max_length=100)
     court_type = models.CharField(max_length=10, choices=COURT_TYPES)
     is_active = models.BooleanField(default=True)
+    # First slot starts at opening_hour; the last one ends at closing_hour
+    opening_hour = models.PositiveSmallIntegerField(default=9, validators=[MaxValueValidator(22)])
+    closing_hour = models.PositiveSmallIntegerField(default=22, validators=[MinValueValidator(1), MaxValueValidator(23)])
+
+    def clean(self):
+        if self.closing_hour <= self.opening_hour:
+            raise ValidationError("Closing hour must be after opening hour.")
 
     def __str__(self):
         return f"{self.name} ({self.get_court_type_display()})"
@@ -21,6 +29,7 @@ class Equipment(models.Model):
     ]
     name = models.CharField(max_length=100)
     equipment_type = models.CharField(max_length=10, choices=EQUIPMENT_TYPES)
+    # Units owned; how many are free at a given hour lives in EquipmentReservation
     quantity_available = models.PositiveIntegerField(default=0)
     rent_price_per_hour = models.DecimalField(max_digits=6, decimal_places=2)
 
@@ -36,6 +45,23 @@ class Coach(models.Model):
     def __str__(self):
         return self.name
 
+class CoachWeeklySlot(models.Model):
+    """
+    One hour a coach works each week, normalized from Coach.availability_slots.
+    """
+    coach = models.ForeignKey(Coach, on_delete=models.CASCADE, related_name='weekly_slots')
+    weekday = models.PositiveSmallIntegerField()  # Monday=0, Sunday=6
+    hour = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('coach', 'weekday', 'hour')
+        indexes = [
+            models.Index(fields=['weekday', 'hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.coach.name} - {self.weekday} {self.hour}:00"
+
 class PricingRule(models.Model):
     name = models.CharField(max_length=100, default="Standard Rule")
     peak_start_time = models.TimeField(default="18:00")
@@ -45,10 +71,36 @@ class PricingRule(models.Model):
     indoor_court_multiplier = models.FloatField(default=1.4)
     base_price = models.DecimalField(max_digits=6, decimal_places=2, default=500.00)
     is_active = models.BooleanField(default=True)
+    # Optional validity range; when several active rules cover a date the latest effective_from wins
+    effective_from = models.DateField(null=True, blank=True)
+    effective_to = models.DateField(null=True, blank=True)
 
     def __str__(self):
         return self.name
 
+class PeakWindow(models.Model):
+    """
+    An extra peak period for a rule, on top of its own peak_start_time/peak_end_time.
+    """
+    rule = models.ForeignKey(PricingRule, on_delete=models.CASCADE, related_name='peak_windows')
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    multiplier = models.FloatField(default=1.5)
+
+    def __str__(self):
+        return f"{self.rule.name}: {self.start_time}-{self.end_time} x{self.multiplier}"
+
+class Holiday(models.Model):
+    """
+    A date priced like a weekend, optionally with its own multiplier.
+    """
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+    multiplier = models.FloatField(null=True, blank=True)  # Defaults to the rule's weekend_multiplier
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+
 class BookingSlot(models.Model):
     court = models.ForeignKey(Court, on_delete=models.CASCADE)
     date = models.DateField()
@@ -58,6 +110,14 @@ class BookingSlot(models.Model):
 
     class Meta:
         unique_together = ('court', 'date', 'start_time')
+        indexes = [
+            # With the unique index above, serves both bounds of the overlap check
+            models.Index(fields=['court', 'date', 'end_time']),
+        ]
+
+    @property
+    def duration_minutes(self):
+        return (self.end_time.hour * 60 + self.end_time.minute) - (self.start_time.hour * 60 + self.start_time.minute)
 
     def __str__(self):
         return f"{self.court.name} - {self.date} {self.start_time}"
@@ -77,6 +137,16 @@ class Booking(models.Model):
     booking_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='CONFIRMED')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Last line of defence for the optimistic booking path: one live booking per slot
+            models.UniqueConstraint(
+                fields=['slot'],
+                condition=models.Q(booking_status='CONFIRMED'),
+                name='unique_confirmed_booking_per_slot'
+            ),
+        ]
+
     def __str__(self):
         return f"Booking {self.id} - {self.user.username}"
 
@@ -84,6 +154,7 @@ class WaitlistNotification(models.Model):
     NOTIFICATION_TYPES = (
         ('SLOT_AVAILABLE', 'Slot Available'),
         ('POSITION_CHANGED', 'Position Changed'),
+        ('BOOKING_CANCELLED', 'Booking Cancelled'),
     )
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     slot = models.ForeignKey(BookingSlot, on_delete=models.CASCADE)
@@ -93,6 +164,14 @@ class WaitlistNotification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Scanned in expiry order by the waitlist worker
+            models.Index(fields=['expires_at'], name='notification_expiry_idx'),
+            # The notification list pages through a user's rows on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_feed_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.notification_type}"
 
@@ -108,10 +187,84 @@ class WaitlistEntry(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     requested_slot = models.ForeignKey(BookingSlot, on_delete=models.CASCADE)
     court = models.ForeignKey(Court, on_delete=models.CASCADE)
+    # 1-based rank among the slot's waiting entries, kept gap-free by waitlist_service;
+    # 0 once the entry has been offered the slot
     position = models.PositiveIntegerField()
     notified = models.BooleanField(default=False)
     notification = models.ForeignKey(WaitlistNotification, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Head of a slot's queue is (slot, notified=False, position=1)
+            models.Index(fields=['requested_slot', 'notified', 'position'], name='waitlist_queue_idx'),
+        ]
+
     def __str__(self):
         return f"Waitlist {self.user.username} - {self.requested_slot}"
+
+class EquipmentReservation(models.Model):
+    """
+    Units of one equipment item reserved for one hour of one day.
+    `capacity` mirrors Equipment.quantity_available so a reservation is a
+    single conditional UPDATE on this row.
+    """
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='reservations')
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    capacity = models.PositiveIntegerField(default=0)
+    quantity_reserved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('equipment', 'date', 'hour')
+        indexes = [
+            models.Index(fields=['date', 'hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment.name} - {self.date} {self.hour}:00 ({self.quantity_reserved}/{self.capacity})"
+
+class CoachReservation(models.Model):
+    """
+    A coach taken for one hour of one day. The unique constraint is what stops
+    two concurrent bookings from getting the same coach.
+    """
+    coach = models.ForeignKey(Coach, on_delete=models.CASCADE, related_name='reservations')
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, null=True, blank=True, related_name='coach_reservations')
+    # Set while the coach is only held; moved to `booking` on confirm
+    hold = models.ForeignKey('BookingHold', on_delete=models.CASCADE, null=True, blank=True, related_name='coach_reservations')
+
+    class Meta:
+        unique_together = ('coach', 'date', 'hour')
+        indexes = [
+            models.Index(fields=['date', 'hour']),
+        ]
+
+    def __str__(self):
+        return f"{self.coach.name} - {self.date} {self.hour}:00"
+
+class BookingHold(models.Model):
+    """
+    A short-lived claim on a slot, its equipment and coach, made when the user
+    picks a cell. Confirming turns it into a Booking at the quoted price;
+    expired holds are released in bulk by sweep_expired_holds.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_holds')
+    court = models.ForeignKey(Court, on_delete=models.CASCADE)
+    slot = models.ForeignKey(BookingSlot, on_delete=models.CASCADE, related_name='holds')
+    end_time = models.TimeField()
+    coach = models.ForeignKey(Coach, on_delete=models.SET_NULL, null=True, blank=True)
+    equipment_ids = models.JSONField(default=list, blank=True)
+    total_price = models.DecimalField(max_digits=8, decimal_places=2)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def duration_minutes(self):
+        start = self.slot.start_time
+        return (self.end_time.hour * 60 + self.end_time.minute) - (start.hour * 60 + start.minute)
+
+    def __str__(self):
+        return f"Hold {self.id} - {self.slot} until {self.expires_at:%H:%M:%S}"
@@ -1,119 +1,323 @@
-from datetime import datetime, time
-from django.db.models import Q
-from booking_app.models import BookingSlot, Booking, Equipment, Coach
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, Q
+from django.utils import timezone
+from booking_app.models import BookingSlot, CoachReservation, CoachWeeklySlot
+from booking_app.services import slot_index
+from booking_app.services.catalog import get_catalog
+from booking_app.services.inventory_service import get_equipment_availability
 
-def check_court_availability(court_id, date_obj, start_time):
+# Default operating hours: slots start on the hour from 9AM, last slot starts at 9PM.
+# Each court can override them (Court.opening_hour / closing_hour).
+OPENING_HOUR = 9
+CLOSING_HOUR = 22
+
+# Bookings start on the hour and run in 30-minute steps, up to 4 hours.
+SLOT_STEP_MINUTES = 30
+MAX_DURATION_MINUTES = 240
+
+def get_operating_hours(courts=None):
     """
-    Check if a court is available at a specific date and time.
+    Returns the slot start times for a day, in order.
+    Given court rows (see get_active_court_rows), covers the union of their hours.
     """
-    # Check if slot exists and is not booked
-    try:
-        slot = BookingSlot.objects.get(
-            court_id=court_id,
-            date=date_obj,
-            start_time=start_time
+    if courts:
+        return [time(h, 0) for h in range(
+            min(c['opening_hour'] for c in courts),
+            max(c['closing_hour'] for c in courts)
+        )]
+    return [time(h, 0) for h in range(OPENING_HOUR, CLOSING_HOUR)]
+
+def get_end_time(start_time, duration_minutes=60, court=None):
+    """
+    Validates a booking interval and returns its end time.
+    The interval must start on the hour and end by closing time (the court's own
+    hours when a Court is given).
+    """
+    duration_minutes = int(duration_minutes)
+    if (duration_minutes <= 0 or duration_minutes > MAX_DURATION_MINUTES
+            or duration_minutes % SLOT_STEP_MINUTES):
+        raise ValidationError(
+            f"Duration must be a multiple of {SLOT_STEP_MINUTES} minutes, up to {MAX_DURATION_MINUTES}."
         )
-        if slot.is_booked:
-            return False
-    except BookingSlot.DoesNotExist:
-        # If slot doesn't exist, it's technically available to be created/booked
-        # But we should probably ensure slots are pre-generated or generated on demand.
-        # For this logic, let's assume if it's not explicitly booked in BookingSlot, it's free?
-        # No, the requirement says "Show available time slots".
-        # So we should probably rely on BookingSlot being the source of truth for availability.
-        # If slot doesn't exist, we can treat it as available if within operating hours.
-        pass
-
-    # Double check against actual Bookings to be safe (though slot.is_booked should handle it)
-    is_booked = Booking.objects.filter(
+    if start_time.minute or start_time.second:
+        raise ValidationError("Bookings must start on the hour.")
+
+    opening_hour = court.opening_hour if court else OPENING_HOUR
+    closing_hour = court.closing_hour if court else CLOSING_HOUR
+    start = datetime.combine(date.min, start_time)
+    end = start + timedelta(minutes=duration_minutes)
+    if start_time.hour < opening_hour or end > datetime.combine(date.min, time()) + timedelta(hours=closing_hour):
+        raise ValidationError("Booking must fall within operating hours.")
+    return end.time()
+
+def get_covered_hours(start_time, end_time):
+    """
+    Hour buckets an interval touches: 18:00-19:30 covers [18, 19].
+    """
+    last = end_time.hour + (1 if end_time.minute else 0)
+    return list(range(start_time.hour, last))
+
+def find_overlapping_slots(court_id, date_obj, start_time, end_time):
+    """
+    Taken slots on a court that overlap [start_time, end_time).
+    Served by the (court, date, start_time) and (court, date, end_time) indexes.
+    """
+    return BookingSlot.objects.filter(
         court_id=court_id,
-        slot__date=date_obj,
-        slot__start_time=start_time,
-        booking_status='CONFIRMED'
-    ).exists()
-    
-    return not is_booked
-
-def check_equipment_availability(equipment_ids, date_obj, start_time, duration_hours=1):
-    """
-    Check if requested equipment is available.
-    Note: This is a simple check. For strict concurrency, we use select_for_update in booking_service.
-    """
-    # In a real system, we'd need to sum up all bookings using this equipment at this time.
-    # Since equipment quantity is global, we subtract currently active bookings' usage.
-    
-    # This is tricky without a time-based inventory system.
-    # The requirement says: "Equipment: quantity_available".
-    # And "Update quantities atomically" in booking_service.
-    # This implies quantity_available is a global counter.
-    # BUT, if I rent a racket for 9-10AM, it should be available again at 10AM.
-    # If we just decrement `quantity_available` on booking, we need to increment it back when booking ends.
-    # Or, `quantity_available` represents TOTAL stock, and we calculate *current* availability dynamically.
-    
-    # Given the "Atomic Booking System" requirement:
-    # "Update quantities atomically... eq.quantity_available = F('quantity_available') - 1"
-    # This strongly suggests the user wants a simple decrement approach.
-    # However, that would permanently deplete stock.
-    # I will implement the dynamic check here for display purposes, 
-    # but the booking service will likely need to handle the temporary lock or we assume the prompt 
-    # implies a simpler "decrement for the session" model which might be flawed but requested.
-    
-    # WAIT. "quantity_available" in Equipment model usually means "Total owned by the facility".
-    # If we decrement it, we lose track of total.
-    # Let's assume the prompt's `quantity_available` means "Currently on shelf".
-    # So when a booking starts, we decrement. When it ends, we increment.
-    # But for *future* bookings, we can't just check current value.
-    
-    # CORRECT APPROACH for "Check availability":
-    # Count total items - items booked at that specific slot.
-    
-    unavailable_counts = {}
-    for eq_id in equipment_ids:
-        # Count confirmed bookings using this equipment at this time
-        booked_count = Booking.objects.filter(
-            slot__date=date_obj,
-            slot__start_time=start_time,
-            booking_status='CONFIRMED',
-            equipment__id=eq_id
-        ).count()
-        
-        equipment = Equipment.objects.get(id=eq_id)
-        if booked_count >= equipment.quantity_available:
-             return False
-             
-    return True
+        date=date_obj,
+        start_time__lt=end_time,
+        end_time__gt=start_time
+    ).filter(
+        Q(is_booked=True) | Q(booking__booking_status='CONFIRMED')
+    )
+
+def _expand_cells(court_id, start_time, end_time):
+    return {(court_id, time(h, 0)) for h in get_covered_hours(start_time, end_time)}
+
+class DayAvailabilityGrid:
+    """
+    Courts x hours availability for a single date.
+
+    Built from compact rows: courts from the catalog and one query for the
+    booked cells, instead of one lookup per (court, hour).
+    """
+    def __init__(self, date_obj, courts, booked_cells, hours=None):
+        self.date = date_obj
+        self.courts = courts
+        self.hours = hours if hours is not None else get_operating_hours(courts)
+        self.booked_cells = booked_cells
+        self.open_hours = {c['id']: (c['opening_hour'], c['closing_hour']) for c in courts}
+
+    def is_available(self, court_id, start_time):
+        court_id = int(court_id)
+        opening_hour, closing_hour = self.open_hours.get(court_id, (OPENING_HOUR, CLOSING_HOUR))
+        return (
+            opening_hour <= start_time.hour < closing_hour
+            and (court_id, start_time) not in self.booked_cells
+        )
+
+    def free_court_count(self, start_time):
+        return sum(1 for c in self.courts if self.is_available(c['id'], start_time))
+
+    def available_cells(self):
+        """
+        Yields (court, start_time) for every free cell, hour-major like the original view.
+        """
+        for t in self.hours:
+            for court in self.courts:
+                if self.is_available(court['id'], t):
+                    yield court, t
+
+def get_active_court_rows(court_type=None, court_ids=None):
+    """
+    Returns active courts as plain dicts (id, name, court_type, court_type_display,
+    opening_hour, closing_hour), read from the in-process catalog rather than the database.
+    """
+    courts = get_catalog().active_courts()
+    if court_type:
+        courts = [c for c in courts if c.court_type == court_type]
+    if court_ids:
+        court_ids = {int(c) for c in court_ids}
+        courts = [c for c in courts if c.id in court_ids]
+
+    return [
+        {
+            'id': court.id,
+            'name': court.name,
+            'court_type': court.court_type,
+            'court_type_display': court.get_court_type_display(),
+            'opening_hour': court.opening_hour,
+            'closing_hour': court.closing_hour,
+        }
+        for court in courts
+    ]
+
+def get_booked_cells(court_ids, date_obj):
+    """
+    Returns the set of (court_id, start_time) cells that are taken on a date.
+    A cell is taken if a slot covering that hour is flagged as booked or holds
+    a confirmed booking.
+    """
+    if not court_ids:
+        return set()
+    rows = BookingSlot.objects.filter(
+        court_id__in=court_ids,
+        date=date_obj
+    ).filter(
+        Q(is_booked=True) | Q(booking__booking_status='CONFIRMED')
+    ).values_list('court_id', 'start_time', 'end_time').distinct()
+
+    booked_cells = set()
+    for court_id, start_time, end_time in rows:
+        booked_cells |= _expand_cells(court_id, start_time, end_time)
+    return booked_cells
+
+def get_indexed_booked_cells(court_ids, date_obj):
+    """
+    Same as get_booked_cells but answered from the shared slot index.
+    Returns None if any court-day is not covered, so the caller can query instead.
+    """
+    booked_cells = set()
+    for court_id in court_ids:
+        hours = slot_index.get_booked_hours(court_id, date_obj)
+        if hours is None:
+            return None
+        booked_cells.update((court_id, time(h, 0)) for h in hours)
+    return booked_cells
+
+def get_day_availability_grid(date_obj, court_type=None, court_ids=None):
+    """
+    Builds the availability grid for every active court on a date in at most one query.
+    """
+    courts = get_active_court_rows(court_type=court_type, court_ids=court_ids)
+    booked_cells = get_indexed_booked_cells([c['id'] for c in courts], date_obj)
+    if booked_cells is None:
+        booked_cells = get_booked_cells([c['id'] for c in courts], date_obj)
+    return DayAvailabilityGrid(date_obj, courts, booked_cells)
+
+def iter_availability_range(start_date, end_date, court_type=None, court_ids=None):
+    """
+    Yields a DayAvailabilityGrid for every date from start_date to end_date (inclusive).
+
+    Booked cells for the whole range come from a single query streamed in date
+    order, so only one day's cells are held in memory at a time.
+    """
+    courts = get_active_court_rows(court_type=court_type, court_ids=court_ids)
+    rows = BookingSlot.objects.filter(
+        court_id__in=[c['id'] for c in courts],
+        date__gte=start_date,
+        date__lte=end_date
+    ).filter(
+        Q(is_booked=True) | Q(booking__booking_status='CONFIRMED')
+    ).values_list('date', 'court_id', 'start_time', 'end_time').distinct().order_by('date')
+
+    booked_by_day = groupby(rows.iterator(chunk_size=2000), key=lambda row: row[0])
+    next_day, next_rows = next(booked_by_day, (None, None))
+
+    day = start_date
+    while day <= end_date:
+        booked_cells = set()
+        if next_day == day:
+            for _, court_id, start_time, end_time in next_rows:
+                booked_cells |= _expand_cells(court_id, start_time, end_time)
+            next_day, next_rows = next(booked_by_day, (None, None))
+        yield DayAvailabilityGrid(day, courts, booked_cells)
+        day += timedelta(days=1)
+
+def check_court_availability(court_id, date_obj, start_time, duration_minutes=60):
+    """
+    Check if a court is free for the whole interval starting at start_time.
+    """
+    end_time = get_end_time(start_time, duration_minutes, court=get_catalog().get_court(court_id))
+    hours = get_covered_hours(start_time, end_time)
+
+    # Answer from the shared slot index when it covers this court-day
+    indexed = [slot_index.lookup(court_id, date_obj, time(h, 0)) for h in hours]
+    if None not in indexed:
+        return all(indexed)
+
+    # A slot that doesn't exist yet is free; otherwise any overlapping booked
+    # slot or confirmed booking makes the interval unavailable.
+    return not find_overlapping_slots(court_id, date_obj, start_time, end_time).exists()
+
+def check_equipment_availability(court_id, equipment_ids, date_obj, start_time, duration_minutes=60):
+    """
+    Check if one unit of each requested equipment item is free for the whole booking
+    on the given court (whose hours bound the interval, as for the court check).
+    Reads the hourly reservation ledger; the claim itself happens in booking_service.
+    """
+    end_time = get_end_time(start_time, duration_minutes, court=get_catalog().get_court(court_id))
+    hours = get_covered_hours(start_time, end_time)
+    free = get_equipment_availability(equipment_ids, [(date_obj, h) for h in hours])
+    return all(units > 0 for units in free.values())
 
 def check_coach_availability(coach_id, date_obj, start_time):
     """
-    Check if coach is available.
+    Check if coach is available: scheduled that weekday/hour and not reserved.
+    One query over the indexed weekly schedule and reservation tables.
     """
     if not coach_id:
         return True
-        
-    # Check if coach is already booked
-    is_booked = Booking.objects.filter(
+
+    # One Exists over the reservation row: an exclude() across coach__reservations
+    # would let the date and the hour match two different reservations
+    return CoachWeeklySlot.objects.filter(
+        ~Exists(CoachReservation.objects.filter(
+            coach_id=coach_id,
+            date=date_obj,
+            hour=start_time.hour
+        )),
         coach_id=coach_id,
-        slot__date=date_obj,
-        slot__start_time=start_time,
-        booking_status='CONFIRMED'
+        weekday=date_obj.weekday(),
+        hour=start_time.hour
     ).exists()
-    
-    if is_booked:
-        return False
-        
-    # Check coach's schedule (availability_slots)
-    # availability_slots = {"Mon": ["09:00", "10:00"], ...}
-    coach = Coach.objects.get(id=coach_id)
-    day_name = date_obj.strftime("%a") # Mon, Tue...
-    
-    available_slots = coach.availability_slots.get(day_name, [])
-    # start_time is datetime.time, convert to string "HH:MM"
-    time_str = start_time.strftime("%H:%M")
-    
-    # If the coach has specific slots listed, check if time is in them.
-    # If list is empty or key missing, maybe assume unavailable? Or available?
-    # Let's assume explicit allow-list.
-    if time_str not in available_slots:
-        return False
-        
-    return True
+
+def find_alternative_slots(court_type, date_obj, start_time, coach_id=None, equipment_ids=None,
+                           limit=5, day_window=3, duration_minutes=60):
+    """
+    Returns up to `limit` free (court, date, time) cells nearest to the requested one.
+
+    Booked cells for the whole window come from one range query (see
+    iter_availability_range); coach and equipment constraints are checked
+    against bulk lookups for the same window. Nearness is measured in slot
+    hours, a day away counting as a full operating day.
+    """
+    from booking_app.services.coach_service import get_free_coach_hours_range
+
+    today = timezone.localdate()
+    now_hour = timezone.localtime().hour
+    window_start = max(date_obj - timedelta(days=day_window), today)
+    window_end = date_obj + timedelta(days=day_window)
+    if window_end < window_start:
+        return []
+
+    catalog = get_catalog()
+    grids = list(iter_availability_range(window_start, window_end, court_type=court_type))
+    if not grids or not grids[0].courts:
+        return []
+    hours = grids[0].hours
+
+    coach_free = None
+    if coach_id:
+        coach_free = get_free_coach_hours_range(coach_id, window_start, window_end)
+
+    equipment_blocked = set()
+    if equipment_ids:
+        cells = [(grid.date, t.hour) for grid in grids for t in hours]
+        equipment_blocked = {
+            (d, h) for (_, d, h), units in get_equipment_availability(equipment_ids, cells).items()
+            if units <= 0
+        }
+
+    day_length = len(hours)
+    candidates = []
+    for grid in grids:
+        day_delta = abs((grid.date - date_obj).days)
+        for court, t in grid.available_cells():
+            if grid.date == today and t.hour <= now_hour:
+                continue
+            try:
+                covered = get_covered_hours(t, get_end_time(t, duration_minutes, court=catalog.get_court(court['id'])))
+            except ValidationError:
+                continue
+            if not all(grid.is_available(court['id'], time(h, 0)) for h in covered):
+                continue
+            if coach_free is not None and not all(h in coach_free.get(grid.date, ()) for h in covered):
+                continue
+            if any((grid.date, h) in equipment_blocked for h in covered):
+                continue
+            distance = day_delta * day_length + abs(t.hour - start_time.hour)
+            candidates.append((distance, grid.date, t, court['id'], court))
+
+    candidates.sort(key=lambda c: c[:4])
+    return [
+        {
+            'court_id': court['id'],
+            'court': court['name'],
+            'date': d.isoformat(),
+            'time': t.strftime("%H:%M"),
+        }
+        for _, d, t, _, court in candidates[:limit]
+    ]
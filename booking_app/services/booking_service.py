@@ -1,68 +1,207 @@
-from django.db import transaction
-from django.db.models import F
+from datetime import time, timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.core.exceptions import ValidationError
-from booking_app.models import Booking, Court, Equipment, Coach, BookingSlot, WaitlistEntry
+from django.utils import timezone
+from booking_app.models import (
+    Booking, BookingHold, Court, BookingSlot,
+    CoachWeeklySlot, CoachReservation, WaitlistEntry
+)
 from booking_app.services.pricing_service import PricingEngine
-from booking_app.services.availability_service import check_court_availability, check_coach_availability
-from booking_app.services.notification_service import create_slot_available_notification
+from booking_app.services.availability_service import (
+    check_coach_availability, find_overlapping_slots,
+    get_end_time, get_covered_hours
+)
+from booking_app.services.notification_service import create_booking_cancelled_notifications
+from booking_app.services.waitlist_service import close_queues, enqueue, offer_next
+from booking_app.services import slot_index
+from booking_app.services.slot_generation import iter_missing_slots
+from booking_app.services.locking import booking_transaction, for_update
+from booking_app.services.catalog import get_catalog
+from booking_app.services.inventory_service import (
+    reserve_equipment, release_equipment, reserve_equipment_counts, release_equipment_counts,
+    get_equipment_availability
+)
+from booking_app.services.coach_service import reserve_coach, release_coach
 
-@transaction.atomic
-def create_booking(user, court_id, date_obj, start_time, equipment_ids, coach_id):
+class SlotConflictError(ValidationError):
+    """
+    Raised when another booking got the slot first. Callers that handle
+    ValidationError keep working; APIs can answer 409 instead of 400.
+    """
+
+def _covered_starts(hours):
+    return [time(h) for h in hours]
+
+def lock_slot_rows(court_id, date_obj, starts, end_time):
+    """
+    Locks the slot rows of one court-day in start_time order (see locking),
+    creating any that are missing. Returns {start_time: slot}.
+    """
+    rows = for_update(BookingSlot.objects.filter(
+        court_id=court_id, date=date_obj, start_time__in=starts
+    )).order_by('start_time')
+    slots = {slot.start_time: slot for slot in rows}
+    if len(slots) != len(starts):
+        BookingSlot.objects.bulk_create(
+            [BookingSlot(court_id=court_id, date=date_obj, start_time=t, end_time=end_time) for t in starts],
+            ignore_conflicts=True
+        )
+        slots = {slot.start_time: slot for slot in rows.all()}
+    return slots
+
+def claim_slot_rows(court, date_obj, start_time, end_time, hours):
+    """
+    Claims the slot row for every hour of [start_time, end_time) with one
+    `UPDATE ... WHERE is_booked = false` and returns the starting slot.
+
+    The rows are locked in start_time order first, as the lock policy requires
+    (an UPDATE's own scan order isn't guaranteed, see locking); rows past the
+    pre-generated horizon are created there. If expired holds are in the way
+    they are swept and the claim retried once. Raises SlotConflictError otherwise.
+    """
+    starts = _covered_starts(hours)
+    lock_slot_rows(court.id, date_obj, starts, end_time)
+    claimable = BookingSlot.objects.filter(
+        court_id=court.id, date=date_obj, start_time__in=starts, is_booked=False
+    )
+    claimed = claimable.update(is_booked=True, end_time=end_time)
+    if claimed != len(starts) and sweep_expired_holds(court_id=court.id, date_obj=date_obj):
+        claimed += claimable.update(is_booked=True, end_time=end_time)
+    if claimed != len(starts):
+        raise SlotConflictError("Slot already booked.")
+
+    # Bookings made before covered hours were marked only flag their start slot
+    if find_overlapping_slots(court.id, date_obj, start_time, end_time).exclude(start_time__in=starts).exists():
+        raise SlotConflictError("Slot already booked.")
+    return BookingSlot.objects.get(court_id=court.id, date=date_obj, start_time=start_time)
+
+def create_booking(user, court_id, date_obj, start_time, equipment_ids, coach_id, duration_minutes=60):
+    """
+    Books one slot. BOOKING_CONCURRENCY picks how concurrent writers are kept apart:
+    "optimistic" claims the slot rows with a conditional UPDATE, "pessimistic"
+    locks the court row first and serializes every booking on that court.
+    """
+    if getattr(settings, 'BOOKING_CONCURRENCY', 'optimistic') == 'pessimistic':
+        book = create_booking_locked
+    else:
+        book = create_booking_optimistic
+    return book(user, court_id, date_obj, start_time, equipment_ids, coach_id, duration_minutes)
+
+@booking_transaction('create_booking')
+@slot_index.maintains_index
+def create_booking_optimistic(user, court_id, date_obj, start_time, equipment_ids, coach_id, duration_minutes=60):
+    """
+    Books without locking the court: the slot rows for every covered hour are
+    locked in start_time order and claimed with one `UPDATE ... WHERE is_booked
+    = false` (claim_slot_rows). Only writers after
+    the same hours wait on each other; the loser gets SlotConflictError. The
+    partial unique constraint on confirmed bookings per slot backs this up.
+    """
+    court = get_catalog().get_court(court_id)
+    if court is None or not court.is_active:
+        raise ValidationError("Court not found or inactive.")
+
+    end_time = get_end_time(start_time, duration_minutes, court=court)
+    hours = get_covered_hours(start_time, end_time)
+
+    # 1. Lock and claim the slot and every hour it covers
+    slot = claim_slot_rows(court, date_obj, start_time, end_time, hours)
+
+    # 2. Coach (fast-fail; the reservation below is what guarantees it)
+    if coach_id:
+        if not check_coach_availability(coach_id, date_obj, start_time):
+             raise ValidationError("Coach not available.")
+
+    # 3. Equipment, claimed on the hourly ledger rows
+    equipment_list = []
+    if equipment_ids:
+        equipment_list = get_catalog().get_equipment(equipment_ids)
+        if len(equipment_list) != len(set(map(int, equipment_ids))):
+            raise ValidationError("Some equipment is not available.")
+        reserve_equipment(equipment_ids, date_obj, hours)
+
+    # 4. Price and create the booking
+    total_price = PricingEngine().calculate_total_price(
+        court, date_obj, start_time, equipment_ids, coach_id, duration_minutes
+    )
+    try:
+        with transaction.atomic():
+            booking = Booking.objects.create(
+                user=user,
+                court=court,
+                coach_id=coach_id,
+                slot=slot,
+                total_price=total_price,
+                booking_status='CONFIRMED'
+            )
+    except IntegrityError:
+        # A confirmed booking already points at this slot (e.g. is_booked was reset by hand)
+        raise SlotConflictError("Slot already booked.")
+
+    if equipment_list:
+        booking.equipment.set(equipment_list)
+
+    if coach_id:
+        reserve_coach(coach_id, date_obj, hours, booking=booking)
+
+    slot_index.mark_on_commit(court.id, date_obj, hours, booked=True)
+    return booking
+
+@booking_transaction('create_booking')
+@slot_index.maintains_index
+def create_booking_locked(user, court_id, date_obj, start_time, equipment_ids, coach_id, duration_minutes=60):
     # 1. Lock Court
     # Ensure court exists and is active
     try:
-        court = Court.objects.select_for_update().get(id=court_id, is_active=True)
+        court = for_update(Court.objects.filter(id=court_id, is_active=True)).get()
     except Court.DoesNotExist:
         raise ValidationError("Court not found or inactive.")
 
-    # 2. Check/Create Slot and Lock it
+    # Interval being booked, e.g. 18:00-19:30 covers hour buckets 18 and 19
+    end_time = get_end_time(start_time, duration_minutes, court=court)
+    hours = get_covered_hours(start_time, end_time)
+
+    # 2. Lock the Slot
     # We need to ensure no one else is booking this specific slot right now.
     # If we just check Booking table, there might be a race condition.
-    # So we use BookingSlot as the lock target.
-    slot, created = BookingSlot.objects.get_or_create(
-        court=court,
-        date=date_obj,
-        start_time=start_time,
-        defaults={'end_time': start_time.replace(hour=start_time.hour + 1)} # Assuming 1 hour
-    )
-    
-    # Lock the slot
-    slot = BookingSlot.objects.select_for_update().get(id=slot.id)
-    
-    if slot.is_booked:
-        raise ValidationError("Slot already booked.")
+    # So we use BookingSlot as the lock target: the slot and every hour row
+    # the interval covers, in start_time order. They are normally
+    # pre-generated; missing ones are created past the generated horizon.
+    covered = lock_slot_rows(court.id, date_obj, _covered_starts(hours), end_time)
+    # Expired holds in the way are released, as on the optimistic path
+    if any(row.is_booked for row in covered.values()) and sweep_expired_holds(court_id=court.id, date_obj=date_obj):
+        covered = lock_slot_rows(court.id, date_obj, _covered_starts(hours), end_time)
+    slot = covered[start_time]
+
+    if any(row.is_booked for row in covered.values()):
+        raise SlotConflictError("Slot already booked.")
+
+    # One overlap check covers every other booking on this court that day
+    if find_overlapping_slots(court.id, date_obj, start_time, end_time).exclude(id=slot.id).exists():
+        raise SlotConflictError("Slot already booked.")
+    slot.end_time = end_time
 
     # 3. Check Coach Availability
+    # Fast-fail here; the reservation below is what actually guarantees it
     if coach_id:
         if not check_coach_availability(coach_id, date_obj, start_time):
              raise ValidationError("Coach not available.")
-        # Optional: Lock coach if needed, but availability check might be enough if we don't have a strict slot model for coaches.
-        # For strictness:
-        # coach = Coach.objects.select_for_update().get(id=coach_id)
 
-    # 4. Check and Lock Equipment
-    # The prompt explicitly asked for this logic:
+    # 4. Reserve Equipment
+    # One unit per item for every hour covered, claimed on the hourly ledger rows
     equipment_list = []
     if equipment_ids:
-        # Filter and lock
-        equipment_list = list(Equipment.objects.select_for_update().filter(
-            id__in=equipment_ids,
-            quantity_available__gte=1
-        ))
-        
-        if len(equipment_list) != len(set(equipment_ids)):
+        equipment_list = get_catalog().get_equipment(equipment_ids)
+        if len(equipment_list) != len(set(map(int, equipment_ids))):
             raise ValidationError("Some equipment is not available.")
-
-        # Update quantities atomically (as per prompt requirement)
-        # Note: In a real production app, we'd handle inventory differently (time-based).
-        for eq in equipment_list:
-            eq.quantity_available = F('quantity_available') - 1
-            eq.save()
+        reserve_equipment(equipment_ids, date_obj, hours)
 
     # 5. Calculate Price
     pricing_engine = PricingEngine()
     total_price = pricing_engine.calculate_total_price(
-        court, date_obj, start_time, equipment_ids, coach_id
+        court, date_obj, start_time, equipment_ids, coach_id, duration_minutes
     )
 
     # 6. Create Booking
@@ -78,72 +217,666 @@ def create_booking(user, court_id, date_obj, start_time, equipment_ids, coach_id
     if equipment_list:
         booking.equipment.set(equipment_list)
 
-    # 7. Mark slot as booked
-    slot.is_booked = True
-    slot.save()
+    if coach_id:
+        reserve_coach(coach_id, date_obj, hours, booking=booking)
+
+    # 7. Mark the slot and the hour rows it covers as booked (all locked above)
+    BookingSlot.objects.filter(id__in=[row.id for row in covered.values()]).update(is_booked=True, end_time=end_time)
+    slot_index.mark_on_commit(court.id, date_obj, hours, booked=True)
 
     return booking
 
-@transaction.atomic
+def expand_recurring_items(court_ids, first_date, start_time, weeks, duration_minutes=60,
+                           equipment_ids=None, coach_id=None):
+    """
+    Items for "these courts, this time, every week for N weeks", for create_bookings.
+    """
+    return [
+        {
+            'court_id': int(court_id),
+            'date': first_date + timedelta(weeks=week),
+            'start_time': start_time,
+            'duration_minutes': duration_minutes,
+            'equipment_ids': list(equipment_ids or []),
+            'coach_id': coach_id,
+        }
+        for week in range(weeks)
+        for court_id in court_ids
+    ]
+
+def _plan_batch(items):
+    """
+    Normalizes batch items into plans and records per-item errors found without the database:
+    bad intervals, unpriced dates, unknown equipment, and items that overlap each other
+    (court or coach).
+    """
+    catalog = get_catalog()
+    plans = []
+    for index, item in enumerate(items):
+        plan = {
+            'index': index,
+            'court_id': int(item['court_id']),
+            'date': item['date'],
+            'start_time': item['start_time'],
+            'duration_minutes': int(item.get('duration_minutes', 60)),
+            'equipment_ids': sorted({int(e) for e in item.get('equipment_ids') or []}),
+            'coach_id': int(item['coach_id']) if item.get('coach_id') else None,
+            'error': None,
+        }
+        plans.append(plan)
+        try:
+            plan['end_time'] = get_end_time(
+                plan['start_time'], plan['duration_minutes'], court=catalog.get_court(plan['court_id'])
+            )
+        except ValidationError as e:
+            plan['error'] = e.messages[0]
+            continue
+        plan['hours'] = get_covered_hours(plan['start_time'], plan['end_time'])
+        if catalog.price_schedule.rule_for(plan['date']) is None:
+            plan['error'] = "No pricing rule covers this date."
+        elif len(catalog.get_equipment(plan['equipment_ids'])) != len(plan['equipment_ids']):
+            plan['error'] = "Some equipment is not available."
+
+    # Court-hours and coach-hours claimed by earlier items of the same batch
+    taken = set()
+    for plan in plans:
+        if plan['error']:
+            continue
+        cells = {('court', plan['court_id'], plan['date'], h) for h in plan['hours']}
+        if plan['coach_id']:
+            cells |= {('coach', plan['coach_id'], plan['date'], h) for h in plan['hours']}
+        if cells & taken:
+            plan['error'] = "Overlaps another booking in this batch."
+            continue
+        taken |= cells
+    return plans
+
+def _fail(plan, message, atomic):
+    plan['error'] = message
+    if atomic:
+        raise ValidationError(f"Item {plan['index']}: {message}")
+
+@booking_transaction('create_bookings')
+@slot_index.maintains_index
+def create_bookings(user, items, atomic=True):
+    """
+    Books many (court, date, start_time, duration, equipment, coach) items in one transaction.
+
+    Courts and then slots are locked in (court, date, start_time) order, so two
+    batches touching the same courts cannot deadlock. Conflicts, coach schedules
+    and equipment stock are checked with a handful of set-based queries, every
+    item is priced in one pass and bookings are inserted with bulk_create.
+
+    With atomic=True any failing item raises ValidationError and nothing is
+    booked. With atomic=False failing items are skipped. Returns one
+    {'index', 'booking', 'error'} dict per item, in input order.
+    """
+    plans = _plan_batch(items)
+    for plan in plans:
+        if plan['error'] and atomic:
+            _fail(plan, plan['error'], atomic)
+
+    def pending():
+        return [p for p in plans if not p['error']]
+
+    # 1. Lock courts, lowest id first
+    court_ids = sorted({p['court_id'] for p in pending()})
+    courts = {
+        c.id: c for c in for_update(Court.objects.filter(id__in=court_ids, is_active=True)).order_by('id')
+    }
+    for plan in pending():
+        if plan['court_id'] not in courts:
+            _fail(plan, "Court not found or inactive.", atomic)
+
+    # 2. Lock every covered slot row in (court, date, start_time) order (see locking),
+    # creating any past the pre-generated horizon
+    dates = {p['date'] for p in pending()}
+    for plan in pending():
+        plan['covered'] = [(plan['court_id'], plan['date'], t) for t in _covered_starts(plan['hours'])]
+
+    def lock_slots():
+        return {
+            (s.court_id, s.date, s.start_time): s
+            for s in for_update(BookingSlot.objects.filter(
+                court_id__in=court_ids,
+                date__in=dates,
+                start_time__in={t for p in pending() for _, _, t in p['covered']}
+            )).order_by('court_id', 'date', 'start_time')
+        }
+
+    slots = lock_slots()
+    missing = {(key, p['end_time']) for p in pending() for key in p['covered'] if key not in slots}
+    if missing:
+        BookingSlot.objects.bulk_create(
+            [
+                BookingSlot(court_id=c, date=d, start_time=t, end_time=end_time)
+                for (c, d, t), end_time in sorted(missing)
+            ],
+            ignore_conflicts=True
+        )
+        slots = lock_slots()
+
+    # 3. Court conflicts: every booked interval on these court-days, one query
+    busy = {}
+    for slot_id, court_id, date_obj, start, end in BookingSlot.objects.filter(
+        court_id__in=court_ids, date__in=dates
+    ).filter(
+        Q(is_booked=True) | Q(booking__booking_status='CONFIRMED')
+    ).values_list('id', 'court_id', 'date', 'start_time', 'end_time').distinct():
+        busy.setdefault((court_id, date_obj), []).append((slot_id, start, end))
+    for plan in pending():
+        plan['slot'] = slot = slots[(plan['court_id'], plan['date'], plan['start_time'])]
+        if slot.is_booked or any(
+            start < plan['end_time'] and end > plan['start_time']
+            for slot_id, start, end in busy.get((plan['court_id'], plan['date']), [])
+            if slot_id != slot.id
+        ):
+            _fail(plan, "Slot already booked.", atomic)
+
+    # 4. Coach schedules and existing reservations, two queries
+    coach_ids = {p['coach_id'] for p in pending() if p['coach_id']}
+    if coach_ids:
+        scheduled = set(CoachWeeklySlot.objects.filter(coach_id__in=coach_ids).values_list('coach_id', 'weekday', 'hour'))
+        reserved = set(CoachReservation.objects.filter(
+            coach_id__in=coach_ids, date__in=dates
+        ).values_list('coach_id', 'date', 'hour'))
+        for plan in pending():
+            if plan['coach_id'] and not all(
+                (plan['coach_id'], plan['date'].weekday(), h) in scheduled
+                and (plan['coach_id'], plan['date'], h) not in reserved
+                for h in plan['hours']
+            ):
+                _fail(plan, "Coach not available.", atomic)
+
+    # 5. Equipment stock per (item, date, hour), consumed in item order
+    equipment_ids = {e for p in pending() for e in p['equipment_ids']}
+    if equipment_ids:
+        free = get_equipment_availability(
+            equipment_ids, {(p['date'], h) for p in pending() for h in p['hours']}
+        )
+        for plan in pending():
+            cells = [(e, plan['date'], h) for e in plan['equipment_ids'] for h in plan['hours']]
+            if any(free[cell] < 1 for cell in cells):
+                _fail(plan, "Some equipment is not available.", atomic)
+                continue
+            for cell in cells:
+                free[cell] -= 1
+
+    # 6. Price everything in one pass
+    accepted = pending()
+    breakdowns = PricingEngine().get_price_breakdowns(accepted)
+
+    # 7. Insert bookings, equipment links and coach reservations in bulk
+    bookings = Booking.objects.bulk_create([
+        Booking(
+            user=user,
+            court=courts[plan['court_id']],
+            coach_id=plan['coach_id'],
+            slot=plan['slot'],
+            total_price=breakdown['total'],
+            booking_status='CONFIRMED'
+        )
+        for plan, breakdown in zip(accepted, breakdowns)
+    ])
+    for plan, booking in zip(accepted, bookings):
+        plan['booking'] = booking
+    Booking.equipment.through.objects.bulk_create([
+        Booking.equipment.through(booking_id=plan['booking'].id, equipment_id=e)
+        for plan in accepted
+        for e in plan['equipment_ids']
+    ])
+
+    demand = {}
+    for plan in accepted:
+        for e in plan['equipment_ids']:
+            for h in plan['hours']:
+                demand[(e, plan['date'], h)] = demand.get((e, plan['date'], h), 0) + 1
+    try:
+        # The checks above ran without locking ledger rows; the claims are what guarantee stock
+        with transaction.atomic():
+            reserve_equipment_counts(demand)
+            CoachReservation.objects.bulk_create([
+                CoachReservation(coach_id=plan['coach_id'], date=plan['date'], hour=h, booking=plan['booking'])
+                for plan in accepted if plan['coach_id']
+                for h in plan['hours']
+            ])
+    except (ValidationError, IntegrityError):
+        # A concurrent booking took stock or a coach hour: retry item by item to find out which
+        if atomic:
+            raise ValidationError("Some equipment or coach is no longer available.")
+        for plan in accepted:
+            try:
+                with transaction.atomic():
+                    reserve_equipment(plan['equipment_ids'], plan['date'], plan['hours'])
+                    if plan['coach_id']:
+                        reserve_coach(plan['coach_id'], plan['date'], plan['hours'], booking=plan['booking'])
+            except ValidationError as e:
+                plan['error'] = e.messages[0]
+        Booking.objects.filter(id__in=[p['booking'].id for p in accepted if p['error']]).delete()
+
+    # 8. Mark each slot and the hour rows it covers as booked (all locked in step 2)
+    booked = [p for p in accepted if not p['error']]
+    rows = []
+    for plan in booked:
+        for key in plan['covered']:
+            slots[key].end_time = plan['end_time']
+            slots[key].is_booked = True
+            rows.append(slots[key])
+    BookingSlot.objects.bulk_update(rows, ['end_time', 'is_booked'])
+    for plan in booked:
+        slot_index.mark_on_commit(plan['court_id'], plan['date'], plan['hours'], booked=True)
+
+    return [
+        {
+            'index': plan['index'],
+            'booking': None if plan['error'] else plan.get('booking'),
+            'error': plan['error'],
+        }
+        for plan in plans
+    ]
+
+class HoldExpiredError(ValidationError):
+    """
+    The hold is gone (expired, swept or released) or no longer matches the selection.
+    """
+
+@booking_transaction('create_hold')
+def create_hold(user, court_id, date_obj, start_time, equipment_ids, coach_id, duration_minutes=60, replace=True):
+    """
+    Holds a slot, one unit of each equipment item and the coach for
+    BOOKING_HOLD_SECONDS, at a quoted price. This is the cheap first phase;
+    confirm_hold turns it into a Booking. With replace=True the user's other
+    holds are released first, so re-picking a cell moves the hold.
+    """
+    if replace:
+        _release_holds(for_update(BookingHold.objects.filter(user=user), of=('self',)))
+
+    court = get_catalog().get_court(court_id)
+    if court is None or not court.is_active:
+        raise ValidationError("Court not found or inactive.")
+    end_time = get_end_time(start_time, duration_minutes, court=court)
+    hours = get_covered_hours(start_time, end_time)
+
+    slot = claim_slot_rows(court, date_obj, start_time, end_time, hours)
+
+    if coach_id:
+        if not check_coach_availability(coach_id, date_obj, start_time):
+             raise ValidationError("Coach not available.")
+
+    equipment_ids = sorted({int(e) for e in equipment_ids or []})
+    if equipment_ids:
+        if len(get_catalog().get_equipment(equipment_ids)) != len(equipment_ids):
+            raise ValidationError("Some equipment is not available.")
+        reserve_equipment(equipment_ids, date_obj, hours)
+
+    hold = BookingHold.objects.create(
+        user=user,
+        court=court,
+        slot=slot,
+        end_time=end_time,
+        coach_id=coach_id,
+        equipment_ids=equipment_ids,
+        total_price=PricingEngine().calculate_total_price(
+            court, date_obj, start_time, equipment_ids, coach_id, duration_minutes
+        ),
+        expires_at=timezone.now() + timedelta(seconds=settings.BOOKING_HOLD_SECONDS)
+    )
+    if coach_id:
+        reserve_coach(coach_id, date_obj, hours, hold=hold)
+
+    slot_index.mark_on_commit(court.id, date_obj, hours, booked=True)
+    return hold
+
+@booking_transaction('confirm_hold')
+@slot_index.maintains_index
+def confirm_hold(user, hold_id, expected=None):
+    """
+    Turns a live hold into a confirmed Booking. Slot, equipment and coach were
+    claimed by create_hold, so this only inserts rows.
+
+    `expected` is an optional dict of court_id, date_obj, start_time,
+    duration_minutes, equipment_ids and coach_id; a hold that doesn't match
+    raises HoldExpiredError like an expired one.
+    """
+    try:
+        hold = for_update(BookingHold.objects.select_related('slot'), of=('self',)).get(id=hold_id, user=user)
+    except (BookingHold.DoesNotExist, ValueError):
+        raise HoldExpiredError("Your hold has expired. Please pick the slot again.")
+    if hold.expires_at <= timezone.now():
+        raise HoldExpiredError("Your hold has expired. Please pick the slot again.")
+    if expected is not None and not _hold_matches(hold, **expected):
+        raise HoldExpiredError("Your selection changed since it was held.")
+
+    try:
+        with transaction.atomic():
+            booking = Booking.objects.create(
+                user=user,
+                court_id=hold.court_id,
+                coach_id=hold.coach_id,
+                slot=hold.slot,
+                total_price=hold.total_price,
+                booking_status='CONFIRMED'
+            )
+    except IntegrityError:
+        raise SlotConflictError("Slot already booked.")
+
+    if hold.equipment_ids:
+        booking.equipment.set(hold.equipment_ids)
+    CoachReservation.objects.filter(hold=hold).update(booking=booking, hold=None)
+    hold.delete()
+    return booking
+
+@booking_transaction('release_hold')
+def release_hold(user, hold_id):
+    """
+    Gives a hold's slot, equipment and coach back. Unknown holds are ignored.
+    """
+    return _release_holds(for_update(BookingHold.objects.filter(id=hold_id, user=user), of=('self',))) > 0
+
+@booking_transaction('sweep_expired_holds')
+def sweep_expired_holds(now=None, court_id=None, date_obj=None):
+    """
+    Releases every expired hold (optionally only on one court-day) in a few
+    set-based statements. Holds another transaction has locked are skipped.
+    Returns how many were released.
+    """
+    holds = BookingHold.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+        expires_at__lte=now or timezone.now()
+    )
+    if court_id is not None:
+        holds = holds.filter(court_id=court_id)
+    if date_obj is not None:
+        holds = holds.filter(slot__date=date_obj)
+    return _release_holds(holds)
+
+def get_user_hold(user, date_obj):
+    """
+    The user's live hold on a date, if any (create_hold keeps one per user).
+    """
+    return BookingHold.objects.filter(
+        user=user,
+        slot__date=date_obj,
+        expires_at__gt=timezone.now()
+    ).select_related('slot').order_by('-created_at').first()
+
+def _hold_matches(hold, court_id, date_obj, start_time, duration_minutes, equipment_ids, coach_id):
+    return (
+        hold.court_id == int(court_id)
+        and hold.slot.date == date_obj
+        and hold.slot.start_time == start_time
+        and hold.duration_minutes == int(duration_minutes)
+        and hold.equipment_ids == sorted({int(e) for e in equipment_ids or []})
+        and hold.coach_id == (int(coach_id) if coach_id else None)
+    )
+
+def _release_holds(holds):
+    """
+    Releases the holds in a (locked) queryset: their slot rows are locked in
+    order and freed with one UPDATE, equipment with one per distinct quantity,
+    and one DELETE cascades to their coach reservations. Freed slots are
+    offered to their waitlists once this commits (see _offer_on_commit).
+    """
+    rows = list(holds.values_list(
+        'id', 'court_id', 'slot__date', 'slot__start_time', 'end_time', 'equipment_ids'
+    ))
+    if not rows:
+        return 0
+
+    slots = Q()
+    demand = {}
+    for _, court_id, date_obj, start_time, end_time, equipment_ids in rows:
+        hours = get_covered_hours(start_time, end_time)
+        slots |= Q(court_id=court_id, date=date_obj, start_time__in=_covered_starts(hours))
+        for e in equipment_ids:
+            for h in hours:
+                demand[(e, date_obj, h)] = demand.get((e, date_obj, h), 0) + 1
+        slot_index.mark_on_commit(court_id, date_obj, hours, booked=False)
+
+    freed = list(for_update(BookingSlot.objects.filter(slots)).order_by(
+        'court_id', 'date', 'start_time'
+    ).values_list('id', flat=True))
+    BookingSlot.objects.filter(id__in=freed).update(is_booked=False)
+    release_equipment_counts(demand)
+    BookingHold.objects.filter(id__in=[row[0] for row in rows]).delete()
+    _offer_on_commit(freed)
+    return len(rows)
+
+def _offer_on_commit(slot_ids):
+    """
+    Offers slots freed from holds to the head of their queues after commit,
+    if they are still free then: the releasing transaction often claims them
+    straight back (a hold swept by claim_slot_rows, a hold moved by create_hold).
+    """
+    if WaitlistEntry.objects.filter(requested_slot_id__in=slot_ids, notified=False, position=1).exists():
+        transaction.on_commit(lambda: offer_free_slots(slot_ids))
+
+@booking_transaction('offer_free_slots')
+def offer_free_slots(slot_ids):
+    """
+    Offers each of the slots that is still free to the head of its waitlist.
+    Returns the offered entries.
+    """
+    free = for_update(BookingSlot.objects.filter(id__in=slot_ids, is_booked=False)).order_by(
+        'court_id', 'date', 'start_time'
+    ).values_list('id', flat=True)
+    return offer_next(list(free))
+
+@booking_transaction('cancel_booking')
+@slot_index.maintains_index
 def cancel_booking(booking_id):
     try:
-        booking = Booking.objects.select_for_update().get(id=booking_id)
+        booking = Booking.objects.select_related('slot').get(id=booking_id)
     except Booking.DoesNotExist:
         raise ValidationError("Booking not found.")
 
+    # Lock order (see locking): slot rows of the interval, then the booking
+    slot = booking.slot
+    hours = get_covered_hours(slot.start_time, slot.end_time)
+    covered = lock_slot_rows(slot.court_id, slot.date, _covered_starts(hours), slot.end_time)
+    booking = for_update(Booking.objects.filter(id=booking_id)).get()
+
     if booking.booking_status == 'CANCELLED':
         return booking
 
-    # Restore equipment quantity
-    for eq in booking.equipment.all():
-        # Lock equipment to increment safely
-        eq_locked = Equipment.objects.select_for_update().get(id=eq.id)
-        eq_locked.quantity_available = F('quantity_available') + 1
-        eq_locked.save()
+    # Give back reserved equipment for the hours the booking covered
+    release_equipment(booking.equipment.values_list('id', flat=True), slot.date, hours)
+    # Hour rows inside the interval were claimed along with the slot
+    BookingSlot.objects.filter(id__in=[row.id for row in covered.values()]).update(is_booked=False)
+    slot_index.mark_on_commit(slot.court_id, slot.date, hours, booked=False)
 
-    # Free up the slot
-    slot = booking.slot
-    slot = BookingSlot.objects.select_for_update().get(id=slot.id)
-    slot.is_booked = False
-    slot.save()
+    release_coach(booking)
 
     booking.booking_status = 'CANCELLED'
     booking.save()
     
-    # Check Waitlist
-    next_waitlist = WaitlistEntry.objects.filter(
-        requested_slot=slot, 
-        notified=False
-    ).order_by('created_at').first()
-    
-    if next_waitlist:
-        # Create notification for the user
-        create_slot_available_notification(next_waitlist.user, slot)
-    
+    # A multi-hour booking frees every slot start it covered; offer each to the head of its queue
+    offer_next([row.id for row in covered.values()])
+
     return booking
 
-def join_waitlist(user, court_id, date_obj, start_time):
+# Ids per IN (...) list and ledger cells per OR-ed lookup in the bulk cancellation
+BULK_CHUNK_SIZE = 500
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@booking_transaction('cancel_bookings')
+def cancel_bookings(bookings, reason='', notify_waitlist=True):
+    """
+    Cancels every confirmed booking in the `bookings` queryset with set-based
+    statements, e.g. for a court closure: chunked UPDATEs for bookings and slot
+    rows, one aggregated equipment release, one DELETE of coach reservations
+    per chunk and bulk-created notifications for the owners and, unless
+    `notify_waitlist` is False, for the head of each freed slot's waitlist.
+    Returns {'cancelled': n, 'owners_notified': n, 'waitlist_notified': n}.
+    """
+    rows = {
+        row[0]: row for row in bookings.filter(booking_status='CONFIRMED').values_list(
+            'id', 'user_id', 'slot_id', 'court_id', 'court__name',
+            'slot__date', 'slot__start_time', 'slot__end_time'
+        )
+    }
+    if not rows:
+        return {'cancelled': 0, 'owners_notified': 0, 'waitlist_notified': 0}
+
+    # Lock order (see locking): every slot row of the affected court-days, then the bookings
+    covered = {}
+    for _, _, _, court_id, _, date_obj, start_time, end_time in rows.values():
+        covered.setdefault((court_id, date_obj), set()).update(
+            get_covered_hours(start_time, end_time)
+        )
+    slot_ids = {}
+    for s_id, court_id, date_obj, start_time in for_update(BookingSlot.objects.filter(
+        court_id__in={court_id for court_id, _ in covered},
+        date__in={date_obj for _, date_obj in covered}
+    )).order_by('court_id', 'date', 'start_time').values_list('id', 'court_id', 'date', 'start_time'):
+        slot_ids[(court_id, date_obj, start_time)] = s_id
+
+    locked = set()
+    for chunk in _chunks(sorted(rows)):
+        locked.update(for_update(
+            Booking.objects.filter(id__in=chunk, booking_status='CONFIRMED')
+        ).order_by('id').values_list('id', flat=True))
+    # Cancelled concurrently between the read and the lock: already released
+    rows = {booking_id: row for booking_id, row in rows.items() if booking_id in locked}
+    booking_ids = sorted(rows)
+
+    demand = {}
+    for chunk in _chunks(booking_ids):
+        for booking_id, eq_id in Booking.equipment.through.objects.filter(
+            booking_id__in=chunk
+        ).values_list('booking_id', 'equipment_id'):
+            _, _, _, _, _, date_obj, start_time, end_time = rows[booking_id]
+            for h in get_covered_hours(start_time, end_time):
+                demand[(eq_id, date_obj, h)] = demand.get((eq_id, date_obj, h), 0) + 1
+    for cells in _chunks(sorted(demand)):
+        release_equipment_counts({cell: demand[cell] for cell in cells})
+
+    for chunk in _chunks(booking_ids):
+        CoachReservation.objects.filter(booking_id__in=chunk).delete()
+        Booking.objects.filter(id__in=chunk).update(booking_status='CANCELLED')
+
+    freed = set()
+    hours_by_day = {}
+    for _, _, _, court_id, _, date_obj, start_time, end_time in rows.values():
+        hours = get_covered_hours(start_time, end_time)
+        hours_by_day.setdefault((court_id, date_obj), set()).update(hours)
+        freed.update(
+            slot_ids[(court_id, date_obj, t)] for t in _covered_starts(hours)
+            if (court_id, date_obj, t) in slot_ids
+        )
+    for chunk in _chunks(sorted(freed)):
+        BookingSlot.objects.filter(id__in=chunk).update(is_booked=False)
+    for (court_id, date_obj), hours in hours_by_day.items():
+        slot_index.mark_on_commit(court_id, date_obj, sorted(hours), booked=False)
+
+    owners = create_booking_cancelled_notifications(
+        [
+            (booking_id, user_id, s_id, court_name, date_obj, start_time)
+            for booking_id, user_id, s_id, _, court_name, date_obj, start_time, _ in rows.values()
+        ],
+        reason=reason
+    )
+
+    offered = []
+    if notify_waitlist:
+        for chunk in _chunks(sorted(freed)):
+            offered.extend(offer_next(chunk))
+
+    return {'cancelled': len(rows), 'owners_notified': len(owners), 'waitlist_notified': len(offered)}
+
+@booking_transaction('cancel_court_bookings')
+def cancel_court_bookings(court_id, start_date, end_date, reason='', notify_waitlist=True):
+    """
+    Court closure from start_date to end_date inclusive: releases holds,
+    cancels confirmed bookings (see cancel_bookings) and keeps every slot row
+    of the range claimed, so nothing on the court can be booked, held or
+    offered until reopen_court. Waitlisted users leave the queue and, unless
+    `notify_waitlist` is False, get a closure notice instead of an offer.
+    """
     court = Court.objects.get(id=court_id)
-    slot, created = BookingSlot.objects.get_or_create(
-        court=court,
-        date=date_obj,
-        start_time=start_time,
-        defaults={'end_time': start_time.replace(hour=start_time.hour + 1)}
+    days = (end_date - start_date).days + 1
+
+    # Lock order (see locking): holds, then every slot row of the range
+    holds = for_update(
+        BookingHold.objects.filter(court_id=court_id, slot__date__range=(start_date, end_date)),
+        of=('self',)
     )
-    
-    if not slot.is_booked:
-        raise ValidationError("Slot is available, you can book it directly.")
-        
-    # Check if already in waitlist
-    if WaitlistEntry.objects.filter(user=user, requested_slot=slot).exists():
-        raise ValidationError("You are already on the waitlist for this slot.")
-        
-    position = WaitlistEntry.objects.filter(requested_slot=slot).count() + 1
-    
-    entry = WaitlistEntry.objects.create(
-        user=user,
-        requested_slot=slot,
-        court=court,
-        position=position
+    list(holds.values_list('id', flat=True))
+    BookingSlot.objects.bulk_create(
+        iter_missing_slots([court], start_date, days),
+        batch_size=settings.SLOT_PREGENERATE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    slot_ids = list(for_update(
+        BookingSlot.objects.filter(court_id=court_id, date__range=(start_date, end_date))
+    ).order_by('date', 'start_time').values_list('id', flat=True))
+
+    released = _release_holds(holds)
+    result = cancel_bookings(
+        Booking.objects.filter(court_id=court_id, slot__date__range=(start_date, end_date)),
+        reason=reason,
+        notify_waitlist=False
     )
-    return entry
+    for chunk in _chunks(slot_ids):
+        BookingSlot.objects.filter(id__in=chunk).update(is_booked=True)
+    for day in range(days):
+        slot_index.mark_on_commit(
+            court_id, start_date + timedelta(days=day), list(range(court.opening_hour, court.closing_hour)),
+            booked=True
+        )
+
+    result['waitlist_notified'] = sum(
+        close_queues(chunk, reason=reason, notify=notify_waitlist) for chunk in _chunks(slot_ids)
+    )
+    result['holds_released'] = released
+    return result
+
+@booking_transaction('reopen_court')
+def reopen_court(court_id, start_date, end_date):
+    """
+    Ends a closure (cancel_court_bookings): frees the court's slot rows from
+    start_date to end_date inclusive that no confirmed booking or hold covers,
+    and offers them to anyone who queued meanwhile. Returns how many were freed.
+    """
+    rows = list(for_update(
+        BookingSlot.objects.filter(court_id=court_id, date__range=(start_date, end_date), is_booked=True)
+    ).order_by('date', 'start_time').values_list('id', 'date', 'start_time'))
+
+    booked = Booking.objects.filter(
+        court_id=court_id, slot__date__range=(start_date, end_date), booking_status='CONFIRMED'
+    ).values_list('slot__date', 'slot__start_time', 'slot__end_time')
+    held = BookingHold.objects.filter(
+        court_id=court_id, slot__date__range=(start_date, end_date)
+    ).values_list('slot__date', 'slot__start_time', 'end_time')
+    taken = set()
+    for date_obj, start_time, end_time in list(booked) + list(held):
+        taken.update((date_obj, t) for t in _covered_starts(get_covered_hours(start_time, end_time)))
+
+    freed = [(s_id, date_obj, t) for s_id, date_obj, t in rows if (date_obj, t) not in taken]
+    for chunk in _chunks([s_id for s_id, _, _ in freed]):
+        BookingSlot.objects.filter(id__in=chunk).update(is_booked=False)
+    hours_by_day = {}
+    for _, date_obj, t in freed:
+        hours_by_day.setdefault(date_obj, []).append(t.hour)
+    for date_obj, hours in hours_by_day.items():
+        slot_index.mark_on_commit(court_id, date_obj, hours, booked=False)
+
+    for chunk in _chunks([s_id for s_id, _, _ in freed]):
+        offer_next(chunk)
+    return len(freed)
+
+@booking_transaction('join_waitlist')
+def join_waitlist(user, court_id, date_obj, start_time):
+    court = Court.objects.get(id=court_id)
+    end_time = get_end_time(start_time, court=court)
+    # The slot row serializes its queue (see waitlist_service)
+    slot = lock_slot_rows(court.id, date_obj, [start_time], end_time)[start_time]
+
+    # The hour may be taken by a longer booking that started earlier
+    if not slot.is_booked and not find_overlapping_slots(court.id, date_obj, start_time, end_time).exists():
+        raise ValidationError("Slot is available, you can book it directly.")
+
+    return enqueue(user, slot)
@@ -0,0 +1,100 @@
+"""
+Process-local cache of reference data: courts, equipment, coaches and the
+active pricing rules, compiled into a PriceSchedule.
+
+This data changes rarely, so each worker keeps one snapshot in memory. A
+version token in the shared Django cache is replaced whenever an admin edit
+commits (see booking_app.signals); workers compare it at most once every
+CATALOG_VERSION_CHECK_SECONDS and reload on mismatch.
+"""
+import threading
+import time as _time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'booking_app:catalog_version'
+
+_lock = threading.Lock()
+_catalog = None
+_checked_at = 0.0
+
+
+class Catalog:
+    def __init__(self, version):
+        from booking_app.models import Coach, Court, Equipment, Holiday, PeakWindow, PricingRule
+        from booking_app.services.price_schedule import PriceSchedule
+
+        self.version = version
+        self.courts = {c.id: c for c in Court.objects.order_by('id')}
+        self.equipment = {e.id: e for e in Equipment.objects.order_by('id')}
+        self.coaches = {c.id: c for c in Coach.objects.order_by('id')}
+
+        # Active rules compiled into per-court-type time-of-week tables
+        rules = list(PricingRule.objects.filter(is_active=True).order_by('id'))
+        # Fallback default if no rule exists
+        self.pricing_rule = rules[0] if rules else PricingRule()
+        self.price_schedule = PriceSchedule(
+            rules or [self.pricing_rule],
+            list(PeakWindow.objects.filter(rule__is_active=True)),
+            list(Holiday.objects.all()),
+            [court_type for court_type, _ in Court.COURT_TYPES]
+        )
+
+    def get_court(self, court_id):
+        return self.courts.get(int(court_id))
+
+    def active_courts(self):
+        return [c for c in self.courts.values() if c.is_active]
+
+    def get_equipment(self, equipment_ids):
+        return [self.equipment[i] for i in sorted({int(e) for e in equipment_ids}) if i in self.equipment]
+
+    def get_coach(self, coach_id):
+        if not coach_id:
+            return None
+        return self.coaches.get(int(coach_id))
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        # Another worker may have set it first; use whichever won
+        cache.add(VERSION_KEY, version, None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def get_catalog():
+    """
+    Returns the current Catalog snapshot, reloading it if another worker bumped the version.
+    """
+    global _catalog, _checked_at
+    now = _time.monotonic()
+    interval = getattr(settings, 'CATALOG_VERSION_CHECK_SECONDS', 1)
+    catalog = _catalog
+    if catalog is not None and now - _checked_at < interval:
+        return catalog
+
+    with _lock:
+        version = _shared_version()
+        if _catalog is None or _catalog.version != version:
+            _catalog = Catalog(version)
+        _checked_at = now
+        return _catalog
+
+
+def invalidate():
+    """
+    Publishes a new version once the current transaction commits, so every
+    worker reloads after the edit is visible.
+    """
+    def bump():
+        global _catalog
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        _catalog = None
+
+    transaction.on_commit(bump)
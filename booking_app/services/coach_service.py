@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from booking_app.models import Coach, CoachWeeklySlot, CoachReservation
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+def parse_availability_slots(availability_slots):
+    """
+    Turns {"Mon": ["09:00", "10:00"], ...} into a set of (weekday, hour) pairs.
+    Unknown day names and malformed times are skipped.
+    """
+    pairs = set()
+    for day_name, times in (availability_slots or {}).items():
+        if day_name not in WEEKDAY_NAMES:
+            continue
+        for time_str in times or []:
+            try:
+                hour = datetime.strptime(time_str, "%H:%M").hour
+            except (TypeError, ValueError):
+                continue
+            pairs.add((WEEKDAY_NAMES.index(day_name), hour))
+    return pairs
+
+def sync_weekly_schedule(coach):
+    """
+    Rebuilds a coach's CoachWeeklySlot rows from its availability_slots JSON.
+    """
+    with transaction.atomic():
+        CoachWeeklySlot.objects.filter(coach=coach).delete()
+        CoachWeeklySlot.objects.bulk_create([
+            CoachWeeklySlot(coach=coach, weekday=weekday, hour=hour)
+            for weekday, hour in sorted(parse_availability_slots(coach.availability_slots))
+        ])
+
+def reserve_coach(coach_id, date_obj, hours, booking=None, hold=None):
+    """
+    Claims a coach for the given hours, for a booking or a BookingHold. Raises
+    ValidationError if the coach is off-schedule or another booking already
+    holds any of the hours.
+    """
+    scheduled = CoachWeeklySlot.objects.filter(
+        coach_id=coach_id,
+        weekday=date_obj.weekday(),
+        hour__in=list(hours)
+    ).count()
+    if scheduled != len(hours):
+        raise ValidationError("Coach not available.")
+
+    try:
+        with transaction.atomic():
+            CoachReservation.objects.bulk_create([
+                CoachReservation(coach_id=coach_id, date=date_obj, hour=h, booking=booking, hold=hold)
+                for h in hours
+            ])
+    except IntegrityError:
+        raise ValidationError("Coach not available.")
+
+def release_coach(booking):
+    CoachReservation.objects.filter(booking=booking).delete()
+
+def get_available_coaches(date_obj, start_time):
+    """
+    Coaches scheduled and not yet reserved at (date, time), as value rows, in one query.
+    """
+    reserved = CoachReservation.objects.filter(date=date_obj, hour=start_time.hour).values('coach_id')
+    return list(
+        Coach.objects.filter(
+            weekly_slots__weekday=date_obj.weekday(),
+            weekly_slots__hour=start_time.hour
+        ).exclude(
+            id__in=reserved
+        ).order_by('id').values('id', 'name', 'hourly_rate')
+    )
+
+def get_free_coach_hours(date_obj, hours):
+    """
+    Returns {coach_id: set of free hours} for a day, from two queries.
+    """
+    hours = [t.hour for t in hours]
+    free = {}
+    for coach_id, hour in CoachWeeklySlot.objects.filter(
+        weekday=date_obj.weekday(), hour__in=hours
+    ).values_list('coach_id', 'hour'):
+        free.setdefault(coach_id, set()).add(hour)
+    for coach_id, hour in CoachReservation.objects.filter(
+        date=date_obj, hour__in=hours
+    ).values_list('coach_id', 'hour'):
+        free.get(coach_id, set()).discard(hour)
+    return free
+
+def get_free_coach_hours_range(coach_id, start_date, end_date):
+    """
+    Returns {date: set of free hours} for one coach across a date range, from two queries.
+    """
+    weekly = {}
+    for weekday, hour in CoachWeeklySlot.objects.filter(coach_id=coach_id).values_list('weekday', 'hour'):
+        weekly.setdefault(weekday, set()).add(hour)
+    reserved = set(
+        CoachReservation.objects.filter(
+            coach_id=coach_id, date__gte=start_date, date__lte=end_date
+        ).values_list('date', 'hour')
+    )
+
+    free = {}
+    day = start_date
+    while day <= end_date:
+        free[day] = {h for h in weekly.get(day.weekday(), ()) if (day, h) not in reserved}
+        day += timedelta(days=1)
+    return free
@@ -0,0 +1,277 @@
+"""
+Contention benchmark for the booking write paths.
+
+N worker threads (each with its own database connection) issue a mix of
+create_booking, cancel_booking and join_waitlist calls against a few court-days.
+A `hotspot` share of the picks goes to a small set of hot slots, the rest is
+spread over every slot in range. The report covers throughput, latency
+percentiles per operation, lock waits and retries, then checks the invariants
+every locking change must keep: no slot hour held by two confirmed bookings
+and no equipment hour reserved past its stock.
+"""
+import math
+import random
+import threading
+import time as _time
+from datetime import time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+
+from booking_app.models import Booking, Court, EquipmentReservation, WaitlistEntry, WaitlistNotification
+from booking_app.services.availability_service import get_covered_hours
+from booking_app.services.booking_service import (
+    SlotConflictError, cancel_booking, cancel_bookings, create_booking, join_waitlist
+)
+from booking_app.services.locking import LockContentionError, get_retry_stats
+
+BENCH_USER_PREFIX = 'bench_user_'
+OPERATIONS = ('book', 'cancel', 'waitlist')
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(p * len(ordered)) - 1, 0)]
+
+
+class LockWaitSampler(threading.Thread):
+    """
+    Samples how many backends are waiting on a lock (PostgreSQL only).
+    SQLite has no row locks; its busy waits show up as latency and retries.
+    """
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._done.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE wait_event_type = 'Lock' AND datname = current_database()"
+                    )
+                    self.samples.append(cursor.fetchone()[0])
+                    self._done.wait(self.interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class ContentionBenchmark:
+    def __init__(self, threads=8, operations=200, mix=(70, 20, 10), court_ids=None,
+                 start_date=None, days=1, hotspot=0.8, hot_slots=2, equipment_ids=(),
+                 equipment_share=0.3, long_share=0.2, seed=None):
+        self.threads = threads
+        self.operations = operations
+        self.mix = mix
+        self.court_ids = court_ids
+        self.start_date = start_date
+        self.days = days
+        self.hotspot = hotspot
+        self.hot_slots = hot_slots
+        self.equipment_ids = list(equipment_ids)
+        self.equipment_share = equipment_share
+        self.long_share = long_share
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.results = {op: [] for op in OPERATIONS}
+
+    def _slots(self):
+        courts = Court.objects.filter(is_active=True).order_by('id')
+        if self.court_ids:
+            courts = courts.filter(id__in=self.court_ids)
+        slots = [
+            (court.id, self.start_date + timedelta(days=i), time(h))
+            for i in range(self.days)
+            for court in courts
+            for h in range(court.opening_hour, court.closing_hour - 1)
+        ]
+        if not slots:
+            raise ValidationError("No active courts to benchmark.")
+        return slots
+
+    def _users(self):
+        User = get_user_model()
+        return [
+            User.objects.get_or_create(username=f'{BENCH_USER_PREFIX}{i}')[0]
+            for i in range(self.threads)
+        ]
+
+    def _pick(self, rng, slots):
+        if rng.random() < self.hotspot:
+            return rng.choice(slots[:self.hot_slots])
+        return rng.choice(slots)
+
+    def _worker(self, index, user, slots, barrier):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        mine = []
+        results = {op: [] for op in OPERATIONS}
+        barrier.wait()
+        try:
+            for _ in range(self.operations):
+                op = rng.choices(OPERATIONS, weights=self.mix)[0]
+                if op == 'cancel' and not mine:
+                    op = 'book'
+                court_id, date_obj, start_time = self._pick(rng, slots)
+                began = _time.perf_counter()
+                try:
+                    if op == 'book':
+                        equipment = (
+                            [rng.choice(self.equipment_ids)]
+                            if self.equipment_ids and rng.random() < self.equipment_share else []
+                        )
+                        duration = 120 if rng.random() < self.long_share else 60
+                        booking = create_booking(user, court_id, date_obj, start_time, equipment, None, duration)
+                        mine.append(booking.id)
+                    elif op == 'cancel':
+                        cancel_booking(mine.pop(rng.randrange(len(mine))))
+                    else:
+                        join_waitlist(user, court_id, date_obj, start_time)
+                    outcome = 'ok'
+                except LockContentionError:
+                    outcome = 'busy'
+                except SlotConflictError:
+                    outcome = 'conflict'
+                except ValidationError:
+                    outcome = 'rejected'
+                except Exception:
+                    outcome = 'error'
+                results[op].append((outcome, _time.perf_counter() - began))
+        finally:
+            connections.close_all()
+        with self._lock:
+            for op, rows in results.items():
+                self.results[op].extend(rows)
+
+    def run(self):
+        slots = self._slots()
+        users = self._users()
+        retries_before = get_retry_stats()
+        sampler = LockWaitSampler() if connection.vendor == 'postgresql' else None
+
+        barrier = threading.Barrier(self.threads + 1)
+        workers = [
+            threading.Thread(target=self._worker, args=(i, users[i], slots, barrier))
+            for i in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        if sampler:
+            sampler.start()
+        barrier.wait()
+        began = _time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = _time.perf_counter() - began
+        if sampler:
+            sampler.stop()
+
+        return {
+            'elapsed': elapsed,
+            'throughput': sum(len(rows) for rows in self.results.values()) / elapsed if elapsed else 0.0,
+            'operations': {op: self._summarize(rows) for op, rows in self.results.items()},
+            'retries': self._retry_delta(retries_before, get_retry_stats()),
+            'lock_wait': self._lock_wait(sampler),
+            'invariants': self.check_invariants(slots),
+        }
+
+    def _summarize(self, rows):
+        latencies = [seconds * 1000 for _, seconds in rows]
+        outcomes = {}
+        for outcome, _ in rows:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        return {
+            'count': len(rows),
+            'outcomes': outcomes,
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(max(latencies, default=0.0), 2),
+        }
+
+    def _retry_delta(self, before, after):
+        return {
+            operation: {
+                outcome: counts[f'{outcome}_this_worker'] - before.get(operation, {}).get(f'{outcome}_this_worker', 0)
+                for outcome in ('retried', 'exhausted', 'lock_busy')
+            }
+            for operation, counts in after.items()
+            if operation in ('create_booking', 'cancel_booking', 'join_waitlist')
+        }
+
+    def _lock_wait(self, sampler):
+        if sampler is None or not sampler.samples:
+            return None
+        samples = sampler.samples
+        return {
+            'samples': len(samples),
+            'share_with_waiters': round(sum(1 for n in samples if n) / len(samples), 4),
+            'mean_waiters': round(sum(samples) / len(samples), 2),
+            'max_waiters': max(samples),
+        }
+
+    def check_invariants(self, slots):
+        """
+        Double-booked hours (two confirmed bookings covering one court hour),
+        overbooked equipment hours and ledger drift (reserved units that don't
+        match the confirmed bookings using them) on the benchmarked court-days.
+        """
+        court_ids = {court_id for court_id, _, _ in slots}
+        dates = {date_obj for _, date_obj, _ in slots}
+        bookings = Booking.objects.filter(
+            court_id__in=court_ids, slot__date__in=dates, booking_status='CONFIRMED'
+        ).values_list('id', 'court_id', 'slot__date', 'slot__start_time', 'slot__end_time')
+
+        held = {}
+        hours_by_booking = {}
+        for booking_id, court_id, date_obj, start_time, end_time in bookings:
+            hours = get_covered_hours(start_time, end_time)
+            hours_by_booking[booking_id] = (date_obj, hours)
+            for h in hours:
+                held[(court_id, date_obj, h)] = held.get((court_id, date_obj, h), 0) + 1
+        double_booked = sorted(key for key, n in held.items() if n > 1)
+
+        expected = {}
+        for booking_id, eq_id in Booking.equipment.through.objects.filter(
+            booking_id__in=list(hours_by_booking)
+        ).values_list('booking_id', 'equipment_id'):
+            date_obj, hours = hours_by_booking[booking_id]
+            for h in hours:
+                expected[(eq_id, date_obj, h)] = expected.get((eq_id, date_obj, h), 0) + 1
+        # Other courts share the equipment pool, so drift is only judged when
+        # the benchmark covers every active court
+        full_pool = court_ids >= set(Court.objects.filter(is_active=True).values_list('id', flat=True))
+        overbooked, drift = [], []
+        for eq_id, date_obj, h, capacity, reserved in EquipmentReservation.objects.filter(
+            date__in=dates
+        ).values_list('equipment_id', 'date', 'hour', 'capacity', 'quantity_reserved'):
+            if reserved > capacity:
+                overbooked.append((eq_id, date_obj, h))
+            if full_pool and reserved != expected.get((eq_id, date_obj, h), 0):
+                drift.append((eq_id, date_obj, h))
+
+        return {
+            'ok': not double_booked and not overbooked and not drift,
+            'double_booked_hours': double_booked,
+            'overbooked_equipment_hours': overbooked,
+            'equipment_ledger_drift': drift if full_pool else None,
+        }
+
+    def cleanup(self):
+        """
+        Cancels and deletes what the bench users created.
+        """
+        User = get_user_model()
+        users = User.objects.filter(username__startswith=BENCH_USER_PREFIX)
+        cancel_bookings(Booking.objects.filter(user__in=users), notify_waitlist=False)
+        Booking.objects.filter(user__in=users).delete()
+        WaitlistEntry.objects.filter(user__in=users).delete()
+        WaitlistNotification.objects.filter(user__in=users).delete()
@@ -0,0 +1,162 @@
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils import timezone
+from booking_app.models import Equipment, EquipmentReservation
+from booking_app.services.locking import for_update
+
+def _ensure_ledger_rows(equipment_ids, date_obj, hours):
+    """
+    Creates missing (equipment, date, hour) rows, seeded with current stock as capacity.
+    """
+    stock = dict(Equipment.objects.filter(id__in=equipment_ids).values_list('id', 'quantity_available'))
+    EquipmentReservation.objects.bulk_create(
+        [
+            EquipmentReservation(equipment_id=eq_id, date=date_obj, hour=h, capacity=qty)
+            for eq_id, qty in stock.items()
+            for h in hours
+        ],
+        ignore_conflicts=True
+    )
+    return stock
+
+def _lock_ledger_rows(rows):
+    """
+    Locks ledger rows in (equipment, date, hour) order before a multi-row UPDATE,
+    whose own scan order isn't guaranteed (see locking).
+    """
+    list(for_update(rows).order_by('equipment_id', 'date', 'hour').values_list('id', flat=True))
+
+def _match_cells(cells):
+    match = Q()
+    for eq_id, date_obj, h in cells:
+        match |= Q(equipment_id=eq_id, date=date_obj, hour=h)
+    return match
+
+def reserve_equipment(equipment_ids, date_obj, hours):
+    """
+    Reserves one unit of each equipment item for every given hour.
+    Each unit is claimed by a conditional UPDATE on its own (equipment, date, hour)
+    row, so bookings for other hours or days never wait on each other.
+    Call inside a transaction: a failed claim raises and rolls back earlier ones.
+    """
+    equipment_ids = sorted({int(e) for e in equipment_ids})
+    if not equipment_ids:
+        return
+    stock = _ensure_ledger_rows(equipment_ids, date_obj, hours)
+    if len(stock) != len(equipment_ids):
+        raise ValidationError("Some equipment is not available.")
+
+    for eq_id in equipment_ids:
+        for h in hours:
+            claimed = EquipmentReservation.objects.filter(
+                equipment_id=eq_id,
+                date=date_obj,
+                hour=h,
+                quantity_reserved__lt=F('capacity')
+            ).update(quantity_reserved=F('quantity_reserved') + 1)
+            if not claimed:
+                raise ValidationError("Some equipment is not available.")
+
+def release_equipment(equipment_ids, date_obj, hours):
+    """
+    Gives back one unit of each equipment item for every given hour.
+    """
+    equipment_ids = {int(e) for e in equipment_ids}
+    if not equipment_ids:
+        return
+    rows = EquipmentReservation.objects.filter(
+        equipment_id__in=equipment_ids,
+        date=date_obj,
+        hour__in=list(hours),
+        quantity_reserved__gt=0
+    )
+    _lock_ledger_rows(rows)
+    rows.update(quantity_reserved=F('quantity_reserved') - 1)
+
+def release_equipment_counts(demand):
+    """
+    Bulk form of release_equipment: gives back n units for each (equipment_id, date, hour)
+    in `demand` ({cell: n}), one UPDATE per distinct n.
+    """
+    if not demand:
+        return
+    _lock_ledger_rows(EquipmentReservation.objects.filter(_match_cells(demand)))
+
+    by_count = {}
+    for cell, n in demand.items():
+        by_count.setdefault(n, []).append(cell)
+    for n, cells in sorted(by_count.items()):
+        match = _match_cells(cells)
+        EquipmentReservation.objects.filter(
+            match,
+            quantity_reserved__gte=n
+        ).update(quantity_reserved=F('quantity_reserved') - n)
+
+def get_equipment_availability(equipment_ids, cells):
+    """
+    Bulk availability: units free for each equipment id at each (date, hour) cell.
+    Returns {(equipment_id, date, hour): units_free} using two queries.
+    """
+    equipment_ids = {int(e) for e in equipment_ids}
+    cells = set(cells)
+    if not equipment_ids or not cells:
+        return {}
+
+    stock = dict(Equipment.objects.filter(id__in=equipment_ids).values_list('id', 'quantity_available'))
+    reserved = {}
+    rows = EquipmentReservation.objects.filter(
+        equipment_id__in=equipment_ids,
+        date__in={d for d, _ in cells},
+        hour__in={h for _, h in cells}
+    ).values_list('equipment_id', 'date', 'hour', 'capacity', 'quantity_reserved')
+    for eq_id, date_obj, h, capacity, qty in rows:
+        reserved[(eq_id, date_obj, h)] = (capacity, qty)
+
+    availability = {}
+    for eq_id in equipment_ids:
+        for date_obj, h in cells:
+            capacity, qty = reserved.get((eq_id, date_obj, h), (stock.get(eq_id, 0), 0))
+            availability[(eq_id, date_obj, h)] = max(capacity - qty, 0)
+    return availability
+
+def sync_equipment_capacity(equipment):
+    """
+    Applies a stock change to ledger rows from today onward.
+    """
+    EquipmentReservation.objects.filter(
+        equipment=equipment,
+        date__gte=timezone.localdate()
+    ).update(capacity=equipment.quantity_available)
+
+def reserve_equipment_counts(demand):
+    """
+    Bulk form of reserve_equipment: claims n units for each (equipment_id, date, hour)
+    in `demand` ({cell: n}). Cells needing the same n are claimed by one conditional
+    UPDATE; if it matches fewer rows than cells, some cell lacked stock.
+    Call inside a transaction: a failed claim raises and rolls back earlier ones.
+    """
+    if not demand:
+        return
+    stock = dict(
+        Equipment.objects.filter(id__in={eq_id for eq_id, _, _ in demand}).values_list('id', 'quantity_available')
+    )
+    EquipmentReservation.objects.bulk_create(
+        [
+            EquipmentReservation(equipment_id=eq_id, date=date_obj, hour=h, capacity=stock.get(eq_id, 0))
+            for eq_id, date_obj, h in sorted(demand)
+        ],
+        ignore_conflicts=True
+    )
+    _lock_ledger_rows(EquipmentReservation.objects.filter(_match_cells(demand)))
+
+    by_count = {}
+    for cell, n in demand.items():
+        by_count.setdefault(n, []).append(cell)
+    for n, cells in sorted(by_count.items()):
+        match = _match_cells(cells)
+        claimed = EquipmentReservation.objects.filter(
+            match,
+            quantity_reserved__lte=F('capacity') - n
+        ).update(quantity_reserved=F('quantity_reserved') + n)
+        if claimed != len(cells):
+            raise ValidationError("Some equipment is not available.")
@@ -0,0 +1,199 @@
+"""
+Lock ordering and retry policy for booking-service transactions.
+
+Every transaction that takes row locks acquires them in this order, and
+within one table in ascending key order:
+
+    1. BookingHold           (id)
+    2. Court                 (id)
+    3. BookingSlot           (court_id, date, start_time)
+    4. Booking               (id)
+    5. EquipmentReservation  (equipment_id, date, hour)
+    6. CoachReservation      (coach_id, date, hour)
+    7. WaitlistEntry         (requested_slot_id, position), only while its slot row is held
+
+SKIP LOCKED reads (the hold sweep) never wait, so they may run at any point.
+Deadlocks and serialization failures that still happen (e.g. index page
+locks, SQLite's database lock) are retried by `retry_on_conflict` with
+jittered exponential backoff, and counted per operation.
+
+No transaction waits long on a lock another one holds (BOOKING_LOCK_WAIT):
+"timeout" bounds every wait with PostgreSQL's lock_timeout, "nowait" also
+makes SELECT ... FOR UPDATE fail at once, "block" waits as long as it takes.
+A lock that can't be had, or contention that outlasts the retries, surfaces
+as LockContentionError, which the API returns as 409 with a Retry-After hint.
+"""
+import functools
+import logging
+import random
+import threading
+import time as _time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, transaction
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE codes worth retrying: deadlock_detected, serialization_failure
+RETRYABLE_SQLSTATES = {'40P01', '40001'}
+# lock_not_available: raised by NOWAIT and by an expired lock_timeout
+LOCK_NOT_AVAILABLE = '55P03'
+COUNTER_KEY = 'booking_app:retries:{operation}:{outcome}'
+OUTCOMES = ('retried', 'exhausted', 'lock_busy')
+
+# Operations wrapped in booking_service; listed so stats show zeros too
+RETRIED_OPERATIONS = (
+    'create_booking', 'create_bookings', 'create_hold', 'confirm_hold',
+    'release_hold', 'sweep_expired_holds', 'cancel_booking', 'cancel_bookings',
+    'cancel_court_bookings', 'reopen_court', 'join_waitlist', 'leave_waitlist', 'expire_offers',
+    'offer_free_slots',
+)
+
+_lock = threading.Lock()
+_local_counts = {}
+
+
+class LockContentionError(ValidationError):
+    """
+    Rows the operation needs are locked by another transaction for longer than
+    the lock-wait policy allows. Nothing was written; the caller may try again
+    after `retry_after` seconds.
+    """
+    def __init__(self, message="This slot is being booked by someone else right now. Please try again in a moment.",
+                 retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after if retry_after is not None else settings.BOOKING_LOCK_RETRY_AFTER
+
+
+def _sqlstate(exc):
+    cause = exc.__cause__
+    return getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+
+
+def is_retryable(exc):
+    """
+    True for deadlocks and serialization failures (PostgreSQL) and a busy database (SQLite).
+    """
+    if _sqlstate(exc) in RETRYABLE_SQLSTATES:
+        return True
+    return isinstance(exc, OperationalError) and 'database is locked' in str(exc)
+
+
+def is_lock_unavailable(exc):
+    """
+    True when a NOWAIT lock or a lock_timeout gave up on a row another transaction holds.
+    """
+    return _sqlstate(exc) == LOCK_NOT_AVAILABLE
+
+
+def lock_nowait():
+    return settings.BOOKING_LOCK_WAIT == 'nowait'
+
+
+def for_update(queryset, **kwargs):
+    """
+    queryset.select_for_update() under the configured lock-wait policy.
+    """
+    if 'skip_locked' not in kwargs:
+        kwargs['nowait'] = lock_nowait()
+    return queryset.select_for_update(**kwargs)
+
+
+def apply_lock_wait_policy():
+    """
+    Bounds how long the current transaction's statements wait for row locks,
+    including the plain UPDATEs that claim slot and ledger rows. PostgreSQL
+    only; SQLite locks the whole database and is bounded by its busy timeout.
+    """
+    if settings.BOOKING_LOCK_WAIT == 'block' or connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL lock_timeout = '%dms'" % int(settings.BOOKING_LOCK_TIMEOUT_MS))
+
+
+def _count(operation, outcome):
+    with _lock:
+        _local_counts[(operation, outcome)] = _local_counts.get((operation, outcome), 0) + 1
+    key = COUNTER_KEY.format(operation=operation, outcome=outcome)
+    # Shared across workers through the cache; counters are best-effort
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def retry_on_conflict(operation):
+    """
+    Re-runs the decorated transaction when it loses a deadlock or serialization
+    race. Apply it outside @transaction.atomic; inside an enclosing atomic block
+    the error is re-raised, since only the outermost transaction can be retried.
+
+    A lock that wasn't granted under the lock-wait policy is not retried here:
+    it becomes LockContentionError straight away, as does contention that is
+    still there after the last attempt.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attempts = settings.BOOKING_RETRY_ATTEMPTS
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except DatabaseError as e:
+                    if is_lock_unavailable(e):
+                        _count(operation, 'lock_busy')
+                        logger.info("%s found its rows locked: %s", operation, e)
+                        raise LockContentionError() from e
+                    if not is_retryable(e) or connection.in_atomic_block:
+                        raise
+                    if attempt == attempts - 1:
+                        _count(operation, 'exhausted')
+                        logger.warning("%s gave up after %s attempts: %s", operation, attempts, e)
+                        raise LockContentionError() from e
+                    _count(operation, 'retried')
+                    delay = settings.BOOKING_RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    logger.info("%s hit %s; retrying in %.3fs", operation, e, delay)
+                    _time.sleep(delay)
+        return wrapper
+    return decorator
+
+
+def booking_transaction(operation):
+    """
+    Runs the decorated function in its own transaction under the lock-wait
+    policy, retried as `retry_on_conflict(operation)`.
+    """
+    def decorator(func):
+        @retry_on_conflict(operation)
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with transaction.atomic():
+                apply_lock_wait_policy()
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_retry_stats():
+    """
+    Retry counters per operation: {'create_booking': {'retried': n, 'exhausted': n, 'lock_busy': n}, ...},
+    summed across workers when the cache is shared, plus this worker's own counts.
+    """
+    with _lock:
+        local = dict(_local_counts)
+    operations = sorted({operation for operation, _ in local} | set(RETRIED_OPERATIONS))
+    keys = {
+        COUNTER_KEY.format(operation=operation, outcome=outcome): (operation, outcome)
+        for operation in operations
+        for outcome in OUTCOMES
+    }
+    shared = cache.get_many(list(keys))
+    stats = {}
+    for key, (operation, outcome) in keys.items():
+        entry = stats.setdefault(operation, {})
+        entry[outcome] = shared.get(key, 0)
+        entry[f'{outcome}_this_worker'] = local.get((operation, outcome), 0)
+    return stats
@@ -1,7 +1,42 @@
-from datetime import timedelta
+import time as _time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q
-from ..models import WaitlistNotification, WaitlistEntry, BookingSlot
+from django.db.models import Count, F, Min, Q
+from ..models import WaitlistNotification, WaitlistEntry
+from . import pubsub
+
+# Per-user unread counter in the shared cache. The version is bumped whenever
+# the user's notifications change; a cached count is only trusted while it was
+# computed under the current version and before its earliest unread expiry.
+UNREAD_VERSION_KEY = 'booking_app:notifications:{user_id}:version'
+UNREAD_COUNT_KEY = 'booking_app:notifications:{user_id}:unread'
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+def bump_unread_version(user_ids):
+    """
+    Invalidates the users' cached unread counts once the current transaction
+    commits, and tells their open notification streams.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def bump():
+        for user_id in user_ids:
+            key = UNREAD_VERSION_KEY.format(user_id=user_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, _time.time_ns(), None)
+        # After the bump, so a stream re-reading the count sees the new version
+        pubsub.publish(user_ids, {'type': 'changed'})
+
+    transaction.on_commit(bump)
 
 def create_slot_available_notification(user, slot):
     """
@@ -17,6 +52,7 @@ def create_slot_available_notification(user, slot):
         message=f"Good news! The slot for {slot.court.name} on {slot.date} at {slot.start_time} is now available.",
         expires_at=expires_at
     )
+    bump_unread_version([user.id])
     
     # Update WaitlistEntry to link notification
     try:
@@ -29,6 +65,108 @@ def create_slot_available_notification(user, slot):
         
     return notification
 
+def create_slot_available_notifications(entries):
+    """
+    Bulk form of create_slot_available_notification for many waitlist entries
+    (with user, requested_slot and court selected): one INSERT for the
+    notifications and one UPDATE linking them to their entries.
+    """
+    expires_at = timezone.now() + timedelta(minutes=15)
+    notifications = WaitlistNotification.objects.bulk_create([
+        WaitlistNotification(
+            user_id=entry.user_id,
+            slot_id=entry.requested_slot_id,
+            notification_type='SLOT_AVAILABLE',
+            message=(
+                f"Good news! The slot for {entry.court.name} on {entry.requested_slot.date} "
+                f"at {entry.requested_slot.start_time} is now available."
+            ),
+            expires_at=expires_at
+        )
+        for entry in entries
+    ])
+    for entry, notification in zip(entries, notifications):
+        entry.notification = notification
+        entry.notified = True
+    WaitlistEntry.objects.bulk_update(entries, ['notification', 'notified'])
+    bump_unread_version(entry.user_id for entry in entries)
+    return notifications
+
+def create_position_changed_notifications(entries):
+    """
+    Tells waiting users (entries with court and requested_slot selected) their
+    new place in the queue. Replaces their older unread position notices for
+    the same slot, so only the latest rank shows: one DELETE, one INSERT.
+    """
+    if not entries:
+        return []
+    users_by_slot = {}
+    for entry in entries:
+        users_by_slot.setdefault(entry.requested_slot_id, []).append(entry.user_id)
+    pairs = Q()
+    for slot_id, user_ids in users_by_slot.items():
+        pairs |= Q(slot_id=slot_id, user_id__in=user_ids)
+    WaitlistNotification.objects.filter(pairs, notification_type='POSITION_CHANGED', is_read=False).delete()
+    bump_unread_version(entry.user_id for entry in entries)
+    return WaitlistNotification.objects.bulk_create([
+        WaitlistNotification(
+            user_id=entry.user_id,
+            slot_id=entry.requested_slot_id,
+            notification_type='POSITION_CHANGED',
+            message=(
+                f"You're now #{entry.position} on the waitlist for {entry.court.name} "
+                f"on {entry.requested_slot.date} at {entry.requested_slot.start_time}."
+            ),
+            expires_at=timezone.make_aware(
+                datetime.combine(entry.requested_slot.date, entry.requested_slot.start_time)
+            )
+        )
+        for entry in entries
+    ])
+
+def create_booking_cancelled_notifications(bookings, reason=''):
+    """
+    Tells each owner that staff cancelled their booking. `bookings` are
+    (booking_id, user_id, slot_id, court_name, date, start_time) tuples; each
+    notice stays visible until the booked start time.
+    """
+    suffix = f" Reason: {reason}" if reason else ""
+    bump_unread_version(user_id for _, user_id, _, _, _, _ in bookings)
+    return WaitlistNotification.objects.bulk_create([
+        WaitlistNotification(
+            user_id=user_id,
+            slot_id=slot_id,
+            notification_type='BOOKING_CANCELLED',
+            message=f"Your booking #{booking_id} for {court_name} on {date_obj} at {start_time} was cancelled.{suffix}",
+            expires_at=timezone.make_aware(datetime.combine(date_obj, start_time))
+        )
+        for booking_id, user_id, slot_id, court_name, date_obj, start_time in bookings
+    ])
+
+def create_court_closed_notifications(entries, reason=''):
+    """
+    Tells waitlisted users (entries with court and requested_slot selected)
+    that the slot they queued for won't come free because the court is
+    closed. Each notice stays visible until the slot's start time.
+    """
+    suffix = f" Reason: {reason}" if reason else ""
+    bump_unread_version(entry.user_id for entry in entries)
+    return WaitlistNotification.objects.bulk_create([
+        WaitlistNotification(
+            user_id=entry.user_id,
+            slot_id=entry.requested_slot_id,
+            notification_type='BOOKING_CANCELLED',
+            message=(
+                f"{entry.court.name} is closed on {entry.requested_slot.date} at "
+                f"{entry.requested_slot.start_time}; you have been taken off its waitlist.{suffix}"
+            ),
+            expires_at=timezone.make_aware(
+                datetime.combine(entry.requested_slot.date, entry.requested_slot.start_time)
+            )
+        )
+        for entry in entries
+    ])
+
 def mark_notification_as_read(notification_id, user):
     """
     Marks a notification as read.
@@ -37,45 +175,101 @@ def mark_notification_as_read(notification_id, user):
         notification = WaitlistNotification.objects.get(id=notification_id, user=user)
         notification.is_read = True
         notification.save()
+        bump_unread_version([user.id])
         return True
     except WaitlistNotification.DoesNotExist:
         return False
 
+def get_unread_notification_state(user):
+    """
+    Returns (count, version) of the user's unread, non-expired notifications.
+    Served from the cache without a query until the version is bumped or the
+    earliest unread notification expires.
+    """
+    now = timezone.now()
+    version_key = UNREAD_VERSION_KEY.format(user_id=user.id)
+    count_key = UNREAD_COUNT_KEY.format(user_id=user.id)
+    cached = cache.get_many([version_key, count_key])
+    version = cached.get(version_key)
+    if version is None:
+        cache.add(version_key, _time.time_ns(), None)
+        version = cache.get(version_key)
+
+    entry = cached.get(count_key)
+    if entry is not None:
+        entry_version, count, valid_until = entry
+        if entry_version == version and (valid_until is None or now < valid_until):
+            return count, version
+
+    unread = _unread_notifications(user, now).aggregate(count=Count('id'), next_expiry=Min('expires_at'))
+    cache.set(
+        count_key,
+        (version, unread['count'], unread['next_expiry']),
+        settings.NOTIFICATION_COUNT_CACHE_SECONDS
+    )
+    return unread['count'], version
+
+def _unread_notifications(user, now):
+    return WaitlistNotification.objects.filter(user=user, is_read=False, expires_at__gt=now)
+
+def count_unread_notifications(user):
+    """
+    Uncached count, for processes that don't share the web workers' cache
+    (the notification stream service).
+    """
+    return _unread_notifications(user, timezone.now()).count()
+
 def get_unread_notification_count(user):
     """
     Returns the count of unread, non-expired notifications for a user.
     """
-    cleanup_expired_notifications() # Lazy cleanup
-    return WaitlistNotification.objects.filter(
-        user=user, 
-        is_read=False,
-        expires_at__gt=timezone.now()
-    ).count()
+    return get_unread_notification_state(user)[0]
 
-def get_user_notifications(user):
+def mark_all_notifications_as_read(user):
     """
-    Returns all valid notifications for a user, ordered by creation time.
+    Marks every unread notification of the user as read in one UPDATE.
+    Returns how many changed.
     """
-    cleanup_expired_notifications() # Lazy cleanup
-    return WaitlistNotification.objects.filter(
-        user=user,
-        expires_at__gt=timezone.now()
-    ).order_by('-created_at')
+    updated = WaitlistNotification.objects.filter(user=user, is_read=False).update(is_read=True)
+    if updated:
+        bump_unread_version([user.id])
+    return updated
+
+def encode_notification_cursor(created_at, notification_id):
+    """
+    Opaque keyset position: microseconds since the epoch and the id, so rows
+    created in the same instant still page without gaps or repeats.
+    """
+    return f"{(created_at - _EPOCH) // timedelta(microseconds=1)}_{notification_id}"
 
-def cleanup_expired_notifications():
+def decode_notification_cursor(cursor):
+    try:
+        micros, notification_id = (int(part) for part in cursor.split('_'))
+    except ValueError:
+        raise ValidationError("Invalid cursor.")
+    return _EPOCH + timedelta(microseconds=micros), notification_id
+
+def get_user_notifications(user, limit, cursor=None):
     """
-    Marks notifications as expired or handles expiration logic.
-    For now, we just filter them out in getters, but we could delete them or mark as expired.
-    Also, if a notification expires, we should notify the NEXT person on the waitlist.
+    Returns one page of the user's valid notifications, newest first, as
+    (rows, next_cursor). Rows are dicts with the slot's court, date and time
+    joined in; next_cursor is None on the last page. Pages are keyed on
+    (created_at, id), so each is one indexed query however long the history.
     """
-    expired_notifications = WaitlistNotification.objects.filter(
-        expires_at__lte=timezone.now(),
-        is_read=False # Only act if not read/acted upon? 
-        # Actually, if they read it but didn't book, it still expires.
-        # But for "notifying next person", we need to know if it was booked.
+    notifications = WaitlistNotification.objects.filter(
+        user=user,
+        expires_at__gt=timezone.now()
     )
-    
-    # Logic to notify next person is complex to do here without a scheduled task.
-    # For this MVP, we will just hide expired notifications.
-    # The "notify next person" logic would ideally be a periodic task.
-    pass
+    if cursor:
+        created_at, notification_id = decode_notification_cursor(cursor)
+        notifications = notifications.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=notification_id)
+        )
+    rows = list(notifications.order_by('-created_at', '-id').values(
+        'id', 'message', 'notification_type', 'is_read', 'created_at', 'slot_id',
+        court_name=F('slot__court__name'), date=F('slot__date'), start_time=F('slot__start_time')
+    )[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_notification_cursor(last['created_at'], last['id'])
@@ -0,0 +1,77 @@
+"""
+Server-sent events for a user's notifications (see pubsub).
+
+A stream sends `count` on connect and whenever the unread count changes, plus a
+`notification` event for the newest unread one when the count goes up. An
+idle connection is one coroutine waiting on its queue, with a comment line
+every NOTIFICATION_STREAM_HEARTBEAT_SECONDS to keep proxies from closing it.
+Streams end after NOTIFICATION_STREAM_MAX_SECONDS and EventSource reconnects,
+which also resyncs a client that missed an event.
+
+Counts are read from the database: the stream runs in its own service and does
+not share the web workers' cache of unread counts.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from booking_app.models import WaitlistNotification
+from booking_app.services.notification_service import count_unread_notifications
+from booking_app.services.pubsub import get_broker
+
+RETRY_MS = 5000
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def _latest_unread(user):
+    latest = WaitlistNotification.objects.filter(
+        user=user,
+        is_read=False,
+        expires_at__gt=timezone.now()
+    ).order_by('-created_at', '-id').values('id', 'message', 'notification_type', 'slot__start_time').first()
+    if latest is None:
+        return None
+    return {
+        'id': latest['id'],
+        'message': latest['message'],
+        'type': latest['notification_type'],
+        'time': latest['slot__start_time'].strftime("%H:%M"),
+    }
+
+
+async def stream_notifications(user):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.NOTIFICATION_STREAM_MAX_SECONDS
+    heartbeat = settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+
+    async with get_broker().subscribe(user.id) as queue:
+        count = await sync_to_async(count_unread_notifications)(user)
+        yield f"retry: {RETRY_MS}\n" + _event('count', {'count': count})
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(queue.get(), timeout=min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            # Several changes may have queued up; one re-read covers them all
+            while not queue.empty():
+                queue.get_nowait()
+
+            new_count = await sync_to_async(count_unread_notifications)(user)
+            if new_count > count:
+                latest = await sync_to_async(_latest_unread)(user)
+                if latest:
+                    yield _event('notification', latest)
+            if new_count != count:
+                count = new_count
+                yield _event('count', {'count': count})
@@ -0,0 +1,142 @@
+"""
+Pricing rules compiled into time-of-week tables.
+
+For every active rule, court type and day class (Mon..Sun, plus one class
+per distinct holiday multiplier) the court-side price of each 30-minute
+unit is computed once and stored as running totals. The price of any
+interval is then cum[end] - cum[start]: one table index per bound.
+Compilation happens when the catalog reloads, i.e. after an admin edit.
+"""
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+
+UNIT_MINUTES = 30
+UNITS_PER_DAY = 24 * 60 // UNIT_MINUTES
+
+# Component order in every table row
+BASE, COURT_PREMIUM, PEAK_SURCHARGE, WEEKEND_SURCHARGE, PRICE = range(5)
+
+
+class UnpricedIntervalError(ValidationError):
+    """
+    No active rule covers the date, or the interval falls outside the day's table.
+    """
+
+
+def _to_minutes(value):
+    """
+    Minutes since midnight for a time, or an "HH:MM" string (unsaved PricingRule defaults).
+    """
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%H:%M").time()
+    return value.hour * 60 + value.minute
+
+
+class CompiledRule:
+    def __init__(self, rule, peak_windows, holiday_multipliers, court_types):
+        self.rule = rule
+        self.effective_from = rule.effective_from
+        self.effective_to = rule.effective_to
+
+        # (start_minute, end_minute, multiplier); the rule's own window first
+        windows = [(_to_minutes(rule.peak_start_time), _to_minutes(rule.peak_end_time), rule.peak_multiplier)]
+        windows += [(_to_minutes(w.start_time), _to_minutes(w.end_time), w.multiplier) for w in peak_windows]
+        peak_factors = [self._unit_peak_factor(u, windows) for u in range(UNITS_PER_DAY)]
+
+        day_multipliers = {weekday: (rule.weekend_multiplier if weekday >= 5 else 1.0) for weekday in range(7)}
+        for m in holiday_multipliers:
+            day_multipliers[('holiday', m)] = rule.weekend_multiplier if m is None else m
+
+        self.tables = {
+            court_type: {
+                day_class: self._cumulative(court_type, day_multiplier, peak_factors)
+                for day_class, day_multiplier in day_multipliers.items()
+            }
+            for court_type in court_types
+        }
+
+    @staticmethod
+    def _unit_peak_factor(unit, windows):
+        """
+        Average (multiplier - 1) over the unit's minutes; overlapping windows use the highest multiplier.
+        """
+        start = unit * UNIT_MINUTES
+        total = 0.0
+        for minute in range(start, start + UNIT_MINUTES):
+            extra = 0.0
+            for w_start, w_end, multiplier in windows:
+                if w_start <= minute < w_end:
+                    extra = max(extra, multiplier - 1)
+            total += extra
+        return total / UNIT_MINUTES
+
+    def _cumulative(self, court_type, day_multiplier, peak_factors):
+        rule = self.rule
+        unit_base = float(rule.base_price) * UNIT_MINUTES / 60
+        indoor = rule.indoor_court_multiplier if court_type == 'INDOOR' else 1.0
+
+        rows = [(0.0, 0.0, 0.0, 0.0, 0.0)]
+        for factor in peak_factors:
+            court_price = unit_base * indoor
+            peak = court_price * factor
+            weekend = (court_price + peak) * (day_multiplier - 1)
+            unit = (unit_base, unit_base * (indoor - 1), peak, weekend, court_price + peak + weekend)
+            rows.append(tuple(a + b for a, b in zip(rows[-1], unit)))
+        return rows
+
+    def covers(self, date_obj):
+        return (
+            (self.effective_from is None or self.effective_from <= date_obj)
+            and (self.effective_to is None or date_obj <= self.effective_to)
+        )
+
+
+class PriceSchedule:
+    def __init__(self, rules, peak_windows, holidays, court_types):
+        holiday_multipliers = {h.multiplier for h in holidays}
+        self.holidays = {h.date: h.multiplier for h in holidays}
+
+        windows_by_rule = {}
+        for w in peak_windows:
+            windows_by_rule.setdefault(w.rule_id, []).append(w)
+
+        # Latest effective_from first, so the first rule covering a date wins
+        rules = sorted(rules, key=lambda r: (r.effective_from is not None, r.effective_from or 0, r.pk or 0), reverse=True)
+        self.rules = [
+            CompiledRule(rule, windows_by_rule.get(rule.pk, []), holiday_multipliers, court_types)
+            for rule in rules
+        ]
+
+    def rule_for(self, date_obj):
+        """
+        The compiled rule in effect on the date, or None if no active rule covers it.
+        """
+        for compiled in self.rules:
+            if compiled.covers(date_obj):
+                return compiled
+        return None
+
+    def day_class(self, date_obj):
+        if date_obj in self.holidays:
+            return ('holiday', self.holidays[date_obj])
+        return date_obj.weekday()
+
+    def lookup(self, court_type, date_obj, start_time, duration_minutes=60):
+        """
+        Court-side components for an interval: (base, court_premium, peak_surcharge,
+        weekend_surcharge, price), unrounded. Raises UnpricedIntervalError when
+        no rule covers the date or the interval is not whole units within the day.
+        """
+        compiled = self.rule_for(date_obj)
+        if compiled is None:
+            raise UnpricedIntervalError(f"No pricing rule covers {date_obj}.")
+        minutes = _to_minutes(start_time)
+        if minutes % UNIT_MINUTES or duration_minutes <= 0 or duration_minutes % UNIT_MINUTES:
+            raise UnpricedIntervalError(f"Prices are set in {UNIT_MINUTES}-minute steps.")
+        start = minutes // UNIT_MINUTES
+        end = start + duration_minutes // UNIT_MINUTES
+        if end > UNITS_PER_DAY:
+            raise UnpricedIntervalError("The interval runs past midnight.")
+        table = compiled.tables[court_type][self.day_class(date_obj)]
+        return tuple(b - a for a, b in zip(table[start], table[end]))
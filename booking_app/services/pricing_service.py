@@ -1,67 +1,178 @@
-from datetime import datetime, time
-from booking_app.models import PricingRule, Court, Equipment, Coach
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import time
+from itertools import product
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from booking_app.services.availability_service import get_end_time
+from booking_app.services.catalog import get_catalog
+from booking_app.services.price_schedule import UNIT_MINUTES, _to_minutes
+
+class BreakdownMemo:
+    """
+    Bounded LRU of price breakdowns with a TTL, shared by all requests in a process.
+
+    Keys include the catalog version, so any PricingRule, Equipment or Coach
+    edit (which bumps the version) drops every memoized entry.
+    """
+    def __init__(self, maxsize=2048, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        now = _time.monotonic()
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, version, key, value):
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (_time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'version': self.version,
+            }
+
+breakdown_memo = BreakdownMemo(
+    maxsize=getattr(settings, 'PRICE_MEMO_MAXSIZE', 2048),
+    ttl=getattr(settings, 'PRICE_MEMO_TTL_SECONDS', 300)
+)
 
 class PricingEngine:
     def __init__(self):
-        self.rule = PricingRule.objects.filter(is_active=True).first()
-        if not self.rule:
-            # Fallback default if no rule exists
-            self.rule = PricingRule() 
+        # Active rule, equipment and coach rates come from the in-process catalog
+        self.catalog = get_catalog()
+        self.rule = self.catalog.pricing_rule
+        self.schedule = self.catalog.price_schedule
 
-    def calculate_total_price(self, court, date_obj, start_time, equipment_ids, coach_id):
-        breakdown = self.get_price_breakdown(court, date_obj, start_time, equipment_ids, coach_id)
+    def calculate_total_price(self, court, date_obj, start_time, equipment_ids, coach_id, duration_minutes=60):
+        breakdown = self.get_price_breakdown(
+            court, date_obj, start_time, equipment_ids, coach_id, duration_minutes
+        )
         return breakdown['total']
 
-    def get_price_breakdown(self, court, date_obj, start_time, equipment_ids, coach_id):
-        base_price = float(self.rule.base_price)
+    def _court_components(self, court_type, date_obj, start_time, duration_minutes=60):
+        """
+        Court-side part of a breakdown (base, premium, peak, weekend) and the resulting price.
+        One lookup in the compiled schedule: rule for the date, court type,
+        day class (weekday or holiday) and the interval's two table bounds.
+        """
+        base, premium, peak, weekend, current_price = self.schedule.lookup(
+            court_type, date_obj, start_time, duration_minutes
+        )
         components = {
-            'base': base_price,
-            'court_premium': 0.0,
-            'peak_surcharge': 0.0,
-            'weekend_surcharge': 0.0,
+            'base': round(base, 2),
+            'court_premium': round(premium, 2),
+            'peak_surcharge': round(peak, 2),
+            'weekend_surcharge': round(weekend, 2),
             'equipment': 0.0,
             'coach': 0.0,
             'total': 0.0
         }
+        return components, current_price
 
-        current_price = base_price
+    def get_price_matrix(self, courts, date_obj, hours):
+        """
+        Court-side prices for every (court, 30-minute unit) of a day, as compact rows per court:
+        [base, court_premium, peak_surcharge, weekend_surcharge, price] per unit,
+        two units per hour in `hours`. Rows are left unrounded, so summing the
+        units an interval covers and rounding once matches get_price_breakdown
+        even when a peak window or rule boundary falls inside an hour.
+        `courts` are dicts with 'id' and 'court_type' (see availability_service).
+        A date no pricing rule covers maps every court to None.
+        """
+        if self.schedule.rule_for(date_obj) is None:
+            return {court['id']: None for court in courts}
+        starts = [
+            time(*divmod(_to_minutes(t) + offset, 60))
+            for t in hours
+            for offset in range(0, 60, UNIT_MINUTES)
+        ]
+        matrix = {}
+        by_type = {}
+        for court in courts:
+            court_type = court['court_type']
+            if court_type not in by_type:
+                by_type[court_type] = [
+                    list(self.schedule.lookup(court_type, date_obj, start, UNIT_MINUTES))
+                    for start in starts
+                ]
+            matrix[court['id']] = by_type[court_type]
+        return matrix
 
-        # 1. Indoor Multiplier
-        if court.court_type == 'INDOOR':
-            premium = current_price * (self.rule.indoor_court_multiplier - 1)
-            components['court_premium'] = round(premium, 2)
-            current_price *= self.rule.indoor_court_multiplier
+    def _memo_key(self, court_type, date_obj, start_time, equipment_ids, coach_id, duration_minutes):
+        """
+        Normalized inputs: every date with the same rule and day class prices alike.
+        """
+        compiled = self.schedule.rule_for(date_obj)
+        return (
+            court_type,
+            id(compiled),
+            self.schedule.day_class(date_obj),
+            # Exact minutes: an off-step start must miss and be rejected by the schedule
+            _to_minutes(start_time),
+            int(duration_minutes),
+            frozenset(int(e) for e in equipment_ids or ()),
+            int(coach_id) if coach_id else None,
+        )
 
-        # 2. Peak Hours
-        # start_time is time object
-        if self.rule.peak_start_time <= start_time < self.rule.peak_end_time:
-            surcharge = current_price * (self.rule.peak_multiplier - 1)
-            components['peak_surcharge'] = round(surcharge, 2)
-            current_price *= self.rule.peak_multiplier
+    def get_price_breakdown(self, court, date_obj, start_time, equipment_ids, coach_id, duration_minutes=60):
+        key = self._memo_key(court.court_type, date_obj, start_time, equipment_ids, coach_id, duration_minutes)
+        breakdown = breakdown_memo.get(self.catalog.version, key)
+        if breakdown is None:
+            breakdown = self._compute_price_breakdown(
+                court, date_obj, start_time, equipment_ids, coach_id, duration_minutes
+            )
+            breakdown_memo.put(self.catalog.version, key, breakdown)
+        return dict(breakdown)
 
-        # 3. Weekend
-        # Monday=0, Sunday=6
-        if date_obj.weekday() >= 5:
-            surcharge = current_price * (self.rule.weekend_multiplier - 1)
-            components['weekend_surcharge'] = round(surcharge, 2)
-            current_price *= self.rule.weekend_multiplier
+    def _compute_price_breakdown(self, court, date_obj, start_time, equipment_ids, coach_id, duration_minutes=60):
+        components, current_price = self._court_components(
+            court.court_type, date_obj, start_time, duration_minutes
+        )
+        hours = duration_minutes / 60
 
         # 4. Equipment
         equipment_total = 0
         if equipment_ids:
-            equipment_list = Equipment.objects.filter(id__in=equipment_ids)
-            for eq in equipment_list:
-                equipment_total += float(eq.rent_price_per_hour)
+            for eq in self.catalog.get_equipment(equipment_ids):
+                equipment_total += float(eq.rent_price_per_hour) * hours
         components['equipment'] = round(equipment_total, 2)
 
         # 5. Coach
         coach_total = 0
-        if coach_id:
-            try:
-                coach = Coach.objects.get(id=coach_id)
-                coach_total = float(coach.hourly_rate)
-            except Coach.DoesNotExist:
-                pass
+        coach = self.catalog.get_coach(coach_id)
+        if coach:
+            coach_total = float(coach.hourly_rate) * hours
         components['coach'] = round(coach_total, 2)
 
         # Total
@@ -69,3 +180,93 @@ class PricingEngine:
         components['total'] = round(total, 2)
         
         return components
+
+    def get_price_breakdowns(self, items):
+        """
+        Batch version of get_price_breakdown for many quotes at once.
+
+        Each item is a dict with court_id, date, start_time and optional
+        duration_minutes, equipment_ids and coach_id. Court-side prices are
+        compiled-table lookups and add-on rates are resolved once per distinct
+        equipment set / coach, all from the catalog: no database access.
+        Unknown courts and dates no pricing rule covers yield None.
+        """
+        equipment_rates = {}
+        coach_rates = {}
+        breakdowns = []
+        for item in items:
+            court = self.catalog.get_court(item['court_id'])
+            if court is None or self.schedule.rule_for(item['date']) is None:
+                breakdowns.append(None)
+                continue
+            duration_minutes = item.get('duration_minutes', 60)
+            hours = duration_minutes / 60
+            components, current_price = self._court_components(
+                court.court_type, item['date'], item['start_time'], duration_minutes
+            )
+
+            equipment_key = frozenset(int(e) for e in item.get('equipment_ids') or ())
+            if equipment_key not in equipment_rates:
+                equipment_rates[equipment_key] = sum(
+                    float(eq.rent_price_per_hour) for eq in self.catalog.get_equipment(equipment_key)
+                )
+            coach_id = item.get('coach_id')
+            if coach_id not in coach_rates:
+                coach = self.catalog.get_coach(coach_id)
+                coach_rates[coach_id] = float(coach.hourly_rate) if coach else 0.0
+
+            equipment_total = equipment_rates[equipment_key] * hours
+            coach_total = coach_rates[coach_id] * hours
+            components['equipment'] = round(equipment_total, 2)
+            components['coach'] = round(coach_total, 2)
+            components['total'] = round(current_price + equipment_total + coach_total, 2)
+            breakdowns.append(components)
+        return breakdowns
+
+    def get_quotes(self, items):
+        """
+        Prices quote items that would pass as bookings: an active court, an
+        interval within that court's hours in 30-minute steps (get_end_time),
+        a date some rule prices, and known equipment and coach. Returns one
+        (breakdown, error) pair per item, in order; one of the two is None.
+        """
+        errors = [self._quote_error(item) for item in items]
+        breakdowns = iter(self.get_price_breakdowns([
+            item for item, error in zip(items, errors) if error is None
+        ]))
+        return [(None, error) if error else (next(breakdowns), None) for error in errors]
+
+    def _quote_error(self, item):
+        court = self.catalog.get_court(item['court_id'])
+        if court is None or not court.is_active:
+            return "Court not found or inactive."
+        try:
+            get_end_time(item['start_time'], item.get('duration_minutes', 60), court=court)
+        except ValidationError as e:
+            return e.messages[0]
+        if self.schedule.rule_for(item['date']) is None:
+            return "No pricing rule covers this date."
+        equipment_ids = {int(e) for e in item.get('equipment_ids') or ()}
+        if len(self.catalog.get_equipment(equipment_ids)) != len(equipment_ids):
+            return "Some equipment is not available."
+        if item.get('coach_id') and self.catalog.get_coach(item['coach_id']) is None:
+            return "Coach not found."
+        return None
+
+def expand_quote_grid(court_ids, dates, start_times, durations=(60,), equipment_sets=((),), coach_ids=(None,)):
+    """
+    Cross product of quote dimensions as items for PricingEngine.get_price_breakdowns.
+    """
+    return [
+        {
+            'court_id': court_id,
+            'date': date_obj,
+            'start_time': start_time,
+            'duration_minutes': duration_minutes,
+            'equipment_ids': list(equipment_ids),
+            'coach_id': coach_id,
+        }
+        for court_id, date_obj, start_time, duration_minutes, equipment_ids, coach_id in product(
+            court_ids, dates, start_times, durations, equipment_sets, coach_ids
+        )
+    ]
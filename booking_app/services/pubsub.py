@@ -0,0 +1,167 @@
+"""
+Per-user event fan-out for the notification stream.
+
+Publishers are ordinary sync code (views, services, the waitlist worker);
+subscribers are SSE connections, each an asyncio queue on the ASGI event loop.
+Events are hints ("this user's notifications changed"), so a full queue just
+drops them: the stream re-reads the current state on the next one it gets.
+
+NOTIFICATION_BROKER picks the backend:
+
+- LocalBroker: in-process only. Enough for a single ASGI process, and the
+  stand-in for development and tests.
+- PostgresBroker: publishes with pg_notify, and every ASGI process keeps one
+  LISTEN connection feeding its local subscribers, so events from other web
+  processes and from `waitlist_worker` arrive too.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 16
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+class Subscription:
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.subscriber = None
+
+    async def __aenter__(self):
+        self.subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        self.broker._add(self.user_id, self.subscriber)
+        return self.subscriber[1]
+
+    async def __aexit__(self, *exc_info):
+        self.broker._remove(self.user_id, self.subscriber)
+        return False
+
+
+class LocalBroker:
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_ids, event):
+        """
+        Delivers to this process's subscribers. Safe to call from any thread.
+        """
+        for user_id in user_ids:
+            self._dispatch(user_id, event)
+
+    def _dispatch(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; its subscriber is on its way out
+                pass
+
+    def subscribe(self, user_id):
+        """
+        Async context manager yielding an asyncio.Queue of the user's events.
+        """
+        return Subscription(self, user_id)
+
+    def _add(self, user_id, subscriber):
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+
+    def _remove(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.discard(subscriber)
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class PostgresBroker(LocalBroker):
+    CHANNEL = 'booking_notifications'
+    RECONNECT_DELAY = 5
+    # Users per NOTIFY; payloads must stay under PostgreSQL's 8000-byte limit
+    USERS_PER_MESSAGE = 500
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, user_ids, event):
+        user_ids = list(user_ids)
+        with connection.cursor() as cursor:
+            for i in range(0, len(user_ids), self.USERS_PER_MESSAGE):
+                cursor.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    [self.CHANNEL, json.dumps({'user_ids': user_ids[i:i + self.USERS_PER_MESSAGE], 'event': event})]
+                )
+
+    def subscribe(self, user_id):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return super().subscribe(user_id)
+
+    async def _listen(self):
+        import psycopg
+
+        params = settings.DATABASES['default']
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(
+                    dbname=params['NAME'],
+                    user=params.get('USER') or None,
+                    password=params.get('PASSWORD') or None,
+                    host=params.get('HOST') or None,
+                    port=params.get('PORT') or None,
+                    sslmode=params.get('OPTIONS', {}).get('sslmode'),
+                    autocommit=True
+                )
+                async with conn:
+                    await conn.execute(f"LISTEN {self.CHANNEL}")
+                    async for notify in conn.notifies():
+                        message = json.loads(notify.payload)
+                        for user_id in message['user_ids']:
+                            self._dispatch(user_id, message['event'])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification listener lost its connection; reconnecting")
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.NOTIFICATION_BROKER)()
+        return _broker
+
+
+def publish(user_ids, event):
+    try:
+        get_broker().publish(user_ids, event)
+    except Exception:
+        # Streams re-read the current count when they reconnect, so a lost event heals
+        logger.exception("Could not publish notification event for %s users", len(user_ids))
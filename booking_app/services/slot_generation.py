@@ -0,0 +1,55 @@
+"""
+Pre-generates BookingSlot rows for a rolling horizon.
+
+With every bookable hour already present, booking paths claim an existing
+row instead of inserting one inside the transaction. Rows are created in
+batches with ignore_conflicts, so reruns and overlapping runs are harmless.
+"""
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from booking_app.models import BookingSlot, Court
+
+
+def iter_missing_slots(courts, start_date, days):
+    """
+    Yields unsaved hourly BookingSlot rows for each court's operating hours.
+    """
+    for i in range(days):
+        date_obj = start_date + timedelta(days=i)
+        for court in courts:
+            for h in range(court.opening_hour, court.closing_hour):
+                yield BookingSlot(
+                    court_id=court.id,
+                    date=date_obj,
+                    start_time=time(h, 0),
+                    end_time=time(h + 1, 0)
+                )
+
+
+def generate_slots(days=None, start_date=None, batch_size=None):
+    """
+    Creates missing slots for every active court from start_date (default today)
+    for `days` days. Returns the number of rows inserted.
+    """
+    days = days if days is not None else settings.SLOT_PREGENERATE_DAYS
+    start_date = start_date or timezone.localdate()
+    batch_size = batch_size or settings.SLOT_PREGENERATE_BATCH_SIZE
+    courts = list(Court.objects.filter(is_active=True).order_by('id'))
+
+    end_date = start_date + timedelta(days=days - 1)
+    existing = BookingSlot.objects.filter(date__gte=start_date, date__lte=end_date)
+    before = existing.count()
+
+    batch = []
+    for slot in iter_missing_slots(courts, start_date, days):
+        batch.append(slot)
+        if len(batch) >= batch_size:
+            BookingSlot.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        BookingSlot.objects.bulk_create(batch, ignore_conflicts=True)
+
+    return existing.count() - before
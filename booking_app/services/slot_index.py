@@ -0,0 +1,365 @@
+"""
+Shared availability bitmap for (court, date) cells.
+
+One 8-byte cell per (court, day): the date's ordinal as a tag plus a 24-bit
+mask of booked hours (a multi-hour booking sets every hour it covers).
+Cells live in an mmap-backed file, so every gunicorn worker on the host
+reads the same memory. Writers hold a file lock only while touching memory:
+every update is also appended to a small journal under a generation number,
+so a rebuild or refresh reads the database unlocked and then re-applies the
+updates that landed during its read before swapping cells in. A lookup returns None
+whenever the index can't answer (file missing, built against another
+database, court or date outside the rebuilt window) and callers fall back
+to the database.
+
+The booking services update cells when they commit (functions marked
+`maintains_index`); other row saves and deletes (e.g. admin edits) refresh
+their court-day through signals. Bulk
+queryset updates fire no signals, so `rebuild_slot_index --interval` rebuilds
+the whole index on a schedule, which also rolls the window forward.
+"""
+import contextvars
+import functools
+import hashlib
+import mmap
+import os
+import struct
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: the index is simply disabled
+    fcntl = None
+
+MAGIC = b'SLOTIDX2'
+# magic, ready flag, max courts, horizon days, window start ordinal, database fingerprint, generation
+HEADER = struct.Struct('<8sIIIQ16sQ')
+CELL = struct.Struct('<II')
+# generation, court id, date ordinal, hour bits, booked
+JOURNAL_ENTRY = struct.Struct('<QIIII')
+JOURNAL_LENGTH = 4096
+# Reads a rebuild may redo when more updates than the journal holds landed meanwhile
+READ_ATTEMPTS = 3
+
+_index = None
+# Set while a booking-service function that updates the index itself is running
+_maintained = contextvars.ContextVar('slot_index_maintained', default=False)
+
+
+def _booked_masks(**filters):
+    """
+    {(court_id, date): mask} of booked hours for the BookingSlot rows matching `filters`.
+    """
+    from booking_app.models import BookingSlot
+
+    masks = {}
+    booked = BookingSlot.objects.filter(**filters).filter(
+        Q(is_booked=True) | Q(booking__booking_status='CONFIRMED')
+    ).values_list('court_id', 'date', 'start_time', 'end_time').distinct()
+    for court_id, date_obj, start_time, end_time in booked.iterator():
+        key = (court_id, date_obj)
+        last_hour = end_time.hour + (1 if end_time.minute else 0)
+        for h in range(start_time.hour, last_hour):
+            masks[key] = masks.get(key, 0) | (1 << h)
+    return masks
+
+
+def _db_fingerprint():
+    return hashlib.md5(str(connection.settings_dict['NAME']).encode()).digest()
+
+
+class SlotIndex:
+    def __init__(self, path, max_courts, horizon_days):
+        self.path = path
+        self.max_courts = max_courts
+        self.horizon_days = horizon_days
+        self.cells_offset = HEADER.size + JOURNAL_LENGTH * JOURNAL_ENTRY.size
+        self.size = self.cells_offset + max_courts * horizon_days * CELL.size
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            resized = os.fstat(fd).st_size != self.size
+            if resized:
+                os.ftruncate(fd, self.size)
+            self.buf = mmap.mmap(fd, self.size, mmap.MAP_SHARED)
+            if resized:
+                # New file or another layout: start from an empty, not-ready header
+                self.buf[:HEADER.size] = bytes(HEADER.size)
+        finally:
+            os.close(fd)
+        self._lock_file = open(path, 'rb')
+
+    # --- Locking (serializes writers across processes) ---
+
+    def _lock(self):
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # --- Cell access ---
+
+    def _header(self):
+        return HEADER.unpack_from(self.buf, 0)
+
+    def is_ready(self):
+        magic, ready, max_courts, horizon_days, _, fingerprint, _ = self._header()
+        return (
+            magic == MAGIC and ready == 1
+            and max_courts == self.max_courts
+            and horizon_days == self.horizon_days
+            and fingerprint == _db_fingerprint()
+        )
+
+    def _offset(self, court_id, date_obj):
+        court_id = int(court_id)
+        if not 0 <= court_id < self.max_courts:
+            return None
+        day = date_obj.toordinal() % self.horizon_days
+        return self.cells_offset + (court_id * self.horizon_days + day) * CELL.size
+
+    def get_mask(self, court_id, date_obj):
+        """
+        Returns the booked-hours bitmask for a court-day, or None if unknown.
+        """
+        if not self.is_ready():
+            return None
+        offset = self._offset(court_id, date_obj)
+        if offset is None:
+            return None
+        tag, mask = CELL.unpack_from(self.buf, offset)
+        if tag != date_obj.toordinal():
+            return None
+        return mask
+
+    # --- Journal (updates since a generation, for readers that didn't hold the lock) ---
+
+    def _generation(self):
+        self._lock()
+        try:
+            return self._header()[6]
+        finally:
+            self._unlock()
+
+    def _set_generation(self, generation):
+        HEADER.pack_into(self.buf, 0, *self._header()[:6], generation)
+
+    def _replay(self, since, masks):
+        """
+        Applies journaled updates after generation `since` to {(court_id, date): mask}
+        (call with the lock held). Returns False if the journal no longer reaches back.
+        """
+        current = self._header()[6]
+        if current - since > JOURNAL_LENGTH:
+            return False
+        for generation in range(since + 1, current + 1):
+            entry = JOURNAL_ENTRY.unpack_from(
+                self.buf, HEADER.size + (generation % JOURNAL_LENGTH) * JOURNAL_ENTRY.size
+            )
+            stored, court_id, ordinal, bits, booked = entry
+            if stored != generation:
+                return False
+            key = (court_id, date.fromordinal(ordinal))
+            if key in masks:
+                masks[key] = masks[key] | bits if booked else masks[key] & ~bits
+        return True
+
+    def update(self, court_id, date_obj, hours, booked):
+        """
+        Sets or clears hour bits for a court-day, journaled so a concurrent
+        rebuild keeps them; the cell itself only changes if it is tracked.
+        """
+        offset = self._offset(court_id, date_obj)
+        if offset is None:
+            return
+        bits = 0
+        for h in hours:
+            bits |= 1 << h
+        self._lock()
+        try:
+            generation = self._header()[6] + 1
+            JOURNAL_ENTRY.pack_into(
+                self.buf, HEADER.size + (generation % JOURNAL_LENGTH) * JOURNAL_ENTRY.size,
+                generation, int(court_id), date_obj.toordinal(), bits, int(booked)
+            )
+            self._set_generation(generation)
+            tag, mask = CELL.unpack_from(self.buf, offset)
+            if tag != date_obj.toordinal():
+                return
+            mask = mask | bits if booked else mask & ~bits
+            CELL.pack_into(self.buf, offset, tag, mask)
+        finally:
+            self._unlock()
+
+    def refresh(self, court_id, date_obj):
+        """
+        Recomputes one tracked court-day from BookingSlot, for writes that bypass
+        the booking services (admin edits, deletes). The read runs unlocked;
+        updates journaled meanwhile are re-applied before the cell is written.
+        """
+        offset = self._offset(court_id, date_obj)
+        if offset is None:
+            return
+        key = (int(court_id), date_obj)
+        since = self._generation()
+        masks = {key: _booked_masks(court_id=court_id, date=date_obj).get(key, 0)}
+        self._lock()
+        try:
+            tag, _ = CELL.unpack_from(self.buf, offset)
+            # Too many updates meanwhile: the cell they kept current is left as is
+            if tag != date_obj.toordinal() or not self._replay(since, masks):
+                return
+            CELL.pack_into(self.buf, offset, tag, masks[key])
+        finally:
+            self._unlock()
+
+    def rebuild(self):
+        """
+        Reloads every court-day in the window [yesterday, yesterday + horizon) from BookingSlot.
+        The read runs unlocked, so request threads keep updating cells meanwhile;
+        their journaled updates are re-applied to the snapshot before it is swapped in.
+        Returns False if every read was overtaken by more updates than the journal holds.
+        """
+        from booking_app.models import Court
+
+        window_start = timezone.localdate() - timedelta(days=1)
+        window_end = window_start + timedelta(days=self.horizon_days - 1)
+
+        for _ in range(READ_ATTEMPTS):
+            since = self._generation()
+            booked = _booked_masks(
+                date__gte=window_start,
+                date__lte=window_end,
+                court_id__lt=self.max_courts
+            )
+            court_ids = Court.objects.filter(id__lt=self.max_courts).values_list('id', flat=True)
+            masks = {}
+            for court_id in court_ids:
+                for i in range(self.horizon_days):
+                    key = (court_id, window_start + timedelta(days=i))
+                    masks[key] = booked.get(key, 0)
+
+            self._lock()
+            try:
+                if not self._replay(since, masks):
+                    continue
+                generation = self._header()[6]
+                HEADER.pack_into(self.buf, 0, MAGIC, 0, self.max_courts, self.horizon_days, 0, b'\0' * 16, generation)
+                self.buf[self.cells_offset:] = bytes(self.size - self.cells_offset)
+                for (court_id, date_obj), mask in masks.items():
+                    CELL.pack_into(self.buf, self._offset(court_id, date_obj), date_obj.toordinal(), mask)
+                HEADER.pack_into(
+                    self.buf, 0, MAGIC, 1, self.max_courts, self.horizon_days,
+                    window_start.toordinal(), _db_fingerprint(), generation
+                )
+                self.buf.flush()
+                return True
+            finally:
+                self._unlock()
+        return False
+
+
+def get_slot_index():
+    """
+    Returns the process-wide SlotIndex, or None when the index is disabled.
+    """
+    global _index
+    if _index is None:
+        path = getattr(settings, 'SLOT_INDEX_PATH', None)
+        if not path or fcntl is None:
+            return None
+        _index = SlotIndex(
+            path,
+            settings.SLOT_INDEX_MAX_COURTS,
+            settings.SLOT_INDEX_HORIZON_DAYS
+        )
+    return _index
+
+
+def lookup(court_id, date_obj, start_time):
+    """
+    Returns True if the cell is free, False if booked, None if the index can't tell.
+    """
+    index = get_slot_index()
+    if index is None:
+        return None
+    mask = index.get_mask(court_id, date_obj)
+    if mask is None:
+        return None
+    return not mask & (1 << start_time.hour)
+
+
+def get_booked_hours(court_id, date_obj):
+    """
+    Returns the set of booked hours for a court-day, or None if unknown.
+    """
+    index = get_slot_index()
+    if index is None:
+        return None
+    mask = index.get_mask(court_id, date_obj)
+    if mask is None:
+        return None
+    return {h for h in range(24) if mask & (1 << h)}
+
+
+def mark_on_commit(court_id, date_obj, hours, booked):
+    """
+    Updates the index once the surrounding transaction commits.
+    """
+    index = get_slot_index()
+    if index is None:
+        return
+    transaction.on_commit(lambda: index.update(court_id, date_obj, hours, booked))
+
+
+def maintains_index(func):
+    """
+    Marks a booking-service function that keeps the index current itself
+    (mark_on_commit), so the model signals skip their refresh for its writes.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _maintained.set(True)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _maintained.reset(token)
+    return wrapper
+
+
+def is_maintained():
+    return _maintained.get()
+
+
+def refresh_on_commit(court_id, date_obj):
+    """
+    Recomputes a court-day from the database once the surrounding transaction commits.
+    """
+    index = get_slot_index()
+    if index is None:
+        return
+    transaction.on_commit(lambda: index.refresh(court_id, date_obj))
+
+
+def refresh_slot_on_commit(slot_id):
+    """
+    refresh_on_commit for the court-day of a slot row, looked up after commit.
+    A slot deleted meanwhile is covered by its own refresh.
+    """
+    from booking_app.models import BookingSlot
+
+    index = get_slot_index()
+    if index is None:
+        return
+
+    def refresh():
+        cell = BookingSlot.objects.filter(id=slot_id).values_list('court_id', 'date').first()
+        if cell:
+            index.refresh(*cell)
+
+    transaction.on_commit(refresh)
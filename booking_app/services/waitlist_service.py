@@ -0,0 +1,202 @@
+"""
+Per-slot waitlist queues.
+
+A slot's waiting entries carry a gap-free, 1-based `position`, so the head is
+the (slot, notified=False, position=1) row of waitlist_queue_idx and a user's
+rank is their own row. Queues only change while the slot's BookingSlot row is
+locked (see locking): joins never share a rank, and a leave or an offer
+closes the gap with one `position = position - 1` UPDATE.
+
+An offer that lapses unanswered is passed on by `expire_offers`, run from the
+`waitlist_worker` command rather than from request handling.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from booking_app.models import BookingSlot, WaitlistEntry, WaitlistNotification
+from booking_app.services.locking import booking_transaction, for_update
+from booking_app.services.notification_service import (
+    bump_unread_version, create_court_closed_notifications, create_position_changed_notifications,
+    create_slot_available_notifications
+)
+
+
+def enqueue(user, slot):
+    """
+    Appends the user to the queue of a slot row the caller has locked.
+    """
+    if WaitlistEntry.objects.filter(user=user, requested_slot=slot).exists():
+        raise ValidationError("You are already on the waitlist for this slot.")
+    last = WaitlistEntry.objects.filter(
+        requested_slot=slot,
+        notified=False
+    ).aggregate(last=Max('position'))['last'] or 0
+    return WaitlistEntry.objects.create(
+        user=user,
+        requested_slot=slot,
+        court_id=slot.court_id,
+        position=last + 1
+    )
+
+
+def offer_next(slot_ids):
+    """
+    Dequeues the head of each locked slot's queue, sends them the
+    SLOT_AVAILABLE offer and moves everyone behind them up one place.
+    Returns the offered entries.
+    """
+    heads = list(WaitlistEntry.objects.filter(
+        requested_slot_id__in=list(slot_ids),
+        notified=False,
+        position=1
+    ).select_related('court', 'requested_slot'))
+    if not heads:
+        return []
+    create_slot_available_notifications(heads)
+    WaitlistEntry.objects.filter(id__in=[entry.id for entry in heads]).update(position=0)
+    for entry in heads:
+        entry.position = 0
+    _close_gaps({entry.requested_slot_id: 1 for entry in heads})
+    return heads
+
+
+def _close_gaps(vacated):
+    """
+    Shifts up the entries behind each vacated rank ({slot_id: position}, one
+    per slot), one UPDATE per distinct position, and tells the moved users
+    their new rank in one batch.
+    """
+    by_position = {}
+    for slot_id, position in vacated.items():
+        by_position.setdefault(position, []).append(slot_id)
+    moved = Q()
+    for position, slot_ids in sorted(by_position.items()):
+        WaitlistEntry.objects.filter(
+            requested_slot_id__in=slot_ids,
+            notified=False,
+            position__gt=position
+        ).update(position=F('position') - 1)
+        moved |= Q(requested_slot_id__in=slot_ids, position__gte=position)
+    entries = list(WaitlistEntry.objects.filter(moved, notified=False).select_related('court', 'requested_slot'))
+    create_position_changed_notifications(entries)
+    return entries
+
+
+def close_queues(slot_ids, reason='', notify=True):
+    """
+    Empties the queues of locked slots that won't come free (a court closure):
+    entries, their outstanding offers and unread rank notices are deleted and,
+    if `notify`, each user gets a closure notice. Returns how many were notified.
+    """
+    entries = list(WaitlistEntry.objects.filter(
+        requested_slot_id__in=list(slot_ids)
+    ).select_related('court', 'requested_slot'))
+    if not entries:
+        return 0
+
+    WaitlistEntry.objects.filter(id__in=[entry.id for entry in entries]).delete()
+    WaitlistNotification.objects.filter(
+        Q(id__in=[entry.notification_id for entry in entries if entry.notification_id])
+        | Q(slot_id__in=list(slot_ids), notification_type='POSITION_CHANGED', is_read=False)
+    ).delete()
+    bump_unread_version(entry.user_id for entry in entries)
+    if not notify:
+        return 0
+    return len(create_court_closed_notifications(entries, reason=reason))
+
+
+@booking_transaction('leave_waitlist')
+def leave_waitlist(user, entry_id):
+    """
+    Withdraws the user's entry. Waiting users behind it move up; a declined
+    offer passes straight to the next in line while the slot is still free.
+    Returns False if the user has no such entry.
+    """
+    slot_id = WaitlistEntry.objects.filter(
+        id=entry_id, user=user
+    ).values_list('requested_slot_id', flat=True).first()
+    if slot_id is None:
+        return False
+    slot = for_update(BookingSlot.objects.filter(id=slot_id)).get()
+    entry = WaitlistEntry.objects.filter(id=entry_id, user=user).first()
+    if entry is None:
+        return False
+
+    entry.delete()
+    if not entry.notified:
+        _close_gaps({slot_id: entry.position})
+        return True
+    if entry.notification_id:
+        WaitlistNotification.objects.filter(id=entry.notification_id).delete()
+        bump_unread_version([user.id])
+    if not slot.is_booked:
+        offer_next([slot_id])
+    return True
+
+
+@booking_transaction('expire_offers')
+def expire_offers(now=None, batch_size=None):
+    """
+    Handles up to `batch_size` lapsed SLOT_AVAILABLE offers, oldest first: the
+    offered entries leave the queue and each slot that is still free goes to
+    the next in line. Slots another transaction holds are skipped until the
+    next pass. Returns (expired, promoted).
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.WAITLIST_WORKER_BATCH_SIZE
+    lapsed = list(WaitlistNotification.objects.filter(
+        notification_type='SLOT_AVAILABLE',
+        expires_at__lte=now,
+        waitlistentry__isnull=False
+    ).order_by('expires_at').values_list('waitlistentry__id', 'waitlistentry__requested_slot_id')[:batch_size])
+    if not lapsed:
+        return 0, 0
+
+    slots = dict(for_update(
+        BookingSlot.objects.filter(id__in={slot_id for _, slot_id in lapsed}),
+        skip_locked=True
+    ).order_by('court_id', 'date', 'start_time').values_list('id', 'is_booked'))
+    entries = WaitlistEntry.objects.filter(
+        id__in=[entry_id for entry_id, slot_id in lapsed if slot_id in slots],
+        notified=True,
+        notification__expires_at__lte=now
+    )
+    slot_ids = set(entries.values_list('requested_slot_id', flat=True))
+    expired, _ = entries.delete()
+    promoted = offer_next([slot_id for slot_id in slot_ids if not slots[slot_id]])
+    return expired, len(promoted)
+
+
+def purge_stale(now=None, batch_size=None):
+    """
+    Deletes, in batches, notifications that expired more than
+    WAITLIST_NOTIFICATION_RETENTION_DAYS ago (unless an entry still points at
+    them) and waitlist entries for slots on past days.
+    Returns (notifications, entries) deleted.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.WAITLIST_WORKER_BATCH_SIZE
+    cutoff = now - timedelta(days=settings.WAITLIST_NOTIFICATION_RETENTION_DAYS)
+    today = timezone.localdate(now)
+
+    notifications = entries = 0
+    while True:
+        ids = list(WaitlistEntry.objects.filter(
+            requested_slot__date__lt=today
+        ).values_list('id', flat=True)[:batch_size])
+        entries += WaitlistEntry.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    while True:
+        ids = list(WaitlistNotification.objects.filter(
+            expires_at__lte=cutoff,
+            waitlistentry__isnull=True
+        ).order_by('expires_at').values_list('id', flat=True)[:batch_size])
+        notifications += WaitlistNotification.objects.filter(id__in=ids).delete()[0]
+        if len(ids) < batch_size:
+            break
+    return notifications, entries
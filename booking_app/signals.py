@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Booking, BookingSlot, Coach, Court, Equipment, Holiday, PeakWindow, PricingRule
+from .services import catalog, slot_index
+from .services.coach_service import sync_weekly_schedule
+from .services.inventory_service import sync_equipment_capacity
+
+
+@receiver(post_save, sender=Equipment)
+def equipment_saved(sender, instance, **kwargs):
+    # Stock edits apply to hourly ledger rows that already exist
+    sync_equipment_capacity(instance)
+
+
+@receiver(post_save, sender=Coach)
+def coach_saved(sender, instance, **kwargs):
+    # Keep the indexed weekly schedule in step with the availability JSON
+    sync_weekly_schedule(instance)
+
+
+@receiver([post_save, post_delete], sender=Court)
+@receiver([post_save, post_delete], sender=Equipment)
+@receiver([post_save, post_delete], sender=Coach)
+@receiver([post_save, post_delete], sender=PricingRule)
+@receiver([post_save, post_delete], sender=PeakWindow)
+@receiver([post_save, post_delete], sender=Holiday)
+def reference_data_changed(sender, **kwargs):
+    # Every worker reloads its catalog snapshot (and recompiles prices) after the edit commits
+    catalog.invalidate()
+
+
+@receiver([post_save, post_delete], sender=BookingSlot)
+def slot_changed(sender, instance, **kwargs):
+    # Admin edits and other writes outside booking_service; the services update
+    # the shared index themselves, bulk updates are caught by the periodic rebuild
+    if not slot_index.is_maintained():
+        slot_index.refresh_on_commit(instance.court_id, instance.date)
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    # A status change frees or takes the slot's hours
+    if not slot_index.is_maintained():
+        slot_index.refresh_slot_on_commit(instance.slot_id)
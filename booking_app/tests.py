@@ -1,3 +1,665 @@
-from django.test import TestCase
+import fcntl
+import os
+import tempfile
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from booking_app.models import (
+    Booking, BookingHold, BookingSlot, Coach, CoachReservation, Court, Equipment, PeakWindow,
+    PricingRule, WaitlistEntry, WaitlistNotification
+)
+from booking_app.services import slot_index
+from booking_app.services.availability_service import check_coach_availability, check_equipment_availability
+from booking_app.services.booking_service import (
+    HoldExpiredError, SlotConflictError, cancel_booking, cancel_court_bookings, confirm_hold,
+    create_booking, create_bookings, create_hold, join_waitlist, release_hold, reopen_court,
+    sweep_expired_holds
+)
+from booking_app.services.locking import LockContentionError, retry_on_conflict
+from booking_app.services.notification_service import get_user_notifications
+from booking_app.services.price_schedule import PRICE, PriceSchedule, UnpricedIntervalError
+from booking_app.services.pricing_service import PricingEngine
+from booking_app.services.slot_index import SlotIndex
+from booking_app.services.waitlist_service import expire_offers, leave_waitlist
+
+# A Monday far enough ahead that no test trips over "past" checks
+MONDAY = date(2036, 1, 7)
+TUESDAY = date(2036, 1, 8)
+
+
+# Tests get a private cache, no shared slot index file and static URLs without a collected manifest
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SLOT_INDEX_PATH='',
+    STORAGES={
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }
+)
+class BookingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Catalog invalidation runs on commit; run it so each test sees its own rows
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingRule.objects.create(base_price=500)
+            self.court = Court.objects.create(name="Court A", court_type='OUTDOOR', opening_hour=9, closing_hour=22)
+            self.coach = Coach.objects.create(name="Coach", hourly_rate=300, availability_slots={"Mon": ["10:00", "11:00"]})
+        self.user = get_user_model().objects.create_user('player')
+        self.client.force_login(self.user)
+
+    def make_user(self, username):
+        return get_user_model().objects.create_user(username)
+
+    def booked_hours(self, date_obj=MONDAY):
+        return sorted(BookingSlot.objects.filter(
+            court=self.court, date=date_obj, is_booked=True
+        ).values_list('start_time__hour', flat=True))
+
+
+class CoachAvailabilityTests(TestCase):
+    def setUp(self):
+        self.coach = Coach.objects.create(
+            name="Coach",
+            hourly_rate=300,
+            availability_slots={"Mon": ["10:00", "14:00"], "Tue": ["10:00", "14:00"]}
+        )
+
+    def test_free_scheduled_hour(self):
+        self.assertTrue(check_coach_availability(self.coach.id, MONDAY, time(14)))
+
+    def test_reserved_hour(self):
+        CoachReservation.objects.create(coach=self.coach, date=MONDAY, hour=14)
+        self.assertFalse(check_coach_availability(self.coach.id, MONDAY, time(14)))
+
+    def test_unscheduled_hour(self):
+        self.assertFalse(check_coach_availability(self.coach.id, MONDAY, time(12)))
+
+    def test_reservations_on_other_date_and_hour_do_not_combine(self):
+        # Mon 10:00 and Tue 14:00 must not add up to "Mon 14:00 is taken"
+        CoachReservation.objects.create(coach=self.coach, date=MONDAY, hour=10)
+        CoachReservation.objects.create(coach=self.coach, date=TUESDAY, hour=14)
+        self.assertTrue(check_coach_availability(self.coach.id, MONDAY, time(14)))
+
+
+class PriceScheduleTests(TestCase):
+    def schedule(self, *rules):
+        return PriceSchedule(rules, [], [], ['INDOOR', 'OUTDOOR'])
+
+    def test_interval_price_is_sum_of_units(self):
+        # 500/h, peak 18:00-21:00 at 1.5x, Monday so no weekend surcharge
+        schedule = self.schedule(PricingRule(pk=1, base_price=500))
+        self.assertAlmostEqual(schedule.lookup('OUTDOOR', MONDAY, time(10), 60)[PRICE], 500)
+        self.assertAlmostEqual(schedule.lookup('OUTDOOR', MONDAY, time(17), 120)[PRICE], 500 + 750)
+        self.assertAlmostEqual(schedule.lookup('INDOOR', MONDAY, time(10), 90)[PRICE], 500 * 1.4 * 1.5)
+
+    def test_latest_effective_rule_wins(self):
+        schedule = self.schedule(
+            PricingRule(pk=1, base_price=500),
+            PricingRule(pk=2, base_price=800, effective_from=MONDAY)
+        )
+        self.assertAlmostEqual(schedule.lookup('OUTDOOR', MONDAY, time(10))[PRICE], 800)
+        self.assertAlmostEqual(schedule.lookup('OUTDOOR', date(2035, 1, 1), time(10))[PRICE], 500)
+
+    def test_uncovered_date_is_not_priced(self):
+        schedule = self.schedule(PricingRule(pk=1, base_price=500, effective_to=date(2035, 12, 31)))
+        self.assertIsNone(schedule.rule_for(MONDAY))
+        with self.assertRaises(UnpricedIntervalError):
+            schedule.lookup('OUTDOOR', MONDAY, time(10))
+
+    def test_off_step_interval_is_not_priced(self):
+        schedule = self.schedule(PricingRule(pk=1, base_price=500))
+        for start_time, duration in ((time(9, 15), 60), (time(10), 45), (time(23), 120)):
+            with self.assertRaises(UnpricedIntervalError):
+                schedule.lookup('OUTDOOR', MONDAY, start_time, duration)
+
+
+class BatchQuoteTests(BookingTestCase):
+    def quote(self, **item):
+        item = {'court_id': self.court.id, 'date': MONDAY.isoformat(), 'start_time': '10:00', **item}
+        response = self.client.post('/api/quotes/', {'items': [item]}, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()[0]
+
+    def test_valid_item_is_priced(self):
+        quote = self.quote(duration_minutes=90, coach_id=self.coach.id)
+        self.assertIsNone(quote['error'])
+        self.assertEqual(quote['breakdown']['total'], 750 + 450)
+
+    def test_items_a_booking_would_reject_get_an_error(self):
+        for item in (
+            {'duration_minutes': 45},
+            {'start_time': '09:15'},
+            {'start_time': '07:00'},
+            {'start_time': '21:00', 'duration_minutes': 120},
+            {'court_id': 9999},
+            {'equipment_ids': [9999]},
+        ):
+            with self.subTest(item=item):
+                quote = self.quote(**item)
+                self.assertIsNone(quote['breakdown'])
+                self.assertTrue(quote['error'])
+
+    def test_oversized_grid_is_refused_before_expanding(self):
+        grid = {
+            'court_ids': [self.court.id] * 100,
+            'dates': [MONDAY.isoformat()] * 100,
+            'start_times': ['10:00'] * 100,
+        }
+        with mock.patch('booking_app.views.expand_quote_grid') as expand:
+            response = self.client.post('/api/quotes/', {'grid': grid}, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 400)
+        expand.assert_not_called()
+
+
+class BookingFormPriceTests(BookingTestCase):
+    def test_summed_units_match_the_breakdown_when_peak_starts_mid_hour(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PeakWindow.objects.create(rule=PricingRule.objects.get(), start_time=time(10, 30), end_time=time(11), multiplier=2)
+        response = self.client.get(f'/book/?date={MONDAY.isoformat()}', secure=True)
+        matrix = response.context['booking_matrix']
+        # 10:00 is hour row 1 of a 09:00-22:00 day; 90 minutes is three units from unit 2
+        rows = matrix['courts'][self.court.id]['prices'][2:5]
+        summed = [round(sum(column), 2) for column in zip(*rows)]
+        breakdown = PricingEngine().get_price_breakdown(self.court, MONDAY, time(10), [], None, 90)
+        self.assertEqual(summed, [
+            breakdown['base'], breakdown['court_premium'], breakdown['peak_surcharge'],
+            breakdown['weekend_surcharge'], breakdown['total'],
+        ])
+        self.assertEqual(breakdown['peak_surcharge'], 250)
+
+
+class BookingFormHoldTests(BookingTestCase):
+    def matrix(self, client):
+        response = client.get(f'/book/?date={MONDAY.isoformat()}', secure=True)
+        return response.context['booking_matrix']
+
+    def test_own_hold_shows_as_free_and_is_offered_back(self):
+        hold = create_hold(self.user, self.court.id, MONDAY, time(10), [], self.coach.id, 90)
+        matrix = self.matrix(self.client)
+        court = matrix['courts'][self.court.id]
+        # 10:00 and 11:00 are rows 1 and 2 of a 09:00-22:00 day
+        self.assertEqual(court['available'][1:3], [1, 1])
+        self.assertEqual(matrix['coach_hours'][self.coach.id][1:3], [1, 1])
+        self.assertEqual(matrix['hold']['id'], hold.id)
+
+        other = self.client_class()
+        other.force_login(self.make_user('other'))
+        matrix = self.matrix(other)
+        self.assertEqual(matrix['courts'][self.court.id]['available'][1:3], [0, 0])
+        self.assertIsNone(matrix['hold'])
+
+
+class BatchBookingTests(BookingTestCase):
+    def item(self, start_time, **kwargs):
+        return {'court_id': self.court.id, 'date': MONDAY, 'start_time': start_time, **kwargs}
+
+    def test_all_or_nothing_books_nothing_on_a_failing_item(self):
+        items = [self.item(time(10)), self.item(time(12)), self.item(time(12), duration_minutes=90)]
+        with self.assertRaises(ValidationError):
+            create_bookings(self.user, items, atomic=True)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self.booked_hours(), [])
+
+    def test_per_item_books_what_it_can(self):
+        create_booking(self.make_user('other'), self.court.id, MONDAY, time(14), [], None)
+        results = create_bookings(self.user, [
+            self.item(time(10), duration_minutes=90, coach_id=self.coach.id),
+            self.item(time(11)),
+            self.item(time(14)),
+            self.item(time(16), coach_id=self.coach.id),
+        ], atomic=False)
+        self.assertEqual([r['index'] for r in results], [0, 1, 2, 3])
+        self.assertIsNotNone(results[0]['booking'])
+        self.assertEqual(results[1]['error'], "Overlaps another booking in this batch.")
+        self.assertEqual(results[2]['error'], "Slot already booked.")
+        self.assertEqual(results[3]['error'], "Coach not available.")
+        self.assertEqual(results[0]['booking'].total_price, 750 + 450)
+        self.assertEqual(self.booked_hours(), [10, 11, 14])
+
+    def test_api_reports_per_item_results(self):
+        response = self.client.post('/api/create-bookings/', {
+            'mode': 'per_item',
+            'items': [
+                {'court_id': self.court.id, 'date': MONDAY.isoformat(), 'start_time': '10:00'},
+                {'court_id': self.court.id, 'date': MONDAY.isoformat(), 'start_time': '10:00'},
+            ],
+        }, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['booked'], response.json()['failed']), (1, 1))
+
+
+class CreateBookingTests(BookingTestCase):
+    def book(self, user, start_time, duration_minutes=60, **kwargs):
+        return create_booking(user, self.court.id, MONDAY, start_time, kwargs.get('equipment_ids', []),
+                              kwargs.get('coach_id'), duration_minutes)
+
+    def test_claims_every_covered_hour(self):
+        booking = self.book(self.user, time(10), 90, coach_id=self.coach.id)
+        self.assertEqual(booking.booking_status, 'CONFIRMED')
+        self.assertEqual(self.booked_hours(), [10, 11])
+        self.assertEqual(
+            sorted(CoachReservation.objects.filter(booking=booking).values_list('hour', flat=True)), [10, 11]
+        )
+
+    def test_overlapping_claim_conflicts(self):
+        self.book(self.user, time(10), 90)
+        with self.assertRaises(SlotConflictError):
+            self.book(self.make_user('other'), time(11))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_confirmed_booking_blocks_a_slot_reset_by_hand(self):
+        # The claim succeeds on the reset row; the partial unique constraint still refuses a second booking
+        self.book(self.user, time(10))
+        BookingSlot.objects.filter(court=self.court, date=MONDAY).update(is_booked=False)
+        with self.assertRaises(SlotConflictError):
+            self.book(self.make_user('other'), time(10))
+        self.assertEqual(Booking.objects.filter(booking_status='CONFIRMED').count(), 1)
+
+    @override_settings(BOOKING_CONCURRENCY='pessimistic')
+    def test_pessimistic_path_conflicts_the_same_way(self):
+        self.book(self.user, time(10), 90)
+        with self.assertRaises(SlotConflictError):
+            self.book(self.make_user('other'), time(11))
+        self.assertEqual(self.booked_hours(), [10, 11])
+
+    def test_cancel_frees_every_covered_hour(self):
+        booking = self.book(self.user, time(10), 90, coach_id=self.coach.id)
+        cancel_booking(booking.id)
+        self.assertEqual(self.booked_hours(), [])
+        self.assertFalse(CoachReservation.objects.exists())
+        self.book(self.make_user('other'), time(11))
+
+
+class BookingHoldTests(BookingTestCase):
+    def hold(self, **kwargs):
+        return create_hold(self.user, self.court.id, MONDAY, time(10), [], self.coach.id, 90, **kwargs)
+
+    def test_hold_claims_slot_and_coach(self):
+        self.hold()
+        self.assertEqual(self.booked_hours(), [10, 11])
+        self.assertFalse(check_coach_availability(self.coach.id, MONDAY, time(10)))
+        with self.assertRaises(SlotConflictError):
+            create_booking(self.make_user('other'), self.court.id, MONDAY, time(11), [], None)
+
+    def test_confirm_turns_hold_into_booking_at_quoted_price(self):
+        hold = self.hold()
+        booking = confirm_hold(self.user, hold.id)
+        self.assertEqual(booking.total_price, hold.total_price)
+        self.assertEqual(booking.slot_id, hold.slot_id)
+        self.assertFalse(BookingHold.objects.exists())
+        self.assertEqual(CoachReservation.objects.filter(booking=booking).count(), 2)
+
+    def test_new_hold_replaces_the_old_one(self):
+        self.hold()
+        create_hold(self.user, self.court.id, MONDAY, time(14), [], None)
+        self.assertEqual(BookingHold.objects.count(), 1)
+        self.assertEqual(self.booked_hours(), [14])
+        self.assertFalse(CoachReservation.objects.exists())
+
+    def test_expired_hold_cannot_be_confirmed_and_is_swept(self):
+        hold = self.hold()
+        BookingHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(HoldExpiredError):
+            confirm_hold(self.user, hold.id)
+        self.assertEqual(sweep_expired_holds(), 1)
+        self.assertEqual(self.booked_hours(), [])
+        self.assertFalse(CoachReservation.objects.exists())
+
+    def test_expired_hold_gives_way_to_a_booking(self):
+        hold = self.hold()
+        BookingHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        create_booking(self.make_user('other'), self.court.id, MONDAY, time(11), [], None)
+        self.assertFalse(BookingHold.objects.exists())
+
+    @override_settings(BOOKING_CONCURRENCY='pessimistic')
+    def test_expired_hold_gives_way_on_the_locked_path(self):
+        hold = self.hold()
+        BookingHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        create_booking(self.make_user('other'), self.court.id, MONDAY, time(11), [], None)
+        self.assertFalse(BookingHold.objects.exists())
+
+    def test_waitlist_worker_sweeps_expired_holds(self):
+        hold = self.hold()
+        BookingHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('waitlist_worker', '--once', stdout=StringIO())
+        self.assertFalse(BookingHold.objects.exists())
+        self.assertEqual(self.booked_hours(), [])
+
+    def test_confirm_api_answers_410_for_an_expired_hold(self):
+        hold = self.hold()
+        BookingHold.objects.filter(id=hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.post(f'/api/holds/{hold.id}/confirm/', secure=True)
+        self.assertEqual(response.status_code, 410)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    BOOKING_RETRY_ATTEMPTS=3,
+    BOOKING_RETRY_BASE_DELAY=0
+)
+class RetryOnConflictTests(SimpleTestCase):
+    # Outside a transaction, as the decorated services run in production
+    def test_busy_database_is_retried_then_reported(self):
+        calls = []
+
+        @retry_on_conflict('create_booking')
+        def busy():
+            calls.append(1)
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(LockContentionError):
+            busy()
+        self.assertEqual(len(calls), 3)
+
+    def test_transient_conflict_succeeds_on_retry(self):
+        calls = []
+
+        @retry_on_conflict('create_booking')
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return 'booked'
+
+        self.assertEqual(flaky(), 'booked')
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        @retry_on_conflict('create_booking')
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such table')
+
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(len(calls), 1)
+
+
+class LockContentionResponseTests(BookingTestCase):
+    def test_create_booking_answers_409_with_retry_after(self):
+        with mock.patch('booking_app.views.create_booking', side_effect=LockContentionError(retry_after=2)):
+            response = self.client.post('/api/create-booking/', {
+                'court_id': self.court.id, 'date': MONDAY.isoformat(), 'start_time': '10:00'
+            }, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '2')
+        self.assertEqual(response.json()['retry_after'], 2)
+
+    def test_slot_conflict_answers_409(self):
+        create_booking(self.make_user('other'), self.court.id, MONDAY, time(10), [], None)
+        response = self.client.post('/api/create-booking/', {
+            'court_id': self.court.id, 'date': MONDAY.isoformat(), 'start_time': '10:00'
+        }, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 409)
+
+
+class WaitlistTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = create_booking(self.user, self.court.id, MONDAY, time(10), [], None)
+        self.waiting = [self.make_user(f'waiting{i}') for i in range(3)]
+        self.entries = [join_waitlist(user, self.court.id, MONDAY, time(10)) for user in self.waiting]
+
+    def positions(self):
+        return {
+            entry.user.username: entry.position
+            for entry in WaitlistEntry.objects.filter(notified=False).select_related('user')
+        }
+
+    def test_joins_get_consecutive_ranks(self):
+        self.assertEqual([entry.position for entry in self.entries], [1, 2, 3])
+        with self.assertRaises(ValidationError):
+            join_waitlist(self.waiting[0], self.court.id, MONDAY, time(10))
+
+    def test_free_slot_cannot_be_waited_for(self):
+        with self.assertRaises(ValidationError):
+            join_waitlist(self.user, self.court.id, MONDAY, time(12))
+
+    def test_leaving_closes_the_gap(self):
+        self.assertTrue(leave_waitlist(self.waiting[1], self.entries[1].id))
+        self.assertEqual(self.positions(), {'waiting0': 1, 'waiting2': 2})
+        self.assertTrue(WaitlistNotification.objects.filter(
+            user=self.waiting[2], notification_type='POSITION_CHANGED'
+        ).exists())
+        self.assertFalse(leave_waitlist(self.waiting[1], self.entries[1].id))
+
+    def test_cancellation_offers_the_head_and_moves_the_rest_up(self):
+        cancel_booking(self.booking.id)
+        head = WaitlistEntry.objects.get(id=self.entries[0].id)
+        self.assertTrue(head.notified)
+        self.assertEqual(head.notification.notification_type, 'SLOT_AVAILABLE')
+        self.assertEqual(self.positions(), {'waiting1': 1, 'waiting2': 2})
+
+    def test_lapsed_offer_passes_to_the_next_in_line(self):
+        cancel_booking(self.booking.id)
+        expired, promoted = expire_offers(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual((expired, promoted), (1, 1))
+        self.assertFalse(WaitlistEntry.objects.filter(id=self.entries[0].id).exists())
+        self.assertTrue(WaitlistEntry.objects.get(id=self.entries[1].id).notified)
+        self.assertEqual(self.positions(), {'waiting2': 1})
+
+
+class NotificationCountTests(BookingTestCase):
+    def get(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get('/api/notifications/count/', headers=headers, secure=True)
+
+    def test_unchanged_count_revalidates_with_304(self):
+        response = self.get()
+        self.assertEqual(response.json(), {'count': 0})
+        self.assertEqual(self.get(response['ETag']).status_code, 304)
+
+    def test_new_notification_changes_the_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = create_booking(self.make_user('other'), self.court.id, MONDAY, time(10), [], None)
+            join_waitlist(self.user, self.court.id, MONDAY, time(10))
+            cancel_booking(booking.id)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'count': 1})
+
+
+class NotificationListTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        slot = BookingSlot.objects.create(court=self.court, date=MONDAY, start_time=time(10), end_time=time(11))
+        expires_at = timezone.now() + timedelta(days=1)
+        notifications = WaitlistNotification.objects.bulk_create([
+            WaitlistNotification(user=self.user, slot=slot, notification_type='POSITION_CHANGED',
+                                 message=f"Notice {i}", expires_at=expires_at)
+            for i in range(5)
+        ])
+        # Two rows share a timestamp, so pages have to break ties on id
+        created_at = timezone.now()
+        for notification, offset in zip(notifications, (4, 3, 3, 2, 1)):
+            WaitlistNotification.objects.filter(id=notification.id).update(
+                created_at=created_at - timedelta(minutes=offset)
+            )
+        self.newest_first = [n.id for n in reversed(notifications)]
+
+    def test_pages_cover_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = get_user_notifications(self.user, 2, cursor)
+            seen += [row['id'] for row in rows]
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.newest_first)
+
+    def test_api_pages_with_next_cursor(self):
+        response = self.client.get('/api/notifications/list/?limit=3', secure=True)
+        first = response.json()
+        response = self.client.get(f"/api/notifications/list/?limit=3&cursor={first['next_cursor']}", secure=True)
+        second = response.json()
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual([n['id'] for n in first['results'] + second['results']], self.newest_first)
+
+    def test_bad_cursor_or_limit_is_400(self):
+        for query in ('cursor=nope', 'limit=0', 'limit=x'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/notifications/list/?{query}', secure=True)
+                self.assertEqual(response.status_code, 400)
+
+
+class EquipmentAvailabilityTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.racket = Equipment.objects.create(
+                name="Racket", equipment_type='RACKET', quantity_available=1, rent_price_per_hour=50
+            )
+            self.early_court = Court.objects.create(
+                name="Court B", court_type='INDOOR', opening_hour=9, closing_hour=20
+            )
+
+    def test_free_unit(self):
+        self.assertTrue(check_equipment_availability(self.court.id, [self.racket.id], MONDAY, time(20), 120))
+
+    def test_interval_is_bounded_by_the_courts_hours(self):
+        with self.assertRaises(ValidationError):
+            check_equipment_availability(self.early_court.id, [self.racket.id], MONDAY, time(20))
+
+
+class HoldWaitlistTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hold = create_hold(self.user, self.court.id, MONDAY, time(10), [], None)
+        self.waiting = self.make_user('waiting')
+        self.entry = join_waitlist(self.waiting, self.court.id, MONDAY, time(10))
+
+    def expire_hold(self):
+        BookingHold.objects.filter(id=self.hold.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_released_hold_is_offered_to_the_waitlist(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            release_hold(self.user, self.hold.id)
+        self.assertTrue(WaitlistEntry.objects.get(id=self.entry.id).notified)
+
+    def test_swept_hold_is_offered_to_the_waitlist(self):
+        self.expire_hold()
+        with self.captureOnCommitCallbacks(execute=True):
+            sweep_expired_holds()
+        self.assertTrue(WaitlistEntry.objects.get(id=self.entry.id).notified)
+
+    def test_slot_claimed_back_in_the_same_transaction_is_not_offered(self):
+        self.expire_hold()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_booking(self.make_user('other'), self.court.id, MONDAY, time(10), [], None)
+        self.assertFalse(WaitlistEntry.objects.get(id=self.entry.id).notified)
+        self.assertFalse(WaitlistNotification.objects.filter(notification_type='SLOT_AVAILABLE').exists())
+
+
+class CourtClosureTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = create_booking(self.user, self.court.id, MONDAY, time(10), [], None)
+        create_hold(self.make_user('holder'), self.court.id, MONDAY, time(14), [], None)
+        self.waiting = self.make_user('waiting')
+        join_waitlist(self.waiting, self.court.id, MONDAY, time(10))
+
+    def close(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return cancel_court_bookings(self.court.id, MONDAY, TUESDAY, reason="Resurfacing", **kwargs)
+
+    def test_closure_cancels_and_keeps_the_court_unavailable(self):
+        result = self.close()
+        self.assertEqual((result['cancelled'], result['holds_released']), (1, 1))
+        self.assertEqual(Booking.objects.get(id=self.booking.id).booking_status, 'CANCELLED')
+        self.assertEqual(self.booked_hours(MONDAY), list(range(9, 22)))
+        self.assertEqual(self.booked_hours(TUESDAY), list(range(9, 22)))
+        with self.assertRaises(SlotConflictError):
+            create_booking(self.make_user('other'), self.court.id, MONDAY, time(12), [], None)
+
+    def test_waitlisted_users_get_a_closure_notice_not_an_offer(self):
+        self.assertEqual(self.close()['waitlist_notified'], 1)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertFalse(WaitlistNotification.objects.filter(notification_type='SLOT_AVAILABLE').exists())
+        notice = WaitlistNotification.objects.get(user=self.waiting)
+        self.assertEqual(notice.notification_type, 'BOOKING_CANCELLED')
+        self.assertIn("Resurfacing", notice.message)
+
+    def test_no_waitlist_skips_the_notice(self):
+        self.assertEqual(self.close(notify_waitlist=False)['waitlist_notified'], 0)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertFalse(WaitlistNotification.objects.filter(user=self.waiting).exists())
+
+    def test_reopen_frees_what_no_booking_covers(self):
+        self.close()
+        # Tuesday reopened first and booked, then the whole range reopened
+        reopen_court(self.court.id, TUESDAY, TUESDAY)
+        create_booking(self.user, self.court.id, TUESDAY, time(10), [], None, 90)
+        self.assertEqual(reopen_court(self.court.id, MONDAY, TUESDAY), 13)
+        self.assertEqual(self.booked_hours(MONDAY), [])
+        self.assertEqual(self.booked_hours(TUESDAY), [10, 11])
+        create_booking(self.make_user('other'), self.court.id, MONDAY, time(12), [], None)
+
+
+class SlotIndexTests(BookingTestCase):
+    def setUp(self):
+        super().setUp()
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        self.index = SlotIndex(path, 10000, 7)
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def test_rebuild_loads_booked_hours(self):
+        create_booking(self.user, self.court.id, self.day, time(10), [], None, 90)
+        self.assertTrue(self.index.rebuild())
+        self.assertEqual(self.index.get_mask(self.court.id, self.day), (1 << 10) | (1 << 11))
+
+    def test_rebuild_reads_unlocked_and_keeps_updates_made_meanwhile(self):
+        read = slot_index._booked_masks
+
+        def read_while_booking(**filters):
+            # Another process can take the lock while the database is read
+            with open(self.index.path, 'rb') as other:
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(other, fcntl.LOCK_UN)
+            masks = read(**filters)
+            self.index.update(self.court.id, self.day, [15], True)
+            return masks
+
+        with mock.patch('booking_app.services.slot_index._booked_masks', side_effect=read_while_booking):
+            self.assertTrue(self.index.rebuild())
+        self.assertEqual(self.index.get_mask(self.court.id, self.day), 1 << 15)
+
+    def test_refresh_keeps_updates_made_during_its_read(self):
+        self.index.rebuild()
+        read = slot_index._booked_masks
+
+        def read_while_cancelling(**filters):
+            masks = read(**filters)
+            self.index.update(self.court.id, self.day, [9], False)
+            return masks
+
+        create_booking(self.user, self.court.id, self.day, time(9), [], None)
+        with mock.patch('booking_app.services.slot_index._booked_masks', side_effect=read_while_cancelling):
+            self.index.refresh(self.court.id, self.day)
+        self.assertEqual(self.index.get_mask(self.court.id, self.day), 0)
+
+
+class SlotIndexSignalTests(BookingTestCase):
+    def test_service_writes_skip_the_signal_refresh(self):
+        with mock.patch.object(slot_index, 'refresh_slot_on_commit') as refresh:
+            booking = create_booking(self.user, self.court.id, MONDAY, time(10), [], None)
+            cancel_booking(booking.id)
+        refresh.assert_not_called()
+
+    def test_other_writes_refresh_the_court_day(self):
+        booking = create_booking(self.user, self.court.id, MONDAY, time(10), [], None)
+        with mock.patch.object(slot_index, 'refresh_slot_on_commit') as refresh:
+            booking.booking_status = 'CANCELLED'
+            booking.save()
+        refresh.assert_called_once_with(booking.slot_id)
@@ -9,6 +9,7 @@ urlpatterns = [
     path('book/confirm/', views.confirm_booking, name='confirm_booking'),
     path('book/success/<int:booking_id>/', views.booking_success, name='booking_success'),
     path('waitlist/join/', views.join_waitlist_view, name='join_waitlist'),
+    path('waitlist/<int:entry_id>/leave/', views.leave_waitlist_view, name='leave_waitlist'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('booking/cancel/<int:booking_id>/', views.cancel_booking_view, name='cancel_booking'),
     
@@ -17,11 +18,23 @@ urlpatterns = [
     
     # API
     path('api/available-slots/', views.AvailableSlotsView.as_view(), name='api_available_slots'),
+    path('api/available-slots/range/', views.AvailableSlotsRangeView.as_view(), name='api_available_slots_range'),
+    path('api/alternative-slots/', views.AlternativeSlotsView.as_view(), name='api_alternative_slots'),
+    path('api/available-coaches/', views.AvailableCoachesView.as_view(), name='api_available_coaches'),
+    path('api/quotes/', views.BatchQuoteView.as_view(), name='api_batch_quotes'),
+    path('api/price-cache/stats/', views.PriceCacheStatsView.as_view(), name='api_price_cache_stats'),
+    path('api/retries/stats/', views.RetryStatsView.as_view(), name='api_retry_stats'),
     path('api/create-booking/', views.CreateBookingAPI.as_view(), name='api_create_booking'),
+    path('api/create-bookings/', views.BatchBookingAPI.as_view(), name='api_create_bookings'),
+    path('api/holds/', views.BookingHoldAPI.as_view(), name='api_holds'),
+    path('api/holds/<int:pk>/', views.BookingHoldDetailAPI.as_view(), name='api_hold_detail'),
+    path('api/holds/<int:pk>/confirm/', views.ConfirmHoldAPI.as_view(), name='api_confirm_hold'),
     
     # Notifications
     path('api/notifications/count/', views.NotificationCountView.as_view(), name='notification_count'),
+    path('api/notifications/stream/', views.notification_stream, name='notification_stream'),
     path('api/notifications/list/', views.NotificationListView.as_view(), name='notification_list'),
+    path('api/notifications/read/', views.MarkAllNotificationsReadView.as_view(), name='mark_all_notifications_read'),
     path('api/notifications/<int:pk>/read/', views.MarkNotificationReadView.as_view(), name='mark_notification_read'),
     path('api/notifications/<int:pk>/book/', views.NotificationBookView.as_view(), name='notification_book'),
     
@@ -1,25 +1,52 @@
 import os
+import json
+import logging
+from math import prod
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
-from django.utils.decorators import method_decorator
+from django.conf import settings
 from django.views import View
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib import messages
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-from datetime import datetime, timedelta, time
-
-from .models import Court, Equipment, Coach, Booking, BookingSlot
-from .serializers import CourtSerializer, BookingSlotSerializer, BookingSerializer
-from .services.availability_service import check_court_availability
-from .services.booking_service import create_booking, cancel_booking, join_waitlist
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from datetime import datetime
+
+from .models import Booking
+from .serializers import BookingSerializer
+from .services.availability_service import (
+    get_covered_hours, check_court_availability, get_day_availability_grid, iter_availability_range,
+    find_alternative_slots
+)
+from .services.booking_service import (
+    create_booking, create_bookings, expand_recurring_items, cancel_booking, join_waitlist,
+    create_hold, confirm_hold, release_hold, get_user_hold, SlotConflictError, HoldExpiredError
+)
 from .models import WaitlistEntry
-from .services.pricing_service import PricingEngine
+from .services.pricing_service import PricingEngine, expand_quote_grid, breakdown_memo
+from .services.catalog import get_catalog
+from .services.locking import get_retry_stats, LockContentionError
+from .services.coach_service import get_available_coaches, get_free_coach_hours
+from .services.waitlist_service import leave_waitlist
+from .services.notification_stream import stream_notifications
+
+logger = logging.getLogger(__name__)
+
+def lock_busy_response(e):
+    """
+    409 for a request that lost a row lock under the lock-wait policy; nothing was
+    written, so the client can send the same request again after `retry_after`.
+    """
+    response = Response({"error": e.messages[0], "retry_after": e.retry_after}, status=409)
+    response['Retry-After'] = str(e.retry_after)
+    return response
 
 # --- Admin Creation View ---
 
@@ -101,32 +128,71 @@ def booking_wizard(request):
     
     date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
     
-    # Generate slots for the day (9AM - 10PM)
-    slots = []
-    start_hour = 9
-    end_hour = 22
-    
-    courts = Court.objects.filter(is_active=True)
+    # Courts x hours grid for the day (union of the courts' opening hours) in two queries
+    grid = get_day_availability_grid(date_obj)
     
-    # Pre-fetch existing slots/bookings to optimize?
-    # For simplicity, we iterate.
-    
-    # We want to show a grid or list of available slots.
-    # Let's just show available time slots first, then pick court?
-    # Or pick time + court.
+    # Time slots with how many courts are still free, so full hours can be greyed out
+    time_slots = [
+        {'time': t, 'free_courts': grid.free_court_count(t)}
+        for t in grid.hours
+    ]
+        
+    catalog = get_catalog()
+    equipment = list(catalog.equipment.values())
+    coaches = list(catalog.coaches.values())
     
-    # Let's generate a list of time slots.
-    time_slots = []
-    for h in range(start_hour, end_hour):
-        t = time(h, 0)
-        time_slots.append(t)
+    # Everything the form needs to price and check a selection locally,
+    # so the server is only hit on confirm
+    price_matrix = PricingEngine().get_price_matrix(grid.courts, date_obj, grid.hours)
+    free_coach_hours = get_free_coach_hours(date_obj, grid.hours)
+    booking_matrix = {
+        'hours': [t.strftime("%H:%M") for t in grid.hours],
+        'courts': {
+            court['id']: {
+                'court_type': court['court_type'],
+                'opening_hour': court['opening_hour'],
+                'closing_hour': court['closing_hour'],
+                'available': [int(grid.is_available(court['id'], t)) for t in grid.hours],
+                'prices': price_matrix[court['id']],
+            }
+            for court in grid.courts
+        },
+        'equipment': {eq.id: float(eq.rent_price_per_hour) for eq in equipment},
+        'coaches': {coach.id: float(coach.hourly_rate) for coach in coaches},
+        'coach_hours': {
+            coach.id: [int(t.hour in free_coach_hours.get(coach.id, ())) for t in grid.hours]
+            for coach in coaches
+        },
+        'hold': None,
+    }
+
+    # The user's own hold (after a reload or Back) claims its cells and coach
+    # hours like a booking would; show them as free so the form can re-attach
+    hold = get_user_hold(request.user, date_obj)
+    if hold and hold.court_id in booking_matrix['courts']:
+        held = set(get_covered_hours(hold.slot.start_time, hold.end_time))
+        indexes = [i for i, t in enumerate(grid.hours) if t.hour in held]
+        for i in indexes:
+            booking_matrix['courts'][hold.court_id]['available'][i] = 1
+            if hold.coach_id in booking_matrix['coach_hours']:
+                booking_matrix['coach_hours'][hold.coach_id][i] = 1
+        booking_matrix['hold'] = {
+            'id': hold.id,
+            'court_id': hold.court_id,
+            'time': hold.slot.start_time.strftime("%H:%M"),
+            'duration': hold.duration_minutes,
+            'equipment_ids': hold.equipment_ids,
+            'coach_id': hold.coach_id,
+            'expires_at': hold.expires_at.isoformat(),
+        }
         
     context = {
         'date': date_str,
         'time_slots': time_slots,
-        'courts': courts,
-        'equipment': Equipment.objects.all(),
-        'coaches': Coach.objects.all(),
+        'courts': grid.courts,
+        'equipment': equipment,
+        'coaches': coaches,
+        'booking_matrix': booking_matrix,
     }
     return render(request, 'booking/booking_form.html', context)
 
@@ -139,20 +205,41 @@ def confirm_booking(request):
             court_id = request.POST.get('court')
             equipment_ids = request.POST.getlist('equipment')
             coach_id = request.POST.get('coach') or None
+            duration_minutes = int(request.POST.get('duration') or 60)
             
             date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
             start_time = datetime.strptime(time_str, '%H:%M').time()
             
-            booking = create_booking(
-                user=request.user,
-                court_id=court_id,
-                date_obj=date_obj,
-                start_time=start_time,
-                equipment_ids=equipment_ids,
-                coach_id=coach_id
-            )
+            selection = {
+                'court_id': court_id,
+                'date_obj': date_obj,
+                'start_time': start_time,
+                'equipment_ids': equipment_ids,
+                'coach_id': coach_id,
+                'duration_minutes': duration_minutes,
+            }
+            # The form holds the slot while the user decides; confirming the hold
+            # only inserts the booking. Without a usable hold, book directly.
+            hold_id = request.POST.get('hold')
+            booking = None
+            if hold_id:
+                try:
+                    booking = confirm_hold(request.user, hold_id, expected=selection)
+                except HoldExpiredError:
+                    release_hold(request.user, hold_id)
+            if booking is None:
+                booking = create_booking(user=request.user, **selection)
             return redirect('booking_success', booking_id=booking.id)
-            
+
+        except LockContentionError as e:
+            # Offer the same submission again rather than dropping the user's picks
+            response = render(request, 'booking/slot_busy.html', {
+                'message': e.messages[0],
+                'retry_after': e.retry_after,
+                'fields': [(k, v) for k in request.POST if k != 'csrfmiddlewaretoken' for v in request.POST.getlist(k)],
+            }, status=409)
+            response['Retry-After'] = str(e.retry_after)
+            return response
         except Exception as e:
             messages.error(request, str(e))
             return redirect('home')
@@ -207,6 +294,18 @@ def join_waitlist_view(request):
             
     return redirect('dashboard')
 
+@login_required
+def leave_waitlist_view(request, entry_id):
+    if request.method == 'POST':
+        try:
+            if leave_waitlist(request.user, entry_id):
+                messages.success(request, "You have left the waitlist.")
+            else:
+                messages.error(request, "Waitlist entry not found.")
+        except Exception as e:
+            messages.error(request, str(e))
+    return redirect('dashboard')
+
 # --- HTMX Views ---
 
 def calculate_price_htmx(request):
@@ -216,31 +315,40 @@ def calculate_price_htmx(request):
         time_str = request.GET.get('time')
         equipment_ids = request.GET.getlist('equipment')
         coach_id = request.GET.get('coach') or None
+        duration_minutes = int(request.GET.get('duration') or 60)
         
         if not (court_id and date_str and time_str):
             return HttpResponse("Select details to see price")
 
         date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
         start_time = datetime.strptime(time_str, '%H:%M').time()
-        court = Court.objects.get(id=court_id)
+        court = get_catalog().get_court(court_id)
+        if court is None:
+            return HttpResponse("Court not found")
         
-        print(f"DEBUG: Checking availability for Court {court.name} ({court.id}) on {date_obj} at {start_time}")
-        is_avail = check_court_availability(court.id, date_obj, start_time)
-        print(f"DEBUG: Result = {is_avail}")
+        is_available = check_court_availability(court.id, date_obj, start_time, duration_minutes)
+        logger.debug(
+            "Availability for court %s on %s at %s (%s min): %s",
+            court.id, date_obj, start_time, duration_minutes, is_available
+        )
         
         engine = PricingEngine()
         breakdown = engine.get_price_breakdown(
-            court, date_obj, start_time, equipment_ids, coach_id
+            court, date_obj, start_time, equipment_ids, coach_id, duration_minutes
         )
         
-        # Use the result from above
-        is_available = is_avail
-        
-        print(f"DEBUG: Context is_available = {is_available}")
+        alternatives = []
+        if not is_available:
+            alternatives = find_alternative_slots(
+                court.court_type, date_obj, start_time,
+                coach_id=coach_id, equipment_ids=equipment_ids,
+                duration_minutes=duration_minutes
+            )
         
         context = {
             'breakdown': breakdown,
             'is_available': is_available,
+            'alternatives': alternatives,
             'court_id': court_id,
             'date': date_str,
             'time': time_str
@@ -248,6 +356,7 @@ def calculate_price_htmx(request):
         
         return render(request, 'booking/partials/price_breakdown.html', context)
     except Exception as e:
+        logger.exception("Price calculation failed")
         return HttpResponse(f"Error: {str(e)}")
 
 # --- API Views ---
@@ -259,21 +368,201 @@ class AvailableSlotsView(APIView):
             return Response({"error": "Date required"}, status=400)
             
         date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-        courts = Court.objects.filter(is_active=True)
+        grid = get_day_availability_grid(date_obj)
         
-        available_slots = []
-        for h in range(9, 22):
-            t = time(h, 0)
-            for court in courts:
-                if check_court_availability(court.id, date_obj, t):
-                    available_slots.append({
-                        'court': court.name,
-                        'time': t.strftime("%H:%M"),
-                        'court_id': court.id
-                    })
+        available_slots = [
+            {
+                'court': court['name'],
+                'time': t.strftime("%H:%M"),
+                'court_id': court['id']
+            }
+            for court, t in grid.available_cells()
+        ]
                     
         return Response(available_slots)
 
+class AvailableSlotsRangeView(APIView):
+    """
+    Availability for a date range, streamed as NDJSON: one line per day.
+    """
+    MAX_RANGE_DAYS = 92
+
+    def get(self, request):
+        start_str = request.query_params.get('start')
+        end_str = request.query_params.get('end')
+        if not (start_str and end_str):
+            return Response({"error": "start and end required"}, status=400)
+
+        try:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+            court_ids = [int(c) for c in request.query_params.get('court_ids', '').split(',') if c]
+        except ValueError:
+            return Response({"error": "Invalid date or court id"}, status=400)
+
+        if end_date < start_date:
+            return Response({"error": "end must not be before start"}, status=400)
+        if (end_date - start_date).days >= self.MAX_RANGE_DAYS:
+            return Response({"error": f"Range is limited to {self.MAX_RANGE_DAYS} days"}, status=400)
+
+        grids = iter_availability_range(
+            start_date, end_date,
+            court_type=request.query_params.get('court_type'),
+            court_ids=court_ids
+        )
+
+        def stream():
+            for grid in grids:
+                yield json.dumps({
+                    'date': grid.date.isoformat(),
+                    'slots': [
+                        {
+                            'court': court['name'],
+                            'time': t.strftime("%H:%M"),
+                            'court_id': court['id']
+                        }
+                        for court, t in grid.available_cells()
+                    ]
+                }) + "\n"
+
+        return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+class AvailableCoachesView(APIView):
+    def get(self, request):
+        date_str = request.query_params.get('date')
+        time_str = request.query_params.get('time')
+        if not (date_str and time_str):
+            return Response({"error": "date and time required"}, status=400)
+
+        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+        start_time = datetime.strptime(time_str, '%H:%M').time()
+        coaches = get_available_coaches(date_obj, start_time)
+        return Response([
+            {'id': c['id'], 'name': c['name'], 'hourly_rate': float(c['hourly_rate'])}
+            for c in coaches
+        ])
+
+class AlternativeSlotsView(APIView):
+    """
+    Nearest free cells to a requested (court type, date, time), optionally
+    requiring a coach and equipment to be free as well.
+    """
+    MAX_LIMIT = 20
+
+    def get(self, request):
+        date_str = request.query_params.get('date')
+        time_str = request.query_params.get('time')
+        if not (date_str and time_str):
+            return Response({"error": "date and time required"}, status=400)
+
+        try:
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+            start_time = datetime.strptime(time_str, '%H:%M').time()
+            limit = min(int(request.query_params.get('limit', 5)), self.MAX_LIMIT)
+            duration_minutes = int(request.query_params.get('duration', 60))
+        except ValueError:
+            return Response({"error": "Invalid date, time or limit"}, status=400)
+
+        alternatives = find_alternative_slots(
+            request.query_params.get('court_type'),
+            date_obj,
+            start_time,
+            coach_id=request.query_params.get('coach') or None,
+            equipment_ids=request.query_params.getlist('equipment'),
+            limit=limit,
+            duration_minutes=duration_minutes
+        )
+        return Response(alternatives)
+
+class BatchQuoteView(APIView):
+    """
+    Prices many (court, date, time, duration, equipment, coach) combinations in one call.
+
+    Body is either {"items": [{"court_id", "date", "start_time", "duration_minutes",
+    "equipment_ids", "coach_id"}, ...]} or {"grid": {"court_ids", "dates", "start_times",
+    "durations", "equipment_sets", "coach_ids"}} for a cross product. Items that
+    could not be booked as given (unknown court, off-step or out-of-hours interval,
+    unpriced date) come back with an `error` instead of a breakdown.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_ITEMS = 5000
+
+    def post(self, request):
+        too_many = Response({"error": f"At most {self.MAX_ITEMS} quotes per request"}, status=400)
+        try:
+            if 'grid' in request.data:
+                grid = request.data['grid']
+                durations = grid.get('durations') or [60]
+                equipment_sets = grid.get('equipment_sets') or [[]]
+                coach_ids = grid.get('coach_ids') or [None]
+                # A short body can describe a huge cross product; size it before expanding
+                dimensions = (
+                    grid['court_ids'], grid['dates'], grid['start_times'], durations, equipment_sets, coach_ids
+                )
+                if prod(len(dimension) for dimension in dimensions) > self.MAX_ITEMS:
+                    return too_many
+                items = expand_quote_grid(
+                    grid['court_ids'],
+                    [datetime.strptime(d, '%Y-%m-%d').date() for d in grid['dates']],
+                    [datetime.strptime(t, '%H:%M').time() for t in grid['start_times']],
+                    durations=[int(m) for m in durations],
+                    equipment_sets=equipment_sets,
+                    coach_ids=coach_ids
+                )
+            else:
+                if len(request.data.get('items', [])) > self.MAX_ITEMS:
+                    return too_many
+                items = [
+                    {
+                        'court_id': item['court_id'],
+                        'date': datetime.strptime(item['date'], '%Y-%m-%d').date(),
+                        'start_time': datetime.strptime(item['start_time'], '%H:%M').time(),
+                        'duration_minutes': int(item.get('duration_minutes', 60)),
+                        'equipment_ids': item.get('equipment_ids') or [],
+                        'coach_id': item.get('coach_id'),
+                    }
+                    for item in request.data.get('items', [])
+                ]
+        except (KeyError, TypeError, ValueError) as e:
+            return Response({"error": f"Invalid quote request: {e}"}, status=400)
+
+        try:
+            quotes = PricingEngine().get_quotes(items)
+        except (TypeError, ValueError) as e:
+            return Response({"error": f"Invalid quote request: {e}"}, status=400)
+
+        return Response([
+            {
+                'court_id': item['court_id'],
+                'date': item['date'].isoformat(),
+                'start_time': item['start_time'].strftime("%H:%M"),
+                'duration_minutes': item['duration_minutes'],
+                'equipment_ids': item['equipment_ids'],
+                'coach_id': item['coach_id'],
+                'breakdown': breakdown,
+                'error': error,
+            }
+            for item, (breakdown, error) in zip(items, quotes)
+        ])
+
+class PriceCacheStatsView(APIView):
+    """
+    Hit/miss counters of this worker's price breakdown memo (staff only).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(breakdown_memo.stats())
+
+class RetryStatsView(APIView):
+    """
+    Deadlock/serialization retry counters per booking operation (staff only).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_retry_stats())
+
 class CreateBookingAPI(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -285,45 +574,226 @@ class CreateBookingAPI(APIView):
                 date_obj=datetime.strptime(request.data.get('date'), '%Y-%m-%d').date(),
                 start_time=datetime.strptime(request.data.get('start_time'), '%H:%M').time(),
                 equipment_ids=request.data.get('equipment_ids', []),
-                coach_id=request.data.get('coach_id')
+                coach_id=request.data.get('coach_id'),
+                duration_minutes=int(request.data.get('duration_minutes', 60))
             )
             return Response(BookingSerializer(booking).data, status=201)
+        except LockContentionError as e:
+            return lock_busy_response(e)
+        except SlotConflictError as e:
+            return Response({"error": e.messages[0]}, status=409)
+        except Exception as e:
+            return Response({"error": str(e)}, status=400)
+
+class BatchBookingAPI(APIView):
+    """
+    Books many slots in one transaction, e.g. "Courts A and B every Tuesday 19:00 for 12 weeks".
+
+    Body is either {"items": [{"court_id", "date", "start_time", "duration_minutes",
+    "equipment_ids", "coach_id"}, ...]} or {"recurrence": {"court_ids", "first_date",
+    "start_time", "weeks", "duration_minutes", "equipment_ids", "coach_id"}}.
+    "mode" is "all_or_nothing" (default) or "per_item" to book whatever is free
+    and report the rest.
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_ITEMS = 200
+
+    def post(self, request):
+        mode = request.data.get('mode', 'all_or_nothing')
+        if mode not in ('all_or_nothing', 'per_item'):
+            return Response({"error": "mode must be all_or_nothing or per_item"}, status=400)
+        try:
+            if 'recurrence' in request.data:
+                rec = request.data['recurrence']
+                items = expand_recurring_items(
+                    rec['court_ids'],
+                    datetime.strptime(rec['first_date'], '%Y-%m-%d').date(),
+                    datetime.strptime(rec['start_time'], '%H:%M').time(),
+                    int(rec['weeks']),
+                    duration_minutes=int(rec.get('duration_minutes', 60)),
+                    equipment_ids=rec.get('equipment_ids') or [],
+                    coach_id=rec.get('coach_id')
+                )
+            else:
+                items = [
+                    {
+                        'court_id': int(item['court_id']),
+                        'date': datetime.strptime(item['date'], '%Y-%m-%d').date(),
+                        'start_time': datetime.strptime(item['start_time'], '%H:%M').time(),
+                        'duration_minutes': int(item.get('duration_minutes', 60)),
+                        'equipment_ids': item.get('equipment_ids') or [],
+                        'coach_id': item.get('coach_id'),
+                    }
+                    for item in request.data.get('items', [])
+                ]
+        except (KeyError, TypeError, ValueError) as e:
+            return Response({"error": f"Invalid booking request: {e}"}, status=400)
+
+        if not items:
+            return Response({"error": "No bookings requested"}, status=400)
+        if len(items) > self.MAX_ITEMS:
+            return Response({"error": f"At most {self.MAX_ITEMS} bookings per request"}, status=400)
+
+        try:
+            results = create_bookings(request.user, items, atomic=(mode == 'all_or_nothing'))
+        except LockContentionError as e:
+            return lock_busy_response(e)
+        except Exception as e:
+            return Response({"error": str(e)}, status=400)
+
+        bookings = Booking.objects.filter(
+            id__in=[r['booking'].id for r in results if r['booking']]
+        ).select_related('court', 'user').prefetch_related('equipment').in_bulk()
+        return Response({
+            'booked': sum(1 for r in results if r['booking']),
+            'failed': sum(1 for r in results if r['error']),
+            'results': [
+                {
+                    'index': r['index'],
+                    'court_id': items[r['index']]['court_id'],
+                    'date': items[r['index']]['date'].isoformat(),
+                    'start_time': items[r['index']]['start_time'].strftime("%H:%M"),
+                    'booking': BookingSerializer(bookings[r['booking'].id]).data if r['booking'] else None,
+                    'error': r['error'],
+                }
+                for r in results
+            ],
+        }, status=201 if any(r['booking'] for r in results) else 400)
+
+class BookingHoldAPI(APIView):
+    """
+    Holds a slot (plus equipment and coach) for BOOKING_HOLD_SECONDS.
+    Replaces any hold the user already has.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            hold = create_hold(
+                user=request.user,
+                court_id=request.data.get('court_id'),
+                date_obj=datetime.strptime(request.data.get('date'), '%Y-%m-%d').date(),
+                start_time=datetime.strptime(request.data.get('start_time'), '%H:%M').time(),
+                equipment_ids=request.data.get('equipment_ids', []),
+                coach_id=request.data.get('coach_id'),
+                duration_minutes=int(request.data.get('duration_minutes', 60))
+            )
+        except LockContentionError as e:
+            return lock_busy_response(e)
+        except SlotConflictError as e:
+            return Response({"error": e.messages[0]}, status=409)
         except Exception as e:
             return Response({"error": str(e)}, status=400)
+        return Response({
+            'id': hold.id,
+            'court_id': hold.court_id,
+            'date': hold.slot.date.isoformat(),
+            'start_time': hold.slot.start_time.strftime("%H:%M"),
+            'duration_minutes': hold.duration_minutes,
+            'total_price': f"{hold.total_price:.2f}",
+            'expires_at': hold.expires_at.isoformat(),
+        }, status=201)
+
+class BookingHoldDetailAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, pk):
+        release_hold(request.user, pk)
+        return Response(status=204)
+
+class ConfirmHoldAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            booking = confirm_hold(request.user, pk)
+        except HoldExpiredError as e:
+            return Response({"error": e.messages[0]}, status=410)
+        except LockContentionError as e:
+            return lock_busy_response(e)
+        except SlotConflictError as e:
+            return Response({"error": e.messages[0]}, status=409)
+        return Response(BookingSerializer(booking).data, status=201)
 
 class NotificationCountView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        from .services.notification_service import get_unread_notification_count
-        count = get_unread_notification_count(request.user)
-        return Response({'count': count})
+        from .services.notification_service import get_unread_notification_state
+        count, version = get_unread_notification_state(request.user)
+        # Polls from every open tab revalidate with If-None-Match; unchanged counts cost no query
+        etag = f'"{version}-{count}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = Response({'count': count})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+async def notification_stream(request):
+    """
+    Server-sent events for the bell badge and toasts, served by the ASGI process
+    (booking_system/asgi.py). Under WSGI a stream would tie up a worker, so it
+    answers 204 and the page keeps polling.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        response = HttpResponse(status=401)
+    else:
+        response = StreamingHttpResponse(stream_notifications(user), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+    # Pages on the site's own origin open the stream cross-origin (NOTIFICATION_STREAM_URL)
+    origin = request.headers.get('Origin')
+    if origin and origin in settings.NOTIFICATION_STREAM_ORIGINS:
+        response['Access-Control-Allow-Origin'] = origin
+        response['Access-Control-Allow-Credentials'] = 'true'
+        response['Vary'] = 'Origin'
+    return response
 
 class NotificationListView(APIView):
     permission_classes = [IsAuthenticated]
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 50
     
     def get(self, request):
         from .services.notification_service import get_user_notifications
-        notifications = get_user_notifications(request.user)
+        try:
+            limit = min(int(request.query_params.get('limit', self.PAGE_SIZE)), self.MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError
+            notifications, next_cursor = get_user_notifications(
+                request.user, limit, request.query_params.get('cursor')
+            )
+        except (ValueError, ValidationError):
+            return Response({"error": "Invalid limit or cursor"}, status=400)
         
         # Check for HTMX request
         if request.headers.get('HX-Request'):
-            return render(request, 'booking/partials/notification_list.html', {'notifications': notifications})
+            return render(request, 'booking/partials/notification_list.html', {
+                'notifications': notifications,
+                'next_cursor': next_cursor,
+                'first_page': not request.query_params.get('cursor'),
+            })
             
         data = []
         for n in notifications:
             data.append({
-                'id': n.id,
-                'message': n.message,
-                'is_read': n.is_read,
-                'created_at': n.created_at,
-                'slot_id': n.slot.id if n.slot else None,
-                'court_name': n.slot.court.name if n.slot else None,
-                'date': n.slot.date if n.slot else None,
-                'time': n.slot.start_time.strftime("%H:%M") if n.slot else None,
-                'book_url': f"/api/notifications/{n.id}/book/"
+                'id': n['id'],
+                'type': n['notification_type'],
+                'message': n['message'],
+                'is_read': n['is_read'],
+                'created_at': n['created_at'],
+                'slot_id': n['slot_id'],
+                'court_name': n['court_name'],
+                'date': n['date'],
+                'time': n['start_time'].strftime("%H:%M"),
+                'book_url': f"/api/notifications/{n['id']}/book/"
             })
-        return Response(data)
+        return Response({'results': data, 'next_cursor': next_cursor})
 
 class MarkNotificationReadView(APIView):
     permission_classes = [IsAuthenticated]
@@ -335,18 +805,36 @@ class MarkNotificationReadView(APIView):
             return Response({'status': 'success'})
         return Response({'status': 'error'}, status=404)
 
+class MarkAllNotificationsReadView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        from .services.notification_service import get_user_notifications, mark_all_notifications_as_read
+        updated = mark_all_notifications_as_read(request.user)
+        if request.headers.get('HX-Request'):
+            # Re-render the dropdown's first page; the page script clears the badge
+            notifications, next_cursor = get_user_notifications(request.user, NotificationListView.PAGE_SIZE)
+            response = render(request, 'booking/partials/notification_list.html', {
+                'notifications': notifications,
+                'next_cursor': next_cursor,
+                'first_page': True,
+            })
+            response['HX-Trigger'] = 'notificationsRead'
+            return response
+        return Response({'status': 'success', 'updated': updated})
+
 class NotificationBookView(View):
     def get(self, request, pk):
         from .models import WaitlistNotification
         from .services.notification_service import mark_notification_as_read
         
         try:
-            notification = WaitlistNotification.objects.get(id=pk, user=request.user)
+            notification = WaitlistNotification.objects.select_related('slot').get(id=pk, user=request.user)
             mark_notification_as_read(pk, request.user)
             
             # Redirect to booking form with pre-filled data
             slot = notification.slot
-            return redirect(f"/book/?date={slot.date}&time={slot.start_time.strftime('%H:%M')}&court={slot.court.id}")
+            return redirect(f"/book/?date={slot.date}&time={slot.start_time.strftime('%H:%M')}&court={slot.court_id}")
         except WaitlistNotification.DoesNotExist:
             messages.error(request, "Notification not found or expired.")
             return redirect('dashboard')
@@ -2,6 +2,11 @@
 ASGI config for booking_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Only the notification event stream (booking_app.views.notification_stream) is
+served here, by the booking-notification-stream service in render.yaml, so
+open streams cost a coroutine rather than a worker. The rest of the site runs
+on WSGI sync workers (booking_system/wsgi.py), where sync views and streamed
+responses such as the availability range export run as written.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +18,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'booking_system.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402  (needs the app registry loaded above)
+
+STREAM_PATH = reverse('notification_stream')
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] != STREAM_PATH:
+        await send({
+            'type': 'http.response.start',
+            'status': 404,
+            'headers': [(b'content-type', b'text/plain')],
+        })
+        await send({'type': 'http.response.body', 'body': b'Not found'})
+        return
+    await django_application(scope, receive, send)
@@ -71,6 +71,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'booking_app.context_processors.notification_stream',
             ],
         },
     },
@@ -88,6 +89,75 @@ DATABASES = {
     )
 }
 
+# Cache shared by all workers on a host (catalog version, counters).
+# Point CACHE_BACKEND/CACHE_LOCATION at Redis or memcached when running several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', '/tmp/booking_cache'),
+    }
+}
+
+# How often a worker re-checks the shared catalog version (booking_app/services/catalog.py)
+CATALOG_VERSION_CHECK_SECONDS = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', '1'))
+
+# Per-worker memo of price breakdowns (booking_app/services/pricing_service.py)
+PRICE_MEMO_MAXSIZE = int(os.environ.get('PRICE_MEMO_MAXSIZE', '2048'))
+PRICE_MEMO_TTL_SECONDS = float(os.environ.get('PRICE_MEMO_TTL_SECONDS', '300'))
+
+# How create_booking keeps concurrent writers apart (booking_app/services/booking_service.py):
+# "optimistic" claims slot rows with a conditional UPDATE, "pessimistic" locks the court row.
+BOOKING_CONCURRENCY = os.environ.get('BOOKING_CONCURRENCY', 'optimistic')
+
+# Deadlock / serialization-failure retries for booking transactions (booking_app/services/locking.py)
+BOOKING_RETRY_ATTEMPTS = int(os.environ.get('BOOKING_RETRY_ATTEMPTS', '3'))
+BOOKING_RETRY_BASE_DELAY = float(os.environ.get('BOOKING_RETRY_BASE_DELAY', '0.05'))
+
+# How long a booking transaction waits for a row lock another one holds (booking_app/services/locking.py):
+# "timeout" (PostgreSQL lock_timeout), "nowait" (also fail SELECT ... FOR UPDATE at once) or "block".
+# Clients that lose get a 409 asking them to retry after BOOKING_LOCK_RETRY_AFTER seconds.
+BOOKING_LOCK_WAIT = os.environ.get('BOOKING_LOCK_WAIT', 'timeout')
+BOOKING_LOCK_TIMEOUT_MS = int(os.environ.get('BOOKING_LOCK_TIMEOUT_MS', '500'))
+BOOKING_LOCK_RETRY_AFTER = int(os.environ.get('BOOKING_LOCK_RETRY_AFTER', '1'))
+
+# How long a picked slot stays held for the user before it must be confirmed
+BOOKING_HOLD_SECONDS = int(os.environ.get('BOOKING_HOLD_SECONDS', '300'))
+
+# Waitlist worker (`manage.py waitlist_worker`, booking_app/services/waitlist_service.py):
+# releases expired holds, passes expired offers to the next in line and purges notifications
+# this long after they expire
+WAITLIST_WORKER_INTERVAL = float(os.environ.get('WAITLIST_WORKER_INTERVAL', '30'))
+WAITLIST_WORKER_BATCH_SIZE = int(os.environ.get('WAITLIST_WORKER_BATCH_SIZE', '500'))
+WAITLIST_NOTIFICATION_RETENTION_DAYS = int(os.environ.get('WAITLIST_NOTIFICATION_RETENTION_DAYS', '7'))
+
+# Upper bound on how long a cached unread-notification count is served (booking_app/services/notification_service.py)
+NOTIFICATION_COUNT_CACHE_SECONDS = int(os.environ.get('NOTIFICATION_COUNT_CACHE_SECONDS', '300'))
+
+# Notification stream (booking_app/services/notification_stream.py), served by a separate
+# ASGI process (booking_system/asgi.py) while the site itself stays on WSGI workers.
+# NOTIFICATION_BROKER is LocalBroker (one process) or PostgresBroker (pg_notify across processes).
+# NOTIFICATION_STREAM_URL is the stream's absolute URL on that process; empty means the site's
+# own path, which answers 204 under WSGI so pages poll. Pages on NOTIFICATION_STREAM_ORIGINS may
+# open it cross-origin with the session cookie (share it with SESSION_COOKIE_DOMAIN).
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'booking_app.services.pubsub.LocalBroker')
+NOTIFICATION_STREAM_URL = os.environ.get('NOTIFICATION_STREAM_URL', '')
+NOTIFICATION_STREAM_ORIGINS = [o for o in os.environ.get('NOTIFICATION_STREAM_ORIGINS', '').split(',') if o]
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '15'))
+NOTIFICATION_STREAM_MAX_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_MAX_SECONDS', '600'))
+SESSION_COOKIE_DOMAIN = os.environ.get('SESSION_COOKIE_DOMAIN') or None
+
+# Slot rows created ahead of time by `manage.py generate_slots` (booking_app/services/slot_generation.py)
+SLOT_PREGENERATE_DAYS = int(os.environ.get('SLOT_PREGENERATE_DAYS', '60'))
+SLOT_PREGENERATE_BATCH_SIZE = int(os.environ.get('SLOT_PREGENERATE_BATCH_SIZE', '1000'))
+
+# Shared availability bitmap (booking_app/services/slot_index.py)
+# Rebuilt by `manage.py rebuild_slot_index` on startup and then every SLOT_INDEX_REBUILD_INTERVAL
+# seconds; set SLOT_INDEX_PATH to '' to disable.
+SLOT_INDEX_PATH = os.environ.get('SLOT_INDEX_PATH', '/tmp/booking_slot_index.bin')
+SLOT_INDEX_MAX_COURTS = int(os.environ.get('SLOT_INDEX_MAX_COURTS', '256'))
+SLOT_INDEX_HORIZON_DAYS = int(os.environ.get('SLOT_INDEX_HORIZON_DAYS', '120'))
+SLOT_INDEX_REBUILD_INTERVAL = float(os.environ.get('SLOT_INDEX_REBUILD_INTERVAL', '300'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
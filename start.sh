@@ -29,5 +29,12 @@ else:
 " || echo "Admin check failed"
 fi
 
-# Start Gunicorn
+# Make sure slots exist for the booking horizon (also run daily by the cron job in render.yaml)
+python manage.py generate_slots || echo "Slot pre-generation failed - slots will be created on demand"
+
+# Build the shared slot availability index, then keep rebuilding it in the background
+# (lookups fall back to the database until the first build is ready)
+python manage.py rebuild_slot_index --interval &
+
+# Start Gunicorn (notification streams run in their own ASGI service, see render.yaml)
 exec gunicorn booking_system.wsgi:application --bind 0.0.0.0:$PORT